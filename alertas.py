@@ -0,0 +1,202 @@
+# alertas.py
+"""Monitor de alertas de stock en segundo plano.
+
+En cada pasada evalúa solo los insumos cuyo saldo cambió desde la última
+marca de agua (stock_insumo.updated_at) y guarda en evento_alerta_stock cada
+cruce del umbral: un insumo que entra en stock crítico o que sale de él. La
+primera pasada evalúa todos los insumos.
+
+updated_at lo estampa todo lo que toca el saldo: altas, bajas y ediciones de
+compras y consumos (incluido el cambio de insumo de un consumo), las
+importaciones, el recálculo por cambio de tamaño de caja y los cambios de
+stock_minimo (saldos.marcar_saldos_modificados).
+
+La marca es la hora de inicio de la pasada y cada pasada vuelve a mirar los
+SOLAPE segundos anteriores: un cambio estampado antes de una pasada pero
+confirmado después (transacción en curso; en PostgreSQL el orden de los ids
+tampoco es el de confirmación) se ve en la siguiente. Reevaluar un insumo no
+duplica eventos porque se compara contra su último evento. Las transacciones
+deben durar menos que SOLAPE, y los relojes de los workers no pueden
+diferir en más que eso.
+
+La marca de agua se avanza con un UPDATE condicional, así dos monitores
+(por ejemplo uno por worker de gunicorn) no procesan la misma pasada: el
+segundo ve la marca ya movida y descarta la suya.
+
+El mismo hilo recalcula cada VENCIMIENTOS_INTERVALO segundos el resumen de
+lotes por vencer (vencimientos.py).
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, update
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Insumo, StockInsumo, EventoAlertaStock, MonitorAlertas
+from reportes import obtener_alertas_stock, ESTADO_CRITICO, ESTADO_OK
+from vencimientos import actualizar_resumen_vencimientos
+
+logger = logging.getLogger('stock.alertas')
+
+ID_MONITOR = 1
+INTERVALO_POR_DEFECTO = 30
+INTERVALO_VENCIMIENTOS_POR_DEFECTO = 3600
+TAMANO_LOTE = 500
+# Segundos antes de la marca que se vuelven a revisar en cada pasada
+SOLAPE = 120
+
+
+def insumos_modificados(desde):
+    """Ids de insumos con el saldo estampado después de `desde`"""
+    return [insumo_id for (insumo_id,) in
+            db.session.query(StockInsumo.insumo_id).filter(StockInsumo.updated_at > desde)]
+
+
+def ultimos_estados(insumo_ids):
+    """{insumo_id: estado_nuevo del último evento} para los insumos indicados"""
+    ultimos = db.session.query(
+        EventoAlertaStock.insumo_id,
+        func.max(EventoAlertaStock.id).label('id')
+    ).filter(EventoAlertaStock.insumo_id.in_(insumo_ids)) \
+     .group_by(EventoAlertaStock.insumo_id).subquery()
+
+    filas = db.session.query(EventoAlertaStock.insumo_id, EventoAlertaStock.estado_nuevo) \
+        .join(ultimos, ultimos.c.id == EventoAlertaStock.id)
+    return dict(filas)
+
+
+def detectar_cruces(insumo_ids):
+    """Eventos (sin guardar) de los insumos que cruzaron el umbral desde su último evento"""
+    eventos = []
+    for inicio in range(0, len(insumo_ids), TAMANO_LOTE):
+        lote = insumo_ids[inicio:inicio + TAMANO_LOTE]
+        anteriores = ultimos_estados(lote)
+        for fila in obtener_alertas_stock(lote):
+            # Sin eventos previos el insumo se considera fuera de estado crítico
+            anterior = anteriores.get(fila.id, ESTADO_OK)
+            if (anterior == ESTADO_CRITICO) == (fila.estado == ESTADO_CRITICO):
+                continue
+            eventos.append(EventoAlertaStock(
+                insumo_id=fila.id,
+                estado_anterior=anterior,
+                estado_nuevo=fila.estado,
+                stock_actual=fila.stock_actual,
+                stock_minimo=fila.stock_minimo
+            ))
+    return eventos
+
+
+def escanear_alertas():
+    """Una pasada del monitor. Devuelve cuántos eventos registró"""
+    ahora = datetime.utcnow()
+    marca = db.session.get(MonitorAlertas, ID_MONITOR)
+
+    if marca is None:
+        # Primera pasada: todos los insumos
+        insumo_ids = [insumo_id for (insumo_id,) in db.session.query(Insumo.id)]
+        db.session.add(MonitorAlertas(id=ID_MONITOR, ultimo_cambio=ahora, ultima_ejecucion=ahora))
+    else:
+        insumo_ids = insumos_modificados(marca.ultimo_cambio - timedelta(seconds=SOLAPE))
+        if not insumo_ids:
+            db.session.rollback()
+            return 0
+        resultado = db.session.execute(
+            update(MonitorAlertas)
+            .where(MonitorAlertas.id == ID_MONITOR,
+                   MonitorAlertas.ultimo_cambio == marca.ultimo_cambio)
+            .values(ultimo_cambio=ahora, ultima_ejecucion=ahora)
+            .execution_options(synchronize_session=False)
+        )
+        if resultado.rowcount == 0:
+            # Otro monitor ya procesó estos cambios
+            db.session.rollback()
+            return 0
+
+    eventos = detectar_cruces(insumo_ids)
+    db.session.add_all(eventos)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Otro monitor creó la marca de agua al mismo tiempo
+        db.session.rollback()
+        return 0
+
+    if eventos:
+        logger.info('alertas insumos=%s eventos=%s', len(insumo_ids), len(eventos))
+    return len(eventos)
+
+
+def evento_a_dict(evento, denominacion):
+    return {
+        'id': evento.id,
+        'insumo_id': evento.insumo_id,
+        'insumo': denominacion,
+        'estado_anterior': evento.estado_anterior,
+        'estado_nuevo': evento.estado_nuevo,
+        'stock_actual': evento.stock_actual,
+        'stock_minimo': evento.stock_minimo,
+        'fecha': evento.created_at.isoformat() if evento.created_at else None,
+    }
+
+
+def obtener_eventos(desde_id=0, limite=50):
+    """Eventos con id mayor a desde_id, del más viejo al más nuevo"""
+    filas = db.session.query(EventoAlertaStock, Insumo.denominacion) \
+        .join(Insumo, Insumo.id == EventoAlertaStock.insumo_id) \
+        .filter(EventoAlertaStock.id > desde_id) \
+        .order_by(EventoAlertaStock.id).limit(limite)
+    return [evento_a_dict(evento, denominacion) for evento, denominacion in filas]
+
+
+def obtener_eventos_recientes(limite=20):
+    """Últimos eventos, del más nuevo al más viejo"""
+    filas = db.session.query(EventoAlertaStock, Insumo.denominacion) \
+        .join(Insumo, Insumo.id == EventoAlertaStock.insumo_id) \
+        .order_by(EventoAlertaStock.id.desc()).limit(limite)
+    return [evento_a_dict(evento, denominacion) for evento, denominacion in filas]
+
+
+class MonitorAlertasThread(threading.Thread):
+    """Hilo que llama a escanear_alertas cada `intervalo` segundos y
+    actualiza el resumen de vencimientos cada `intervalo_vencimientos`"""
+
+    def __init__(self, app, intervalo=INTERVALO_POR_DEFECTO,
+                 intervalo_vencimientos=INTERVALO_VENCIMIENTOS_POR_DEFECTO):
+        super().__init__(name='monitor-alertas', daemon=True)
+        self.app = app
+        self.intervalo = intervalo
+        self.intervalo_vencimientos = intervalo_vencimientos
+        self._ultimo_vencimientos = None
+        self._detener = threading.Event()
+
+    def run(self):
+        while not self._detener.is_set():
+            try:
+                with self.app.app_context():
+                    escanear_alertas()
+            except Exception:
+                logger.exception('Error en el monitor de alertas')
+            if (self._ultimo_vencimientos is None
+                    or time.monotonic() - self._ultimo_vencimientos >= self.intervalo_vencimientos):
+                self._ultimo_vencimientos = time.monotonic()
+                try:
+                    with self.app.app_context():
+                        actualizar_resumen_vencimientos()
+                except Exception:
+                    logger.exception('Error al actualizar el resumen de vencimientos')
+            self._detener.wait(self.intervalo)
+
+    def detener(self):
+        self._detener.set()
+
+
+def iniciar_monitor_alertas(app, intervalo=None):
+    """Arranca el monitor en un hilo de fondo y lo devuelve"""
+    if intervalo is None:
+        intervalo = app.config.get('MONITOR_ALERTAS_INTERVALO', INTERVALO_POR_DEFECTO)
+    monitor = MonitorAlertasThread(app, intervalo, app.config.get('VENCIMIENTOS_INTERVALO',
+                                                                  INTERVALO_VENCIMIENTOS_POR_DEFECTO))
+    monitor.start()
+    return monitor
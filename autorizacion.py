@@ -0,0 +1,48 @@
+# autorizacion.py
+"""Caché del usuario autenticado (rol, activo y versión) para role_required.
+
+Evita consultar la tabla usuario en cada petición protegida. Cada entrada
+vence a los AUTORIZACION_TTL_SEGUNDOS y se descarta en el acto cuando el
+Usuario se modifica o elimina en este proceso. Usuario.version se incrementa
+en cada UPDATE, así una sesión con otra versión se refresca.
+"""
+import time
+from collections import namedtuple
+
+from flask import current_app
+from sqlalchemy import event
+
+from models import db, Usuario
+
+TTL_POR_DEFECTO = 60
+
+Principal = namedtuple('Principal', ['id', 'rol', 'activo', 'version'])
+
+# user_id -> (Principal o None, vencimiento)
+_cache = {}
+
+
+def obtener_principal(user_id):
+    """Devuelve el Principal del usuario (None si no existe), usando la caché"""
+    ahora = time.monotonic()
+    entrada = _cache.get(user_id)
+    if entrada is not None and entrada[1] > ahora:
+        return entrada[0]
+
+    fila = db.session.query(Usuario.id, Usuario.rol, Usuario.activo, Usuario.version) \
+        .filter(Usuario.id == user_id).first()
+    principal = Principal(fila.id, fila.rol, bool(fila.activo), fila.version) if fila else None
+
+    ttl = current_app.config.get('AUTORIZACION_TTL_SEGUNDOS', TTL_POR_DEFECTO)
+    _cache[user_id] = (principal, ahora + ttl)
+    return principal
+
+
+def invalidar_principal(user_id):
+    _cache.pop(user_id, None)
+
+
+@event.listens_for(Usuario, 'after_update')
+@event.listens_for(Usuario, 'after_delete')
+def _usuario_modificado(mapper, connection, usuario):
+    invalidar_principal(usuario.id)
@@ -0,0 +1,112 @@
+# basedatos.py
+"""URL y opciones del motor de base de datos.
+
+En desarrollo la app usa el archivo SQLite local. En producción se apunta a
+PostgreSQL con DATABASE_URL, así cada worker de gunicorn tiene su propio pool
+de conexiones en vez de pelear por el lock de un único archivo.
+
+Con PostgreSQL, workers × (DB_POOL_SIZE + DB_MAX_OVERFLOW) no debe superar el
+max_connections del servidor (menos las que usen otros clientes).
+
+Con SQLite cada conexión nueva se configura con PRAGMAs (configurar_sqlite):
+WAL para que los lectores no bloqueen al que escribe ni al revés,
+synchronous=NORMAL (seguro con WAL), busy_timeout para esperar el lock en
+vez de fallar con "database is locked", y caché/mmap más grandes.
+`flask mantenimiento-db` hace el checkpoint del WAL, ANALYZE y optimize.
+"""
+import os
+import time
+
+from sqlalchemy import event
+
+# Valores por defecto del pool (por proceso)
+POOL_SIZE = 5
+MAX_OVERFLOW = 10
+POOL_TIMEOUT = 30
+# Reciclar antes de que el servidor o un proxy corte las conexiones ociosas
+POOL_RECYCLE = 1800
+
+# PRAGMAs de SQLite por defecto
+SQLITE_JOURNAL_MODE = 'WAL'
+SQLITE_SYNCHRONOUS = 'NORMAL'
+SQLITE_BUSY_TIMEOUT_MS = 10000
+SQLITE_CACHE_KB = 20000
+SQLITE_MMAP_BYTES = 256 * 1024 * 1024
+
+
+def normalizar_url(url):
+    """Acepta el esquema postgres:// que usan algunos proveedores (SQLAlchemy solo reconoce postgresql://)"""
+    if url.startswith('postgres://'):
+        return 'postgresql://' + url[len('postgres://'):]
+    return url
+
+
+def es_postgresql(url):
+    return url.split(':', 1)[0].split('+', 1)[0] == 'postgresql'
+
+
+def opciones_motor(url, entorno=None):
+    """SQLALCHEMY_ENGINE_OPTIONS para la URL; los DB_* del entorno ajustan el pool"""
+    entorno = os.environ if entorno is None else entorno
+    if not es_postgresql(url):
+        return {}
+
+    opciones = {
+        'pool_size': int(entorno.get('DB_POOL_SIZE', POOL_SIZE)),
+        'max_overflow': int(entorno.get('DB_MAX_OVERFLOW', MAX_OVERFLOW)),
+        'pool_timeout': int(entorno.get('DB_POOL_TIMEOUT', POOL_TIMEOUT)),
+        'pool_recycle': int(entorno.get('DB_POOL_RECYCLE', POOL_RECYCLE)),
+        # Descarta conexiones muertas (reinicio del servidor, failover) antes de usarlas
+        'pool_pre_ping': True,
+    }
+    # Nombre visible en pg_stat_activity y límite opcional por sentencia
+    conexion = {'application_name': entorno.get('DB_APPLICATION_NAME', 'sistema-stock')}
+    if entorno.get('DB_STATEMENT_TIMEOUT_MS'):
+        conexion['options'] = f"-c statement_timeout={int(entorno['DB_STATEMENT_TIMEOUT_MS'])}"
+    opciones['connect_args'] = conexion
+    return opciones
+
+
+def pragmas_sqlite(entorno=None):
+    """PRAGMAs para cada conexión SQLite; los SQLITE_* del entorno los ajustan"""
+    entorno = os.environ if entorno is None else entorno
+    return {
+        'journal_mode': entorno.get('SQLITE_JOURNAL_MODE', SQLITE_JOURNAL_MODE),
+        'synchronous': entorno.get('SQLITE_SYNCHRONOUS', SQLITE_SYNCHRONOUS),
+        'busy_timeout': int(entorno.get('SQLITE_BUSY_TIMEOUT_MS', SQLITE_BUSY_TIMEOUT_MS)),
+        # Negativo: tamaño en KiB en lugar de páginas
+        'cache_size': -int(entorno.get('SQLITE_CACHE_KB', SQLITE_CACHE_KB)),
+        'mmap_size': int(entorno.get('SQLITE_MMAP_BYTES', SQLITE_MMAP_BYTES)),
+    }
+
+
+def configurar_sqlite(engine, pragmas):
+    """Aplica los PRAGMAs a cada conexión nueva del motor"""
+    @event.listens_for(engine, 'connect')
+    def aplicar_pragmas(conexion_dbapi, _registro):
+        cursor = conexion_dbapi.cursor()
+        for nombre, valor in pragmas.items():
+            cursor.execute(f'PRAGMA {nombre}={valor}')
+        cursor.close()
+
+
+def mantenimiento(engine):
+    """ANALYZE, PRAGMA optimize y checkpoint del WAL (SQLite); ANALYZE en PostgreSQL.
+
+    Devuelve una lista de (paso, resultado) para mostrar.
+    """
+    pasos = []
+    with engine.connect() as conexion:
+        t0 = time.perf_counter()
+        conexion.exec_driver_sql('ANALYZE')
+        pasos.append(('ANALYZE', f'{time.perf_counter() - t0:.2f}s'))
+        if engine.dialect.name == 'sqlite':
+            conexion.exec_driver_sql('PRAGMA optimize')
+            pasos.append(('optimize', 'ok'))
+        conexion.commit()
+        if engine.dialect.name == 'sqlite':
+            # TRUNCATE deja el archivo -wal en cero si no hay lectores activos
+            ocupado, paginas_wal, copiadas = conexion.exec_driver_sql('PRAGMA wal_checkpoint(TRUNCATE)').one()
+            pasos.append(('wal_checkpoint', f'{copiadas}/{paginas_wal} páginas'
+                                            + (' (ocupado, reintentar)' if ocupado else '')))
+    return pasos
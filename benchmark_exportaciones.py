@@ -0,0 +1,86 @@
+# benchmark_exportaciones.py
+"""Benchmark de las exportaciones de consumos por formato (exportaciones.py).
+
+Genera datos sintéticos (generar_datos.py) en una base SQLite temporal para
+cada escala y exporta los consumos en cada formato a un archivo temporal,
+como lo haría la ruta /exportar/consumos/<formato>. Informa tiempo total,
+filas/s y tamaño del archivo. La planilla xlsx solo se mide hasta
+--excel-hasta filas (a 1M tarda varios minutos).
+
+Uso:
+    python benchmark_exportaciones.py
+    python benchmark_exportaciones.py --escalas 100000 --formatos csv,parquet
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+
+def medir_formato(conjunto, formato, ruta):
+    """Exporta el conjunto a la ruta y devuelve (segundos, bytes)"""
+    from exportaciones import escribir_exportacion
+
+    t0 = time.perf_counter()
+    with open(ruta, 'wb') as destino:
+        escribir_exportacion(destino, conjunto, formato)
+    return time.perf_counter() - t0, os.path.getsize(ruta)
+
+
+def medir_escala(filas, args, directorio):
+    ruta_db = os.path.join(directorio, f'exportaciones_{filas}.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{ruta_db}'
+
+    from app import app, db
+    from generar_datos import generar_datos
+    from exportaciones import CONJUNTOS, FORMATOS
+
+    with app.app_context():
+        db.create_all()
+        t0 = time.perf_counter()
+        generar_datos(db.engine, insumos=args.insumos, consumos=filas, compras=args.insumos * 10)
+        print(f"📦 {filas:,} consumos ({time.perf_counter() - t0:.1f}s para generarlos)")
+
+        resultados = {}
+        for nombre in args.formatos.split(','):
+            if nombre == 'xlsx' and filas > args.excel_hasta:
+                print(f"   {nombre:<8} (omitido: más de {args.excel_hasta:,} filas)")
+                continue
+            ruta = os.path.join(directorio, f'consumos.{FORMATOS[nombre].extension}')
+            segundos, tamano = medir_formato(CONJUNTOS['consumos'], FORMATOS[nombre], ruta)
+            os.remove(ruta)
+            db.session.rollback()
+            resultados[nombre] = (segundos, tamano)
+
+        base = resultados.get('xlsx') or resultados.get('csv')
+        for nombre, (segundos, tamano) in resultados.items():
+            relativo = f"  ({segundos / base[0]:5.2f}x tiempo, {tamano / base[1]:5.2f}x tamaño)" if base else ''
+            print(f"   {nombre:<8} {segundos:8.2f} s  {filas / segundos:>10,.0f} filas/s  "
+                  f"{tamano / 1024 / 1024:8.1f} MiB{relativo}")
+        db.engine.dispose()
+    os.remove(ruta_db)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--escalas', default='100000,1000000', help='Cantidades de consumos, separadas por coma')
+    parser.add_argument('--formatos', default='xlsx,csv,jsonl,parquet')
+    parser.add_argument('--insumos', type=int, default=500)
+    parser.add_argument('--excel-hasta', type=int, default=100000, help='Máximo de filas para medir xlsx')
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp()
+    # Una sola app por proceso: cada escala se mide en un proceso aparte
+    contexto = multiprocessing.get_context('spawn')
+    for filas in (int(valor) for valor in args.escalas.split(',')):
+        proceso = contexto.Process(target=medir_escala, args=(filas, args, directorio))
+        proceso.start()
+        proceso.join()
+    for nombre in os.listdir(directorio):
+        os.remove(os.path.join(directorio, nombre))
+    os.rmdir(directorio)
+
+
+if __name__ == '__main__':
+    main()
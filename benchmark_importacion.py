@@ -0,0 +1,132 @@
+# benchmark_importacion.py
+"""Benchmark de la importación masiva (importaciones.py).
+
+Genera archivos CSV y XLSX con insumos, compras y consumos válidos (más un
+porcentaje de filas con errores), los importa en una base SQLite temporal y
+mide filas por segundo de cada uno. Al final verifica que los saldos y los
+acumulados de consumo y los lotes FIFO coincidan con los movimientos.
+
+Uso:
+    python benchmark_importacion.py
+    python benchmark_importacion.py --filas 100000 --formato csv
+"""
+import argparse
+import csv
+import os
+import random
+import tempfile
+import time
+
+from openpyxl import Workbook
+
+
+def escribir(ruta, encabezados, filas):
+    if ruta.endswith('.csv'):
+        with open(ruta, 'w', newline='', encoding='utf-8') as archivo:
+            escritor = csv.writer(archivo)
+            escritor.writerow(encabezados)
+            escritor.writerows(filas)
+    else:
+        libro = Workbook(write_only=True)
+        hoja = libro.create_sheet()
+        hoja.append(encabezados)
+        for fila in filas:
+            hoja.append(fila)
+        libro.save(ruta)
+
+
+def generar_archivos(directorio, formato, filas, insumos, trabajadores, errores, semilla=1234):
+    rnd = random.Random(semilla)
+    rutas = {}
+
+    def con_errores(fila, malo):
+        return malo if rnd.random() < errores else fila
+
+    rutas['insumos'] = os.path.join(directorio, f'insumos.{formato}')
+    escribir(rutas['insumos'],
+             ['Denominación', 'Tipo', 'Modelo', 'Cantidad por caja', 'Precio caja', 'Código barras', 'Stock mínimo'],
+             (con_errores([f'insumo {i}', 'lija', f'P{i}', rnd.choice([10, 25, 50]), 1000 + i, f'779{i:07d}', 20],
+                          [f'insumo {i}', 'lija', f'P{i}', 'diez', 1000, '', 0])
+              for i in range(1, insumos + 1)))
+
+    rutas['compras'] = os.path.join(directorio, f'compras.{formato}')
+    escribir(rutas['compras'],
+             ['insumo', 'cantidad_cajas', 'precio_caja_compra', 'proveedor', 'lote', 'fecha_compra'],
+             (con_errores([f'779{rnd.randint(1, insumos):07d}', rnd.randint(20, 100), 1200, 'Proveedor', f'L{i}', '2025-06-01'],
+                          ['no-existe', 1, 1, '', '', ''])
+              for i in range(filas // 10)))
+
+    rutas['consumos'] = os.path.join(directorio, f'consumos.{formato}')
+    escribir(rutas['consumos'],
+             ['insumo', 'cantidad_unidades', 'trabajador', 'proyecto', 'fecha_consumo'],
+             (con_errores([f'779{rnd.randint(1, insumos):07d}', rnd.randint(1, 5), f'T{rnd.randint(1, trabajadores)}',
+                           'IMPORT', '15/07/2025'],
+                          [f'779{rnd.randint(1, insumos):07d}', -1, 'X0', '', 'ayer'])
+              for _ in range(filas)))
+    return rutas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--filas', type=int, default=100000, help='Consumos a importar (compras = filas / 10)')
+    parser.add_argument('--insumos', type=int, default=1000)
+    parser.add_argument('--formato', choices=['csv', 'xlsx', 'ambos'], default='ambos')
+    parser.add_argument('--errores', type=float, default=0.01, help='Proporción de filas inválidas')
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp()
+    ruta_db = os.path.join(directorio, 'importacion.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{ruta_db}'
+
+    from app import app, db
+    from costeo import verificar_costos
+    from importaciones import importar_archivo
+    from models import CentroConsumo, Trabajador
+    from rollups import verificar_rollups
+    from saldos import verificar_saldos
+
+    formatos = ['csv', 'xlsx'] if args.formato == 'ambos' else [args.formato]
+    trabajadores = 20
+
+    for formato in formatos:
+        rutas = generar_archivos(directorio, formato, args.filas, args.insumos, trabajadores, args.errores)
+        print(f"📦 {formato.upper()}: {args.insumos:,} insumos, {args.filas // 10:,} compras, {args.filas:,} consumos")
+
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            centro = CentroConsumo(nombre='Centro')
+            db.session.add(centro)
+            db.session.flush()
+            db.session.add_all(Trabajador(codigo=f'T{i}', nombre=f'Trabajador {i}', centro_consumo_id=centro.id)
+                               for i in range(1, trabajadores + 1))
+            db.session.commit()
+
+        for tipo in ('insumos', 'compras', 'consumos'):
+            with app.app_context(), open(rutas[tipo], 'rb') as archivo:
+                t0 = time.perf_counter()
+                resultado = importar_archivo(tipo, archivo, rutas[tipo])
+                duracion = time.perf_counter() - t0
+            print(f"   {tipo:<9} {resultado.importadas:8,} importadas  {resultado.rechazadas:6,} con errores  "
+                  f"{duracion:6.2f}s  ({resultado.leidas / duracion:,.0f} filas/s)")
+
+        with app.app_context():
+            diferencias = verificar_saldos()
+            diferencias_rollups = verificar_rollups()
+            diferencias_lotes, sin_costo = verificar_costos()
+        print("   ✅ Saldos coinciden con los movimientos" if not diferencias
+              else f"   ❌ {len(diferencias)} saldos distintos de los movimientos")
+        print("   ✅ Acumulados coinciden con los consumos" if not diferencias_rollups
+              else f"   ❌ {len(diferencias_rollups)} acumulados distintos de los consumos")
+        print("   ✅ Lotes FIFO coinciden con los saldos" if not diferencias_lotes and not sin_costo
+              else f"   ❌ {len(diferencias_lotes)} insumos con lotes distintos del saldo, {sin_costo} consumos sin costo")
+
+    with app.app_context():
+        db.engine.dispose()
+    for nombre in os.listdir(directorio):
+        os.remove(os.path.join(directorio, nombre))
+    os.rmdir(directorio)
+
+
+if __name__ == '__main__':
+    main()
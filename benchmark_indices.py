@@ -0,0 +1,122 @@
+# benchmark_indices.py
+"""Compara planes de consulta y tiempos con y sin los índices de models.py.
+
+Crea una base SQLite temporal con datos sintéticos, ejecuta las consultas
+más usadas por app.py sin índices secundarios, crea los índices y repite.
+
+Uso:
+    python benchmark_indices.py                  # 1.000.000 de consumos
+    python benchmark_indices.py --consumos 200000 --repeticiones 5
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from sqlalchemy import create_engine, text
+
+from generar_datos import generar_datos
+from models import db
+
+# Consultas con la misma forma que las de app.py / consultas.py / reportes.py
+CONSULTAS = [
+    ('listado_consumos (primera página)',
+     "SELECT id FROM consumo ORDER BY fecha_consumo DESC, id DESC LIMIT 51", {}),
+    ('listado_consumos por centro',
+     "SELECT id FROM consumo WHERE centro_consumo_id = :centro "
+     "ORDER BY fecha_consumo DESC, id DESC LIMIT 51", {'centro': 2}),
+    ('listado_consumos por trabajador',
+     "SELECT id FROM consumo WHERE trabajador_id = :trabajador "
+     "ORDER BY fecha_consumo DESC, id DESC LIMIT 51", {'trabajador': 7}),
+    ('listado_consumos por insumo',
+     "SELECT id FROM consumo WHERE insumo_id = :insumo "
+     "ORDER BY fecha_consumo DESC, id DESC LIMIT 51", {'insumo': 42}),
+    ('resumen de consumos de un mes',
+     "SELECT count(id), sum(cantidad_unidades) FROM consumo "
+     "WHERE fecha_consumo >= :desde AND fecha_consumo < :hasta",
+     {'desde': '2025-03-01 00:00:00', 'hasta': '2025-04-01 00:00:00'}),
+    ('consumos de un insumo (saldo)',
+     "SELECT sum(cantidad_unidades) FROM consumo WHERE insumo_id = :insumo", {'insumo': 42}),
+    ('listado_compras',
+     "SELECT id FROM compra ORDER BY fecha_compra DESC LIMIT 100", {}),
+    ('compras de un insumo (saldo)',
+     "SELECT sum(cantidad_cajas) FROM compra WHERE insumo_id = :insumo", {'insumo': 42}),
+    ('trabajadores por centro',
+     "SELECT id FROM trabajador WHERE centro_consumo_id = :centro AND activo = 1 "
+     "ORDER BY nombre", {'centro': 2}),
+]
+
+
+def plan(conn, sql, params):
+    filas = conn.execute(text("EXPLAIN QUERY PLAN " + sql), params)
+    return ' | '.join(fila[-1] for fila in filas)
+
+
+def medir(engine, repeticiones):
+    resultados = {}
+    with engine.connect() as conn:
+        for nombre, sql, params in CONSULTAS:
+            tiempos = []
+            for _ in range(repeticiones):
+                t0 = time.perf_counter()
+                conn.execute(text(sql), params).fetchall()
+                tiempos.append(time.perf_counter() - t0)
+            resultados[nombre] = (sorted(tiempos)[len(tiempos) // 2], plan(conn, sql, params))
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--consumos', type=int, default=1000000)
+    parser.add_argument('--repeticiones', type=int, default=3)
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp()
+    ruta = os.path.join(directorio, 'benchmark.db')
+    engine = create_engine(f'sqlite:///{ruta}')
+
+    # Tablas sin índices secundarios
+    db.metadata.create_all(engine)
+    indices = [indice for tabla in db.metadata.sorted_tables for indice in tabla.indexes]
+    for indice in indices:
+        indice.drop(engine)
+
+    print(f"📦 Generando {args.consumos:,} consumos en {ruta}...")
+    t0 = time.perf_counter()
+    generar_datos(engine, insumos=2000, centros=8, trabajadores=60,
+                  compras=args.consumos // 10, consumos=args.consumos)
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+    print(f"   listo en {time.perf_counter() - t0:.1f}s")
+
+    print("⏱️  Midiendo sin índices...")
+    antes = medir(engine, args.repeticiones)
+
+    print(f"🔧 Creando {len(indices)} índices...")
+    t0 = time.perf_counter()
+    for indice in indices:
+        indice.create(engine)
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+    print(f"   listo en {time.perf_counter() - t0:.1f}s")
+
+    print("⏱️  Midiendo con índices...")
+    despues = medir(engine, args.repeticiones)
+
+    print()
+    for nombre, _, _ in CONSULTAS:
+        t_antes, plan_antes = antes[nombre]
+        t_despues, plan_despues = despues[nombre]
+        mejora = t_antes / t_despues if t_despues else float('inf')
+        print(f"📊 {nombre}")
+        print(f"   sin índices: {t_antes * 1000:9.2f} ms  {plan_antes}")
+        print(f"   con índices: {t_despues * 1000:9.2f} ms  {plan_despues}")
+        print(f"   mejora: x{mejora:.1f}")
+
+    engine.dispose()
+    os.remove(ruta)
+    os.rmdir(directorio)
+
+
+if __name__ == '__main__':
+    main()
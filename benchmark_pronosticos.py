@@ -0,0 +1,100 @@
+# benchmark_pronosticos.py
+"""Benchmark del pronóstico de demanda (pronosticos.py).
+
+Genera datos sintéticos (generar_datos.py) en una base SQLite temporal y mide
+el pronóstico completo sin caché, con la matriz en caché y con el cambio de
+día (solo se lee el día nuevo). Verifica el suavizado exponencial contra la
+recursión insumo por insumo en una muestra.
+
+Uso:
+    python benchmark_pronosticos.py
+    python benchmark_pronosticos.py --insumos 5000 --consumos 1000000 --dias 1095
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+# Último día de los datos de generar_datos.py (terminan el 2026-01-01)
+HASTA = date(2025, 12, 31)
+
+
+def suavizado_recursivo(serie, alpha):
+    nivel = serie[0]
+    for valor in serie[1:]:
+        nivel = alpha * valor + (1 - alpha) * nivel
+    return nivel
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--insumos', type=int, default=3000)
+    parser.add_argument('--consumos', type=int, default=500000)
+    parser.add_argument('--dias', type=int, default=1095, help='Días de historia generados y pronosticados')
+    parser.add_argument('--iteraciones', type=int, default=5)
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp()
+    ruta_db = os.path.join(directorio, 'pronosticos.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{ruta_db}'
+
+    from app import app, db
+    from generar_datos import generar_datos
+    from pronosticos import calcular_pronosticos, cargar_matriz_consumo, reiniciar_pronosticos, suavizado_exponencial
+
+    with app.app_context():
+        db.create_all()
+        t0 = time.perf_counter()
+        generar_datos(db.engine, insumos=args.insumos, consumos=args.consumos, dias=args.dias)
+        print(f"📦 {args.insumos:,} insumos, {args.consumos:,} consumos en {args.dias} días "
+              f"(generados en {time.perf_counter() - t0:.1f}s)")
+
+    inicio = HASTA - timedelta(days=args.dias - 1)
+    with app.app_context():
+        insumo_ids, matriz = cargar_matriz_consumo(inicio, args.dias)
+    print(f"   matriz {matriz.shape[0]:,} x {matriz.shape[1]:,} ({matriz.nbytes / 1e6:.1f} MB), "
+          f"{np.count_nonzero(matriz):,} días con consumo")
+
+    def medir(preparar):
+        tiempos = []
+        for _ in range(args.iteraciones):
+            with app.app_context():
+                preparar()
+                t0 = time.perf_counter()
+                resultado = calcular_pronosticos(hasta=HASTA, dias_historia=args.dias)
+                tiempos.append(time.perf_counter() - t0)
+        return np.median(tiempos) * 1000, resultado
+
+    def cambio_de_dia():
+        reiniciar_pronosticos()
+        calcular_pronosticos(hasta=HASTA - timedelta(days=1), dias_historia=args.dias)
+
+    frio, pronosticos = medir(reiniciar_pronosticos)
+    dia_nuevo, por_dia = medir(cambio_de_dia)
+    en_cache, _ = medir(lambda: None)
+    print(f"   sin caché (carga completa)   p50 {frio:8.1f} ms")
+    print(f"   cambio de día (incremental)  p50 {dia_nuevo:8.1f} ms")
+    print(f"   con caché                    p50 {en_cache:8.1f} ms")
+    print("   ✅ El corrimiento por día coincide con la carga completa" if por_dia == pronosticos
+          else "   ❌ El corrimiento por día no coincide con la carga completa")
+    reponer = sum(1 for fila in pronosticos.values() if fila.reponer)
+    print(f"   {len(pronosticos):,} insumos pronosticados, {reponer:,} a reponer")
+
+    alpha = app.config['PRONOSTICO_ALPHA']
+    muestra = np.random.default_rng(1234).choice(len(insumo_ids), size=min(50, len(insumo_ids)), replace=False)
+    vectorizado = suavizado_exponencial(matriz[muestra], alpha)
+    recursivo = np.array([suavizado_recursivo(matriz[i], alpha) for i in muestra])
+    print("   ✅ Suavizado exponencial coincide con la recursión" if np.allclose(vectorizado, recursivo)
+          else "   ❌ Suavizado exponencial distinto de la recursión")
+
+    with app.app_context():
+        db.engine.dispose()
+    os.remove(ruta_db)
+    os.rmdir(directorio)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+# benchmark_propiedades.py
+"""Benchmark de las propiedades memorizadas de los modelos (propiedad_memorizada).
+
+Genera datos sintéticos (generar_datos.py) en una base SQLite temporal y mide
+/gestion_insumos y /listado-compras con las propiedades calculadas de Insumo
+y Compra memorizadas por petición y como @property comunes (como antes).
+Informa latencia p50, tiempo de CPU de Python y cuántas veces se calculó
+stock_actual por petición.
+
+Uso:
+    python benchmark_propiedades.py
+    python benchmark_propiedades.py --insumos 10000 --iteraciones 10
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+RUTAS = ['/gestion_insumos', '/listado-compras']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--insumos', type=int, default=5000)
+    parser.add_argument('--consumos', type=int, default=20000)
+    parser.add_argument('--iteraciones', type=int, default=5)
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp()
+    ruta_db = os.path.join(directorio, 'propiedades.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{ruta_db}'
+
+    from app import app, db
+    from generar_datos import generar_datos
+    from models import Usuario, Insumo, Compra, propiedad_memorizada
+
+    app.config['TESTING'] = True
+    with app.app_context():
+        db.create_all()
+        generar_datos(db.engine, insumos=args.insumos, consumos=args.consumos, compras=args.insumos * 2)
+        usuario = Usuario(username='bench', rol='admin', nombre='Bench')
+        usuario.set_password('bench')
+        db.session.add(usuario)
+        db.session.commit()
+        sesion_usuario = {'user_id': usuario.id, 'user_rol': usuario.rol, 'user_version': usuario.version}
+    print(f"📦 {args.insumos:,} insumos, {args.consumos:,} consumos")
+
+    cliente = app.test_client()
+    with cliente.session_transaction() as sesion:
+        sesion.update(sesion_usuario)
+
+    memorizadas = {(clase, nombre): valor for clase in (Insumo, Compra)
+                   for nombre, valor in vars(clase).items() if isinstance(valor, propiedad_memorizada)}
+    calculos = {'stock_actual': 0}
+    original = Insumo.__dict__['stock_actual'].funcion
+
+    def contar_stock(insumo):
+        calculos['stock_actual'] += 1
+        return original(insumo)
+
+    def medir(ruta):
+        cliente.get(ruta)
+        tiempos, cpu = [], []
+        calculos['stock_actual'] = 0
+        for _ in range(args.iteraciones):
+            t0, c0 = time.perf_counter(), time.process_time()
+            respuesta = cliente.get(ruta)
+            tiempos.append(time.perf_counter() - t0)
+            cpu.append(time.process_time() - c0)
+            assert respuesta.status_code == 200, respuesta.status_code
+        return (np.median(tiempos) * 1000, np.median(cpu) * 1000,
+                calculos['stock_actual'] / args.iteraciones, respuesta.data)
+
+    for ruta in RUTAS:
+        Insumo.__dict__['stock_actual'].funcion = contar_stock
+        memo = medir(ruta)
+        # Como antes: @property comunes sobre las mismas funciones
+        for (clase, nombre), descriptor in memorizadas.items():
+            setattr(clase, nombre, property(descriptor.funcion))
+        sin_memo = medir(ruta)
+        for (clase, nombre), descriptor in memorizadas.items():
+            setattr(clase, nombre, descriptor)
+        Insumo.__dict__['stock_actual'].funcion = original
+
+        print(f"   {ruta}")
+        for nombre, (p50, cpu, veces, _) in (('sin memoria', sin_memo), ('memorizadas', memo)):
+            print(f"      {nombre:<12} p50 {p50:8.1f} ms  CPU {cpu:8.1f} ms  stock_actual x{veces:,.0f}")
+        print("      ✅ Mismo HTML" if memo[3] == sin_memo[3] else "      ❌ El HTML cambió")
+
+    with app.app_context():
+        db.engine.dispose()
+    for nombre in os.listdir(directorio):
+        os.remove(os.path.join(directorio, nombre))
+    os.rmdir(directorio)
+
+
+if __name__ == '__main__':
+    main()
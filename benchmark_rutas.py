@@ -0,0 +1,213 @@
+# benchmark_rutas.py
+"""Benchmark de las rutas de app.py con el test client de Flask.
+
+Para cada escala genera datos sintéticos (generar_datos.py) en una base
+SQLite temporal y mide por ruta: latencia p50/p95, cantidad de consultas SQL
+y pico de memoria Python de una petición. Falla (código de salida 1) si una
+ruta hace más consultas que las declaradas con @presupuesto_consultas: así
+un N+1 nuevo aparece al correr el benchmark aunque la escala sea chica.
+
+Uso:
+    python benchmark_rutas.py
+    python benchmark_rutas.py --escalas 1000,50000 --iteraciones 10
+    python benchmark_rutas.py --rutas reporte_stock,alertas_stock --json resultados.json
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+from sqlalchemy import event, func
+
+# Rutas a medir: (nombre, método, url). Los datos del POST se arman por escala.
+RUTAS = [
+    ('reporte_stock', 'GET', '/reporte-stock'),
+    ('listado_consumos', 'GET', '/listado_consumos'),
+    ('api_consumos', 'GET', '/api/consumos'),
+    ('alertas_stock', 'GET', '/alertas_stock'),
+    ('api_dashboard', 'GET', '/api/dashboard'),
+    ('api_pronosticos', 'GET', '/api/pronosticos'),
+    ('api_vencimientos', 'GET', '/api/vencimientos?dias=90'),
+    ('api_consumos_analisis', 'GET', '/api/consumos/analisis?desde=2024-03-15&hasta=2025-12-31&agrupar=centro,mes'),
+    ('gestion_insumos', 'GET', '/gestion_insumos'),
+    ('listado_compras', 'GET', '/listado-compras'),
+    ('gestion_centros', 'GET', '/gestion_centros'),
+    ('gestion_trabajadores', 'GET', '/gestion_trabajadores'),
+    ('get_trabajador', 'GET', '/get_trabajador/1'),
+    ('get_centro', 'GET', '/get_centro/1'),
+    ('registrar_consumo_form', 'GET', '/registrar-consumo'),
+    ('exportar_consumos_excel', 'GET', '/exportar_consumos_excel'),
+    ('exportar_stock_excel', 'GET', '/exportar_stock_excel'),
+    ('buscar_insumos', 'GET', '/buscar_insumos?q=super'),
+    ('registrar_consumo', 'POST', '/registrar-consumo'),
+]
+
+
+class ContadorConsultas:
+    """Cuenta las sentencias SQL ejecutadas por el engine"""
+
+    def __init__(self, engine):
+        self.total = 0
+        event.listen(engine, 'before_cursor_execute', self._contar)
+
+    def _contar(self, *args):
+        self.total += 1
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, max(0, round(p / 100 * len(ordenados)) - 1))
+    return ordenados[indice]
+
+
+def datos_registrar_consumo(db):
+    """Formulario válido: el insumo con más stock y un trabajador con su centro"""
+    from models import StockInsumo, Trabajador
+    insumo_id = db.session.query(StockInsumo.insumo_id).order_by(StockInsumo.saldo.desc()).limit(1).scalar()
+    trabajador = Trabajador.query.order_by(Trabajador.id).first()
+    return {
+        'insumo_id': str(insumo_id),
+        'cantidad_unidades': '1',
+        'proyecto': 'BENCH',
+        'observaciones': '',
+        'centro_consumo_id': str(trabajador.centro_consumo_id),
+        'trabajador_id': str(trabajador.id),
+    }
+
+
+def medir_ruta(cliente, contador, metodo, url, datos, iteraciones):
+    def pedir():
+        if metodo == 'POST':
+            respuesta = cliente.post(url, data=datos)
+        else:
+            respuesta = cliente.get(url)
+        respuesta.get_data()
+        respuesta.close()
+        return respuesta.status_code
+
+    estado = pedir()  # calentamiento
+
+    tiempos = []
+    consultas = []
+    for _ in range(iteraciones):
+        antes = contador.total
+        t0 = time.perf_counter()
+        pedir()
+        tiempos.append(time.perf_counter() - t0)
+        consultas.append(contador.total - antes)
+
+    tracemalloc.start()
+    pedir()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'estado': estado,
+        'p50_ms': percentil(tiempos, 50) * 1000,
+        'p95_ms': percentil(tiempos, 95) * 1000,
+        'consultas': max(consultas),
+        'pico_memoria_kb': pico / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--escalas', default='1000,10000,100000',
+                        help='Cantidades de consumos a generar, separadas por coma')
+    parser.add_argument('--iteraciones', type=int, default=10)
+    parser.add_argument('--rutas', help='Nombres de rutas a medir, separados por coma (por defecto todas)')
+    parser.add_argument('--json', help='Guarda los resultados en este archivo')
+    args = parser.parse_args()
+
+    escalas = [int(e) for e in args.escalas.split(',')]
+    rutas = RUTAS
+    if args.rutas:
+        nombres = set(args.rutas.split(','))
+        rutas = [r for r in RUTAS if r[0] in nombres]
+
+    # La aplicación toma la base de DATABASE_URL al importarse
+    directorio = tempfile.mkdtemp()
+    ruta_db = os.path.join(directorio, 'benchmark.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{ruta_db}'
+
+    from app import app, db
+    from buscador import reiniciar_buscador
+    from dashboard import reiniciar_dashboard
+    from generar_datos import generar_datos
+    from models import Usuario, Consumo
+    from pronosticos import reiniciar_pronosticos
+
+    app.config['TESTING'] = True
+    resultados = {}
+    excedidas = []
+    adaptador = app.url_map.bind('localhost')
+
+    with app.app_context():
+        contador = ContadorConsultas(db.engine)
+
+    for consumos in escalas:
+        # Cada petición debe abrir su propio contexto (y su propia sesión),
+        # así que la preparación se hace en un contexto aparte
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            insumos = min(2000, max(50, consumos // 100))
+            print(f"📦 Escala {consumos:,} consumos / {insumos:,} insumos: generando datos...")
+            generar_datos(db.engine, insumos=insumos, centros=6, trabajadores=40,
+                          compras=max(100, consumos // 20), consumos=consumos)
+
+            admin = Usuario(username='bench', rol='admin', nombre='Benchmark')
+            admin.set_password('bench')
+            db.session.add(admin)
+            db.session.commit()
+            sesion_admin = {'user_id': admin.id, 'username': admin.username,
+                            'user_rol': admin.rol, 'user_nombre': admin.nombre}
+            datos_post = datos_registrar_consumo(db)
+        reiniciar_buscador()
+        reiniciar_dashboard()
+        reiniciar_pronosticos()
+
+        cliente = app.test_client()
+        with cliente.session_transaction() as sesion:
+            sesion.update(sesion_admin)
+
+        resultados[consumos] = {}
+        for nombre, metodo, url in rutas:
+            medicion = medir_ruta(cliente, contador, metodo, url,
+                                  datos_post if metodo == 'POST' else None, args.iteraciones)
+            resultados[consumos][nombre] = medicion
+            endpoint, _ = adaptador.match(url.split('?')[0], metodo)
+            presupuesto = getattr(app.view_functions[endpoint], 'presupuesto_consultas', None)
+            aviso = ''
+            if presupuesto is not None and medicion['consultas'] > presupuesto:
+                aviso = f'  ❌ presupuesto {presupuesto}'
+                excedidas.append((consumos, nombre, medicion['consultas'], presupuesto))
+            print(f"   {nombre:<26} {medicion['estado']}  p50 {medicion['p50_ms']:9.1f} ms  "
+                  f"p95 {medicion['p95_ms']:9.1f} ms  {medicion['consultas']:6d} consultas  "
+                  f"{medicion['pico_memoria_kb']:10.0f} KiB{aviso}")
+
+        with app.app_context():
+            total = db.session.query(func.count(Consumo.id)).scalar()
+        print(f"   ({total:,} consumos al terminar la escala)")
+
+    with app.app_context():
+        db.engine.dispose()
+
+    os.remove(ruta_db)
+    os.rmdir(directorio)
+
+    if args.json:
+        with open(args.json, 'w') as archivo:
+            json.dump(resultados, archivo, indent=2)
+        print(f"💾 Resultados guardados en {args.json}")
+
+    if excedidas:
+        for consumos, nombre, consultas, presupuesto in excedidas:
+            print(f"❌ {nombre} ({consumos:,} consumos): {consultas} consultas, presupuesto {presupuesto}")
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
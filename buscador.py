@@ -0,0 +1,288 @@
+# buscador.py
+"""Índice de búsqueda de insumos para el autocomplete.
+
+Hay dos implementaciones:
+- IndiceInsumos: índice en memoria de prefijos y trigramas (cualquier base).
+- BuscadorFTS5: tabla virtual FTS5 de SQLite con tokenizer trigram, que se
+  mantiene sola mediante triggers (todos los workers ven los cambios).
+
+La tabla y los triggers los crea la migración b8e0c2d4f6a1 (que también carga
+el índice una vez) o db.create_all() en las bases de desarrollo; la app solo
+verifica que existan. Con BUSCADOR_BACKEND = 'auto' se usa FTS5 si la base
+es SQLite y tiene la tabla.
+"""
+import logging
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+
+from flask import current_app
+from sqlalchemy import event, text
+from sqlalchemy.exc import OperationalError
+
+from models import db, Insumo
+
+logger = logging.getLogger('stock.buscador')
+
+CAMPOS_BUSQUEDA = ('denominacion', 'tipo', 'modelo', 'codigo_barras')
+
+# Cada worker reconstruye su índice en memoria cada tanto para ver
+# los cambios hechos por otros workers
+TTL_INDICE_POR_DEFECTO = 300
+
+
+def normalizar(texto):
+    """Minúsculas y sin acentos"""
+    if not texto:
+        return ''
+    texto = unicodedata.normalize('NFKD', str(texto).lower())
+    return ''.join(c for c in texto if not unicodedata.combining(c)).strip()
+
+
+def trigramas(texto):
+    texto = f'  {texto} '
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+class IndiceInsumos:
+    """Índice en memoria de prefijos de palabras y trigramas por insumo"""
+
+    def __init__(self, ttl=TTL_INDICE_POR_DEFECTO):
+        self.ttl = ttl
+        self.construido_en = None
+        self._lock = threading.Lock()
+        self._documentos = {}
+        self._prefijos = defaultdict(set)
+        self._trigramas = defaultdict(set)
+
+    def vencido(self):
+        return self.construido_en is None or time.monotonic() - self.construido_en > self.ttl
+
+    def construir(self, insumos):
+        with self._lock:
+            self._documentos = {}
+            self._prefijos = defaultdict(set)
+            self._trigramas = defaultdict(set)
+            for insumo in insumos:
+                self._agregar(insumo)
+            self.construido_en = time.monotonic()
+
+    def actualizar(self, insumo):
+        with self._lock:
+            self._quitar(insumo.id)
+            self._agregar(insumo)
+
+    def quitar(self, insumo_id):
+        with self._lock:
+            self._quitar(insumo_id)
+
+    def _agregar(self, insumo):
+        campos = {campo: normalizar(getattr(insumo, campo)) for campo in CAMPOS_BUSQUEDA}
+        palabras = {p for campo in CAMPOS_BUSQUEDA for p in campos[campo].split()}
+        tris = set()
+        for campo in CAMPOS_BUSQUEDA:
+            tris |= trigramas(campos[campo])
+
+        self._documentos[insumo.id] = {
+            'campos': campos,
+            'palabras': palabras,
+            'trigramas': tris,
+            'orden': campos['denominacion'],
+        }
+        for palabra in palabras:
+            for i in range(1, len(palabra) + 1):
+                self._prefijos[palabra[:i]].add(insumo.id)
+        for tri in tris:
+            self._trigramas[tri].add(insumo.id)
+
+    def _quitar(self, insumo_id):
+        documento = self._documentos.pop(insumo_id, None)
+        if documento is None:
+            return
+        for palabra in documento['palabras']:
+            for i in range(1, len(palabra) + 1):
+                self._prefijos[palabra[:i]].discard(insumo_id)
+        for tri in documento['trigramas']:
+            self._trigramas[tri].discard(insumo_id)
+
+    def buscar(self, texto, limite=20):
+        """Devuelve los ids de insumo ordenados por relevancia"""
+        consulta = normalizar(texto)
+        tokens = consulta.split()
+        if not tokens:
+            return []
+
+        with self._lock:
+            # Todos los términos deben ser prefijo de alguna palabra
+            candidatos = set(self._prefijos.get(tokens[0], ()))
+            for token in tokens[1:]:
+                candidatos &= self._prefijos.get(token, set())
+
+            # Coincidencias dentro de las palabras (lo que hacía ILIKE '%q%')
+            # y búsquedas aproximadas por trigramas
+            tris_consulta = trigramas(consulta)
+            coincidencias = defaultdict(int)
+            for tri in tris_consulta:
+                for insumo_id in self._trigramas.get(tri, ()):
+                    coincidencias[insumo_id] += 1
+            minimo = max(1, len(tris_consulta) // 2)
+            candidatos |= {i for i, n in coincidencias.items() if n >= minimo}
+
+            resultados = []
+            for insumo_id in candidatos:
+                documento = self._documentos[insumo_id]
+                puntaje = self._puntaje(documento, consulta, tokens,
+                                        coincidencias.get(insumo_id, 0) / len(tris_consulta))
+                resultados.append((-puntaje, documento['orden'], insumo_id))
+
+        resultados.sort()
+        return [insumo_id for _, _, insumo_id in resultados[:limite]]
+
+    @staticmethod
+    def _puntaje(documento, consulta, tokens, similitud):
+        campos = documento['campos']
+        if campos['codigo_barras'] and campos['codigo_barras'] == consulta:
+            return 100
+        puntaje = similitud * 10
+        if all(any(p.startswith(t) for p in documento['palabras']) for t in tokens):
+            puntaje += 50
+        if any(valor.startswith(consulta) for valor in campos.values()):
+            puntaje += 20
+        elif any(consulta in valor for valor in campos.values()):
+            puntaje += 30 if len(tokens) == 1 else 10
+        return puntaje
+
+
+class BuscadorFTS5:
+    """Búsqueda con una tabla virtual FTS5 (tokenizer trigram) de SQLite"""
+
+    SENTENCIAS = [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS insumo_busqueda USING fts5("
+        "denominacion, tipo, modelo, codigo_barras, "
+        "content='insumo', content_rowid='id', tokenize='trigram')",
+        "CREATE TRIGGER IF NOT EXISTS insumo_busqueda_ai AFTER INSERT ON insumo BEGIN "
+        "INSERT INTO insumo_busqueda(rowid, denominacion, tipo, modelo, codigo_barras) "
+        "VALUES (new.id, new.denominacion, new.tipo, new.modelo, new.codigo_barras); END",
+        "CREATE TRIGGER IF NOT EXISTS insumo_busqueda_ad AFTER DELETE ON insumo BEGIN "
+        "INSERT INTO insumo_busqueda(insumo_busqueda, rowid, denominacion, tipo, modelo, codigo_barras) "
+        "VALUES ('delete', old.id, old.denominacion, old.tipo, old.modelo, old.codigo_barras); END",
+        "CREATE TRIGGER IF NOT EXISTS insumo_busqueda_au AFTER UPDATE ON insumo BEGIN "
+        "INSERT INTO insumo_busqueda(insumo_busqueda, rowid, denominacion, tipo, modelo, codigo_barras) "
+        "VALUES ('delete', old.id, old.denominacion, old.tipo, old.modelo, old.codigo_barras); "
+        "INSERT INTO insumo_busqueda(rowid, denominacion, tipo, modelo, codigo_barras) "
+        "VALUES (new.id, new.denominacion, new.tipo, new.modelo, new.codigo_barras); END",
+    ]
+
+    # El tokenizer trigram necesita al menos 3 caracteres
+    LONGITUD_MINIMA = 3
+
+    @classmethod
+    def disponible(cls):
+        """True si la base es SQLite y tiene la tabla insumo_busqueda"""
+        if db.engine.dialect.name != 'sqlite':
+            return False
+        with db.engine.connect() as conn:
+            return conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'insumo_busqueda'"
+            )).first() is not None
+
+    def buscar(self, texto, limite=20):
+        consulta = texto.strip()
+        if not consulta or min(len(t) for t in consulta.split()) < self.LONGITUD_MINIMA:
+            return None
+        # Cada término entre comillas para que no se interprete la sintaxis de FTS5
+        terminos = ' '.join('"{}"'.format(t.replace('"', '""')) for t in consulta.split())
+        filas = db.session.execute(text(
+            "SELECT rowid FROM insumo_busqueda WHERE insumo_busqueda MATCH :q "
+            "ORDER BY bm25(insumo_busqueda, 10.0, 5.0, 5.0, 20.0) LIMIT :limite"
+        ), {'q': terminos, 'limite': limite})
+        return [fila[0] for fila in filas]
+
+
+@event.listens_for(Insumo.__table__, 'after_create')
+def _crear_fts5(tabla, conexion, **kwargs):
+    """Con db.create_all() (bases de desarrollo y benchmarks) la tabla FTS5 se crea con insumo"""
+    if conexion.dialect.name != 'sqlite':
+        return
+    try:
+        for sentencia in BuscadorFTS5.SENTENCIAS:
+            conexion.execute(text(sentencia))
+    except OperationalError as e:
+        # SQLite sin FTS5 o sin tokenizer trigram (< 3.34): se usa el índice en memoria
+        logger.warning('Búsqueda FTS5 no disponible: %s', e)
+
+
+@event.listens_for(Insumo.__table__, 'after_drop')
+def _eliminar_fts5(tabla, conexion, **kwargs):
+    # Los triggers se eliminan con insumo; la tabla virtual no
+    if conexion.dialect.name == 'sqlite':
+        conexion.execute(text('DROP TABLE IF EXISTS insumo_busqueda'))
+
+
+_indice = IndiceInsumos()
+_fts5 = None
+_fts5_verificado = False
+_lock_fts5 = threading.Lock()
+
+
+def _obtener_fts5():
+    global _fts5, _fts5_verificado
+    backend = current_app.config.get('BUSCADOR_BACKEND', 'auto')
+    if backend == 'memoria':
+        return None
+    with _lock_fts5:
+        if not _fts5_verificado:
+            _fts5 = BuscadorFTS5() if BuscadorFTS5.disponible() else None
+            _fts5_verificado = True
+    return _fts5
+
+
+def _indice_actualizado():
+    if _indice.vencido():
+        _indice.ttl = current_app.config.get('BUSCADOR_TTL_SEGUNDOS', TTL_INDICE_POR_DEFECTO)
+        columnas = [getattr(Insumo, campo) for campo in CAMPOS_BUSQUEDA]
+        _indice.construir(db.session.query(Insumo.id, *columnas))
+    return _indice
+
+
+def buscar_insumo_ids(texto, limite=20):
+    """Ids de insumos que coinciden con el texto, del más al menos relevante"""
+    fts5 = _obtener_fts5()
+    if fts5 is not None:
+        ids = fts5.buscar(texto, limite)
+        # Sin resultados exactos se prueba la búsqueda aproximada en memoria
+        if ids:
+            return ids
+    return _indice_actualizado().buscar(texto, limite)
+
+
+def inicializar_buscador():
+    """Prepara el backend de búsqueda (se llama al iniciar la aplicación)"""
+    if _obtener_fts5() is None:
+        _indice_actualizado()
+
+
+def insumo_modificado(insumo):
+    """Refleja en el índice en memoria un insumo creado o editado"""
+    if _indice.construido_en is not None:
+        _indice.actualizar(insumo)
+
+
+def insumo_eliminado(insumo_id):
+    if _indice.construido_en is not None:
+        _indice.quitar(insumo_id)
+
+
+def invalidar_indice():
+    """Fuerza reconstruir el índice en memoria en la próxima búsqueda (tras cargas masivas)"""
+    _indice.construido_en = None
+
+
+def reiniciar_buscador():
+    """Descarta el índice y vuelve a preparar el backend (tras recrear las tablas)"""
+    global _fts5, _fts5_verificado
+    with _lock_fts5:
+        _fts5 = None
+        _fts5_verificado = False
+    _indice.construido_en = None
@@ -0,0 +1,36 @@
+# cargas.py
+"""Perfiles de carga de relaciones para los listados.
+
+Las relaciones de los modelos son lazy='select': cada `compra.insumo` o
+`trabajador.centro_consumo` que toca una plantilla es una consulta por fila
+(N+1). Cada vista pide su perfil con con_perfil(consulta, nombre), que
+agrega las opciones de carga que necesita su plantilla:
+
+- joinedload para las relaciones a uno (mismo SELECT con JOIN)
+- selectinload para las colecciones (una consulta extra con IN para todas
+  las filas, no una por fila)
+
+Los presupuestos de consultas de las rutas (metricas.presupuesto_consultas)
+detectan cuando una plantilla empieza a usar una relación que su perfil
+no carga.
+"""
+from sqlalchemy.orm import joinedload, selectinload
+
+from models import Compra, CentroConsumo, Trabajador
+
+# Funciones: los backref (Compra.insumo, Trabajador.centro_consumo) existen
+# recién cuando SQLAlchemy configura los mappers
+PERFILES = {
+    # listado_compras.html: insumo (su saldo se carga junto, lazy='joined')
+    'compras': lambda: (joinedload(Compra.insumo, innerjoin=True),),
+    # gestion_trabajadores.html, get_trabajador y trabajadores por centro
+    'trabajadores': lambda: (joinedload(Trabajador.centro_consumo, innerjoin=True),),
+    # Trabajadores por centro de listado_consumos.html (los conteos de
+    # gestion_centros.html salen de reportes.contar_por_centro)
+    'centros': lambda: (selectinload(CentroConsumo.trabajadores),),
+}
+
+
+def con_perfil(consulta, nombre):
+    """Agrega a la consulta las opciones de carga del perfil"""
+    return consulta.options(*PERFILES[nombre]())
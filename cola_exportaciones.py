@@ -0,0 +1,247 @@
+# cola_exportaciones.py
+"""Exportaciones armadas en segundo plano.
+
+La petición solo registra un TrabajoExportacion y lo encola. Un pool de hilos
+del mismo proceso arma el archivo en EXPORTACIONES_DIR y va anotando las filas
+escritas, así el worker de gunicorn queda libre y el navegador consulta el
+estado hasta que puede descargar. Estado y descarga salen de la tabla, por lo
+que responde cualquier worker (el directorio debe ser común a todos).
+
+Un pedido con los mismos parámetros que un trabajo en curso, o que uno
+terminado hace menos de EXPORTACIONES_TTL segundos, devuelve ese trabajo en
+vez de armar otro archivo. Los archivos vencidos se borran al encolar y con
+`flask purgar-exportaciones`.
+
+Mientras un trabajo está en la cola o armándose, el pool de su proceso
+estampa actualizado_en (y las filas escritas) cada LATIDO segundos, incluso
+durante el guardado final de xlsx/parquet, que no escribe filas. Un trabajo
+sin latido en SIN_AVANCE segundos (el worker que lo tenía se reinició) se
+informa como error, ya no se reutiliza y purgar() lo borra; los trabajos del
+pool del propio proceso nunca se purgan.
+"""
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import bindparam, update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm.exc import StaleDataError
+
+from models import db, TrabajoExportacion
+from exportaciones import CONJUNTOS, FORMATOS, escribir_exportacion
+
+logger = logging.getLogger('stock.exportaciones')
+
+ESTADO_PENDIENTE = 'pendiente'
+ESTADO_PROCESANDO = 'procesando'
+ESTADO_TERMINADO = 'terminado'
+ESTADO_ERROR = 'error'
+
+WORKERS_POR_DEFECTO = 2
+TTL_POR_DEFECTO = 600
+DIRECTORIO_POR_DEFECTO = os.path.join(tempfile.gettempdir(), 'sistema-stock-exportaciones')
+
+# Cada cuántos segundos se anotan el latido y las filas de los trabajos del pool
+LATIDO = 2
+# Segundos sin latido tras los que un trabajo en cola o en curso se da por perdido
+SIN_AVANCE = 300
+
+
+def clave_exportacion(conjunto, formato):
+    return f'{conjunto}:{formato}'
+
+
+def trabajo_abandonado(trabajo, ahora=None):
+    ahora = ahora or datetime.utcnow()
+    return (trabajo.estado in (ESTADO_PENDIENTE, ESTADO_PROCESANDO)
+            and trabajo.actualizado_en < ahora - timedelta(seconds=SIN_AVANCE))
+
+
+def archivo_disponible(trabajo, ahora=None):
+    ahora = ahora or datetime.utcnow()
+    return (trabajo.estado == ESTADO_TERMINADO and trabajo.expira_en > ahora
+            and os.path.exists(trabajo.archivo))
+
+
+def nombre_descarga(trabajo):
+    fecha = (trabajo.terminado_en or trabajo.created_at).strftime('%Y%m%d_%H%M')
+    return f"{CONJUNTOS[trabajo.conjunto].archivo}_{fecha}.{FORMATOS[trabajo.formato].extension}"
+
+
+def trabajo_a_dict(trabajo):
+    """Estado del trabajo para la API (un trabajo abandonado se informa como error)"""
+    estado, error = trabajo.estado, trabajo.error
+    if trabajo_abandonado(trabajo):
+        estado, error = ESTADO_ERROR, 'El trabajo dejó de avanzar (se reinició el proceso que lo armaba)'
+    return {
+        'id': trabajo.id,
+        'conjunto': trabajo.conjunto,
+        'formato': trabajo.formato,
+        'estado': estado,
+        'filas': trabajo.filas,
+        'tamano': trabajo.tamano,
+        'error': error,
+        'creado': trabajo.created_at.isoformat() if trabajo.created_at else None,
+        'terminado': trabajo.terminado_en.isoformat() if trabajo.terminado_en else None,
+        'expira': trabajo.expira_en.isoformat() if trabajo.expira_en else None,
+    }
+
+
+class ColaExportaciones:
+    """Pool de hilos que arma los trabajos encolados por este proceso"""
+
+    def __init__(self, app):
+        self.app = app
+        self.directorio = app.config.get('EXPORTACIONES_DIR', DIRECTORIO_POR_DEFECTO)
+        self.ttl = app.config.get('EXPORTACIONES_TTL', TTL_POR_DEFECTO)
+        # Los hilos se crean recién con el primer trabajo
+        self.pool = ThreadPoolExecutor(app.config.get('EXPORTACIONES_WORKERS', WORKERS_POR_DEFECTO),
+                                       thread_name_prefix='exportacion')
+        # {trabajo_id: filas escritas} de los trabajos en cola o en curso en este proceso
+        self.en_curso = {}
+        self._lock = threading.Lock()
+        self._latido = None
+        self._detener = threading.Event()
+
+    def encolar(self, conjunto, formato, usuario_id=None):
+        """Devuelve (trabajo, reutilizado): el vigente con los mismos parámetros o uno nuevo"""
+        if conjunto not in CONJUNTOS or formato not in FORMATOS:
+            raise ValueError(f'Exportaciones disponibles: {", ".join(CONJUNTOS)} en {", ".join(FORMATOS)}')
+        self.purgar()
+
+        clave = clave_exportacion(conjunto, formato)
+        ahora = datetime.utcnow()
+        vigentes = TrabajoExportacion.query.filter(
+            TrabajoExportacion.clave == clave,
+            TrabajoExportacion.estado.in_([ESTADO_PENDIENTE, ESTADO_PROCESANDO, ESTADO_TERMINADO])
+        ).order_by(TrabajoExportacion.id.desc()).limit(5)
+        for trabajo in vigentes:
+            if archivo_disponible(trabajo, ahora) or (
+                    trabajo.estado != ESTADO_TERMINADO and not trabajo_abandonado(trabajo, ahora)):
+                return trabajo, True
+
+        trabajo = TrabajoExportacion(clave=clave, conjunto=conjunto, formato=formato,
+                                     usuario_id=usuario_id, estado=ESTADO_PENDIENTE,
+                                     filas=0, created_at=ahora, actualizado_en=ahora)
+        db.session.add(trabajo)
+        db.session.commit()
+        with self._lock:
+            self.en_curso[trabajo.id] = 0
+            if self._latido is None:
+                self._latido = threading.Thread(target=self._latir, name='exportacion-latido', daemon=True)
+                self._latido.start()
+        self.pool.submit(self._ejecutar, trabajo.id)
+        return trabajo, False
+
+    def _latir(self):
+        """Estampa los trabajos en cola o en curso del pool cada LATIDO segundos"""
+        while not self._detener.wait(LATIDO):
+            with self._lock:
+                parametros = [{'b_id': trabajo_id, 'b_filas': filas}
+                              for trabajo_id, filas in self.en_curso.items()]
+            if not parametros:
+                continue
+            # Conexión propia: las sesiones de los trabajos tienen cursores abiertos
+            try:
+                with self.app.app_context(), db.engine.begin() as conexion:
+                    tabla = TrabajoExportacion.__table__
+                    conexion.execute(update(tabla)
+                                     .where(tabla.c.id == bindparam('b_id'))
+                                     .values(filas=bindparam('b_filas'), actualizado_en=datetime.utcnow()),
+                                     parametros)
+            except OperationalError:
+                # Si la base está ocupada se anota en el próximo latido
+                logger.warning('No se pudo anotar el latido de %s exportaciones', len(parametros))
+            except Exception:
+                logger.exception('Error al anotar el latido de las exportaciones')
+
+    def _ejecutar(self, trabajo_id):
+        with self.app.app_context():
+            try:
+                trabajo = db.session.get(TrabajoExportacion, trabajo_id)
+                if trabajo is None:
+                    logger.warning('La exportación %s ya no existe', trabajo_id)
+                else:
+                    self._armar(trabajo)
+            except Exception:
+                logger.exception('Error en el trabajo de exportación %s', trabajo_id)
+            finally:
+                with self._lock:
+                    self.en_curso.pop(trabajo_id, None)
+                db.session.remove()
+
+    def _armar(self, trabajo):
+        trabajo.estado = ESTADO_PROCESANDO
+        trabajo.actualizado_en = datetime.utcnow()
+        db.session.commit()
+
+        trabajo_id = trabajo.id
+        conjunto = CONJUNTOS[trabajo.conjunto]
+        formato = FORMATOS[trabajo.formato]
+        contador = {'filas': 0}
+
+        def filas():
+            for valores in conjunto.filas():
+                yield valores
+                contador['filas'] += 1
+                self.en_curso[trabajo_id] = contador['filas']
+
+        os.makedirs(self.directorio, exist_ok=True)
+        ruta = os.path.join(self.directorio, f'{trabajo_id}.{formato.extension}')
+        parcial = ruta + '.parcial'
+        try:
+            with open(parcial, 'wb') as destino:
+                escribir_exportacion(destino, conjunto._replace(filas=filas), formato)
+            os.replace(parcial, ruta)
+        except Exception as e:
+            logger.exception('Error al armar la exportación %s', trabajo_id)
+            db.session.rollback()
+            if os.path.exists(parcial):
+                os.remove(parcial)
+            trabajo.estado = ESTADO_ERROR
+            trabajo.error = str(e)
+        else:
+            # Cierra la lectura antes de escribir el resultado
+            db.session.rollback()
+            ahora = datetime.utcnow()
+            trabajo.estado = ESTADO_TERMINADO
+            trabajo.archivo = ruta
+            trabajo.tamano = os.path.getsize(ruta)
+            trabajo.terminado_en = ahora
+            trabajo.expira_en = ahora + timedelta(seconds=self.ttl)
+        trabajo.filas = contador['filas']
+        trabajo.actualizado_en = datetime.utcnow()
+        try:
+            db.session.commit()
+        except StaleDataError:
+            # El trabajo se borró mientras se armaba: el archivo no tiene dueño
+            db.session.rollback()
+            logger.warning('La exportación %s se borró mientras se armaba', trabajo_id)
+            if os.path.exists(ruta):
+                os.remove(ruta)
+
+    def purgar(self):
+        """Borra los archivos vencidos y sus trabajos, y los trabajos con error o
+        sin latido hace más del TTL (salvo los de este proceso). Devuelve cuántos trabajos borró"""
+        ahora = datetime.utcnow()
+        sin_avance = ahora - timedelta(seconds=max(self.ttl, SIN_AVANCE))
+        with self._lock:
+            propios = set(self.en_curso)
+        vencidos = [trabajo for trabajo in TrabajoExportacion.query.filter(
+            ((TrabajoExportacion.estado == ESTADO_TERMINADO) & (TrabajoExportacion.expira_en <= ahora))
+            | ((TrabajoExportacion.estado != ESTADO_TERMINADO) & (TrabajoExportacion.actualizado_en <= sin_avance))
+        ) if trabajo.id not in propios]
+        for trabajo in vencidos:
+            if trabajo.archivo and os.path.exists(trabajo.archivo):
+                os.remove(trabajo.archivo)
+            db.session.delete(trabajo)
+        if vencidos:
+            db.session.commit()
+        return len(vencidos)
+
+    def detener(self):
+        self.pool.shutdown(wait=True)
+        self._detener.set()
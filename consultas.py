@@ -0,0 +1,170 @@
+# consultas.py
+"""Consultas paginadas para los listados (paginación por cursor)"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, or_, and_
+
+from models import db, Insumo, Consumo, CentroConsumo, Trabajador
+from costeo import expresion_costo_consumo
+
+LIMITE_POR_DEFECTO = 50
+LIMITE_MAXIMO = 200
+
+
+class FiltroInvalido(ValueError):
+    """Parámetro de filtro o cursor con formato incorrecto"""
+
+
+def _leer_fecha(valor, nombre):
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d')
+    except ValueError:
+        raise FiltroInvalido(f'Fecha inválida en "{nombre}": use AAAA-MM-DD')
+
+
+def _leer_entero(valor, nombre):
+    try:
+        return int(valor)
+    except ValueError:
+        raise FiltroInvalido(f'Valor inválido en "{nombre}"')
+
+
+def leer_filtros_consumos(args):
+    """Convierte los parámetros del request en un diccionario de filtros"""
+    filtros = {}
+    if args.get('desde'):
+        filtros['desde'] = _leer_fecha(args['desde'], 'desde')
+    if args.get('hasta'):
+        # "hasta" incluye el día completo
+        filtros['hasta'] = _leer_fecha(args['hasta'], 'hasta') + timedelta(days=1)
+    for campo in ('centro_id', 'trabajador_id', 'insumo_id'):
+        if args.get(campo):
+            filtros[campo] = _leer_entero(args[campo], campo)
+    if args.get('proyecto', '').strip():
+        filtros['proyecto'] = args['proyecto'].strip()
+    return filtros
+
+
+def aplicar_filtros_consumos(query, filtros):
+    """Agrega a la consulta las condiciones de los filtros"""
+    if 'desde' in filtros:
+        query = query.filter(Consumo.fecha_consumo >= filtros['desde'])
+    if 'hasta' in filtros:
+        query = query.filter(Consumo.fecha_consumo < filtros['hasta'])
+    if 'centro_id' in filtros:
+        query = query.filter(Consumo.centro_consumo_id == filtros['centro_id'])
+    if 'trabajador_id' in filtros:
+        query = query.filter(Consumo.trabajador_id == filtros['trabajador_id'])
+    if 'insumo_id' in filtros:
+        query = query.filter(Consumo.insumo_id == filtros['insumo_id'])
+    if 'proyecto' in filtros:
+        query = query.filter(Consumo.proyecto.ilike(f"%{filtros['proyecto']}%"))
+    return query
+
+
+def codificar_cursor(fecha, consumo_id):
+    """Cursor opaco con la posición (fecha_consumo, id) del último consumo enviado"""
+    return f"{fecha.isoformat()}|{consumo_id}"
+
+
+def decodificar_cursor(cursor):
+    try:
+        fecha, consumo_id = cursor.split('|')
+        return datetime.fromisoformat(fecha), int(consumo_id)
+    except ValueError:
+        raise FiltroInvalido('Cursor inválido')
+
+
+def obtener_pagina_consumos(filtros, cursor=None, limite=LIMITE_POR_DEFECTO, ascendente=False):
+    """Devuelve (filas, siguiente_cursor) ordenando por fecha_consumo e id.
+
+    siguiente_cursor es None cuando no quedan más consumos.
+    """
+    limite = max(1, min(limite, LIMITE_MAXIMO))
+
+    query = db.session.query(
+        Consumo.id,
+        Consumo.fecha_consumo,
+        Consumo.cantidad_unidades,
+        Consumo.proyecto,
+        Consumo.observaciones,
+        Insumo.denominacion,
+        Insumo.tipo,
+        Insumo.modelo,
+        Insumo.cantidad_por_caja,
+        Insumo.precio_unitario,
+        Consumo.costo,
+        CentroConsumo.nombre.label('centro_nombre'),
+        Trabajador.nombre.label('trabajador_nombre'),
+        Trabajador.codigo.label('trabajador_codigo')
+    ).join(Insumo, Consumo.insumo_id == Insumo.id) \
+     .join(CentroConsumo, Consumo.centro_consumo_id == CentroConsumo.id) \
+     .join(Trabajador, Consumo.trabajador_id == Trabajador.id)
+
+    query = aplicar_filtros_consumos(query, filtros)
+
+    if cursor:
+        fecha, consumo_id = decodificar_cursor(cursor)
+        if ascendente:
+            query = query.filter(or_(
+                Consumo.fecha_consumo > fecha,
+                and_(Consumo.fecha_consumo == fecha, Consumo.id > consumo_id)
+            ))
+        else:
+            query = query.filter(or_(
+                Consumo.fecha_consumo < fecha,
+                and_(Consumo.fecha_consumo == fecha, Consumo.id < consumo_id)
+            ))
+
+    if ascendente:
+        query = query.order_by(Consumo.fecha_consumo.asc(), Consumo.id.asc())
+    else:
+        query = query.order_by(Consumo.fecha_consumo.desc(), Consumo.id.desc())
+
+    # Se pide una fila extra para saber si hay otra página
+    filas = query.limit(limite + 1).all()
+    siguiente_cursor = None
+    if len(filas) > limite:
+        filas = filas[:limite]
+        ultima = filas[-1]
+        siguiente_cursor = codificar_cursor(ultima.fecha_consumo, ultima.id)
+    return filas, siguiente_cursor
+
+
+def consumo_a_dict(fila):
+    """Serializa una fila de obtener_pagina_consumos para la respuesta JSON"""
+    cantidad = float(fila.cantidad_unidades)
+    return {
+        'id': fila.id,
+        'fecha': fila.fecha_consumo.strftime('%d/%m/%Y'),
+        'hora': fila.fecha_consumo.strftime('%H:%M'),
+        'insumo': fila.denominacion,
+        'tipo': fila.tipo,
+        'modelo': fila.modelo,
+        'cantidad_unidades': cantidad,
+        'cajas_equivalentes': cantidad / fila.cantidad_por_caja if fila.cantidad_por_caja else 0,
+        'centro_nombre': fila.centro_nombre,
+        'trabajador_nombre': fila.trabajador_nombre,
+        'trabajador_codigo': fila.trabajador_codigo,
+        'proyecto': fila.proyecto,
+        'observaciones': fila.observaciones,
+        'costo_consumo': fila.costo if fila.costo is not None else cantidad * fila.precio_unitario
+    }
+
+
+def obtener_resumen_consumos(filtros):
+    """Totales de los consumos filtrados (cantidad, unidades, costo y centros)"""
+    query = db.session.query(
+        func.count(Consumo.id),
+        func.coalesce(func.sum(Consumo.cantidad_unidades), 0),
+        func.coalesce(func.sum(expresion_costo_consumo()), 0),
+        func.count(func.distinct(Consumo.centro_consumo_id))
+    ).join(Insumo, Consumo.insumo_id == Insumo.id)
+
+    total, unidades, costo, centros = aplicar_filtros_consumos(query, filtros).one()
+    return {
+        'total_consumos': total,
+        'total_unidades': float(unidades),
+        'costo_total': float(costo),
+        'centros': centros
+    }
@@ -0,0 +1,299 @@
+# costeo.py
+"""Costeo FIFO de los consumos por lote de compra (tablas lote_stock y consumo_lote).
+
+Cada compra crea un lote con sus unidades y su costo unitario real
+(precio_caja_compra / cantidad_por_caja). Cada consumo toma unidades de los
+lotes abiertos de su insumo, del más viejo al más nuevo, y guarda en
+Consumo.costo el costo resultante: los reportes y exportaciones leen ese
+valor y ya no cambia cuando se edita el precio del insumo.
+
+La cola de cada insumo son sus filas de lote_stock con restante > 0 (índice
+parcial ix_lote_stock_abiertos): se actualiza con cada movimiento y no se
+recorre el historial. Las unidades que no cubre ningún lote (stock anterior
+al costeo) se valúan al precio unitario vigente del insumo.
+
+`flask costos --reconstruir` recalcula lotes y costos desde cero.
+"""
+from collections import defaultdict, deque
+from datetime import datetime
+
+from sqlalchemy import bindparam, case, delete, func, insert, inspect, literal, select, update
+
+from models import db, Insumo, Compra, Consumo, StockInsumo, LoteStock, ConsumoLote
+from rollups import reconstruir_rollups
+
+# Diferencia máxima aceptada al comparar unidades (son Float)
+TOLERANCIA = 1e-6
+# Insumos por tanda al reconstruir (acota la memoria)
+INSUMOS_POR_TANDA = 500
+
+
+class ColaLotes:
+    """Lotes abiertos de un insumo en orden FIFO: [lote_id, restante, costo_unitario]"""
+
+    def __init__(self, lotes=()):
+        self.lotes = deque([lote_id, restante, costo] for lote_id, restante, costo in lotes)
+        self.tocados = {}  # lote_id -> unidades tomadas
+
+    def tomar(self, cantidad):
+        """Toma `cantidad` unidades. Devuelve (asignaciones, costo, faltante)"""
+        asignaciones = []
+        costo = 0.0
+        while cantidad > TOLERANCIA and self.lotes:
+            lote = self.lotes[0]
+            unidades = min(cantidad, lote[1])
+            asignaciones.append((lote[0], unidades))
+            costo += unidades * lote[2]
+            self.tocados[lote[0]] = self.tocados.get(lote[0], 0.0) + unidades
+            lote[1] -= unidades
+            cantidad -= unidades
+            if lote[1] <= TOLERANCIA:
+                self.lotes.popleft()
+        return asignaciones, costo, max(cantidad, 0.0)
+
+
+def _lotes_abiertos(insumo_ids):
+    """{insumo_id: ColaLotes} con los lotes que tienen unidades"""
+    colas = defaultdict(ColaLotes)
+    lotes = LoteStock.__table__
+    consulta = select(lotes.c.insumo_id, lotes.c.id, lotes.c.restante, lotes.c.costo_unitario) \
+        .where(lotes.c.insumo_id.in_(insumo_ids), lotes.c.restante > 0) \
+        .order_by(lotes.c.insumo_id, lotes.c.fecha, lotes.c.id)
+    for insumo_id, lote_id, restante, costo in db.session.execute(consulta):
+        colas[insumo_id].lotes.append([lote_id, restante, costo])
+    return colas
+
+
+def _descontar_lotes(tocados, signo=-1):
+    """Suma signo * unidades a restante de cada lote, con un solo UPDATE por lotes"""
+    if not tocados:
+        return
+    tabla = LoteStock.__table__
+    db.session.execute(
+        update(tabla).where(tabla.c.id == bindparam('b_lote_id'))
+        .values(restante=tabla.c.restante + bindparam('b_unidades')),
+        [{'b_lote_id': lote_id, 'b_unidades': signo * unidades} for lote_id, unidades in tocados.items()]
+    )
+
+
+def _lotes_negativos(lote_ids):
+    """Insumos con algún lote que quedó con restante negativo (otro proceso tomó las mismas unidades)"""
+    if not lote_ids:
+        return []
+    return sorted({insumo_id for (insumo_id,) in db.session.query(LoteStock.insumo_id).filter(
+        LoteStock.id.in_(lote_ids), LoteStock.restante < -TOLERANCIA)})
+
+
+# === LOTES ===
+
+def crear_lote(compra, cantidad_por_caja):
+    """Agrega a la sesión el lote de una compra (después del flush de la compra)"""
+    unidades = compra.cantidad_cajas * cantidad_por_caja
+    lote = LoteStock(
+        compra_id=compra.id,
+        insumo_id=compra.insumo_id,
+        fecha=compra.fecha_compra or datetime.utcnow(),
+        fecha_vencimiento=compra.fecha_vencimiento,
+        unidades=unidades,
+        restante=unidades,
+        costo_unitario=compra.precio_caja_compra / cantidad_por_caja if cantidad_por_caja else 0.0,
+    )
+    db.session.add(lote)
+    return lote
+
+
+def _select_lotes_pendientes():
+    """SELECT con los valores de lote_stock de las compras que todavía no tienen lote"""
+    unidades = Compra.cantidad_cajas * Insumo.cantidad_por_caja
+    return select(
+        Compra.id, Compra.insumo_id, func.coalesce(Compra.fecha_compra, literal(datetime.utcnow())),
+        Compra.fecha_vencimiento, unidades, unidades,
+        case((Insumo.cantidad_por_caja > 0, Compra.precio_caja_compra / Insumo.cantidad_por_caja), else_=0.0)
+    ).join(Insumo, Insumo.id == Compra.insumo_id) \
+     .outerjoin(LoteStock, LoteStock.compra_id == Compra.id) \
+     .where(LoteStock.id.is_(None))
+
+
+COLUMNAS_LOTE = ['compra_id', 'insumo_id', 'fecha', 'fecha_vencimiento', 'unidades', 'restante', 'costo_unitario']
+
+
+def crear_lotes_pendientes(insumo_ids=None):
+    """Crea con un INSERT ... SELECT los lotes de las compras que no tienen (importaciones)"""
+    consulta = _select_lotes_pendientes()
+    if insumo_ids is not None:
+        consulta = consulta.where(Compra.insumo_id.in_(list(insumo_ids)))
+    db.session.execute(insert(LoteStock.__table__).from_select(COLUMNAS_LOTE, consulta))
+
+
+def reescalar_lotes(insumo_id, cantidad_anterior, cantidad_nueva):
+    """Ajusta los lotes de un insumo al cambiar su cantidad por caja.
+
+    Las compras se miden en cajas: cambian las unidades de cada lote (y su
+    costo unitario), no las que ya se consumieron de él.
+    """
+    if not cantidad_anterior or not cantidad_nueva:
+        return
+    factor = cantidad_nueva / cantidad_anterior
+    restante = LoteStock.restante + LoteStock.unidades * (factor - 1)
+    db.session.execute(
+        update(LoteStock).where(LoteStock.insumo_id == insumo_id).values(
+            restante=case((restante > 0, restante), else_=0.0),
+            unidades=LoteStock.unidades * factor,
+            costo_unitario=LoteStock.costo_unitario / factor,
+        ).execution_options(synchronize_session=False)
+    )
+
+
+# === CONSUMOS ===
+
+def costear_consumo(consumo):
+    """Asigna un consumo a los lotes abiertos de su insumo (FIFO) y guarda su costo.
+
+    Debe llamarse después de reservar el stock: ese UPDATE deja bloqueado el
+    saldo del insumo hasta el commit, así que dos consumos del mismo insumo
+    no pueden tomar las mismas unidades de un lote.
+    """
+    cola = _lotes_abiertos([consumo.insumo_id])[consumo.insumo_id]
+    asignaciones, costo, faltante = cola.tomar(consumo.cantidad_unidades)
+    if faltante:
+        costo += faltante * db.session.get(Insumo, consumo.insumo_id).precio_unitario
+
+    _descontar_lotes(cola.tocados)
+    if asignaciones:
+        db.session.execute(insert(ConsumoLote.__table__), [
+            {'consumo_id': consumo.id, 'lote_id': lote_id, 'unidades': unidades}
+            for lote_id, unidades in asignaciones
+        ])
+    consumo.costo = costo
+    return costo
+
+
+def solo_cambio_el_costo(consumo):
+    """True si el único campo modificado del consumo es su costo.
+
+    costear_consumo escribe el costo después del INSERT; ese UPDATE no cambia
+    unidades ni fechas, así que las cachés que escuchan after_update lo ignoran.
+    """
+    estado = inspect(consumo)
+    return all(not estado.attrs[columna.key].history.has_changes()
+               for columna in estado.mapper.column_attrs if columna.key != 'costo')
+
+
+def liberar_consumo(consumo):
+    """Devuelve a sus lotes las unidades de un consumo (antes de editarlo)"""
+    asignaciones = db.session.query(ConsumoLote.lote_id, ConsumoLote.unidades) \
+        .filter(ConsumoLote.consumo_id == consumo.id).all()
+    _descontar_lotes(dict(asignaciones), signo=1)
+    db.session.execute(delete(ConsumoLote).where(ConsumoLote.consumo_id == consumo.id)
+                       .execution_options(synchronize_session=False))
+    consumo.costo = None
+
+
+def insertar_consumos_costeados(valores, precios):
+    """Inserta consumos (dicts) costeados por FIFO, en orden de fecha (importaciones).
+
+    precios es {insumo_id: precio_unitario} para las unidades sin lote. Usa
+    un executemany por tabla. Devuelve los insumos cuyos lotes quedaron
+    negativos (la transacción sigue abierta, quien llama decide si revierte).
+    """
+    colas = _lotes_abiertos({v['insumo_id'] for v in valores})
+    orden = sorted(range(len(valores)), key=lambda i: valores[i]['fecha_consumo'])
+    asignaciones = {}
+    for i in orden:
+        v = valores[i]
+        asignaciones[i], costo, faltante = colas[v['insumo_id']].tomar(v['cantidad_unidades'])
+        v['costo'] = costo + faltante * precios[v['insumo_id']]
+
+    tocados = {lote_id: unidades for cola in colas.values() for lote_id, unidades in cola.tocados.items()}
+    _descontar_lotes(tocados)
+
+    tabla = Consumo.__table__
+    ids = db.session.execute(insert(tabla).returning(tabla.c.id, sort_by_parameter_order=True), valores).scalars().all()
+    filas = [{'consumo_id': consumo_id, 'lote_id': lote_id, 'unidades': unidades}
+             for i, consumo_id in enumerate(ids) for lote_id, unidades in asignaciones[i]]
+    if filas:
+        db.session.execute(insert(ConsumoLote.__table__), filas)
+    return _lotes_negativos(list(tocados))
+
+
+# === RECONSTRUCCIÓN Y CONTROL ===
+
+def reconstruir_costos(conexion=None):
+    """Recalcula lotes, asignaciones y Consumo.costo desde cero. Devuelve (lotes, consumos).
+
+    Sin conexión usa la sesión de la aplicación y hace commit; generar_datos.py
+    pasa su propia conexión. Los consumos se reparten en orden de fecha. Los
+    acumulados guardan el costo de cada consumo, así que se reconstruyen también.
+    """
+    ejecutar = conexion.execute if conexion is not None else db.session.execute
+    lotes = LoteStock.__table__
+    consumos = Consumo.__table__
+
+    ejecutar(delete(ConsumoLote.__table__))
+    ejecutar(delete(lotes))
+    ejecutar(insert(lotes).from_select(COLUMNAS_LOTE, _select_lotes_pendientes()))
+
+    insumo_ids = [insumo_id for (insumo_id,) in ejecutar(select(Insumo.id).order_by(Insumo.id))]
+    total_consumos = 0
+    for inicio in range(0, len(insumo_ids), INSUMOS_POR_TANDA):
+        tanda = insumo_ids[inicio:inicio + INSUMOS_POR_TANDA]
+        colas = defaultdict(ColaLotes)
+        for insumo_id, lote_id, restante, costo in ejecutar(
+                select(lotes.c.insumo_id, lotes.c.id, lotes.c.restante, lotes.c.costo_unitario)
+                .where(lotes.c.insumo_id.in_(tanda))
+                .order_by(lotes.c.insumo_id, lotes.c.fecha, lotes.c.id)):
+            colas[insumo_id].lotes.append([lote_id, restante, costo])
+
+        filas = ejecutar(
+            select(Consumo.id, Consumo.insumo_id, Consumo.cantidad_unidades, Insumo.precio_unitario)
+            .join(Insumo, Insumo.id == Consumo.insumo_id)
+            .where(Consumo.insumo_id.in_(tanda))
+            .order_by(Consumo.insumo_id, Consumo.fecha_consumo, Consumo.id)
+        ).all()
+        costos = []
+        asignaciones = []
+        for consumo_id, insumo_id, cantidad, precio in filas:
+            tomadas, costo, faltante = colas[insumo_id].tomar(cantidad)
+            costos.append({'b_id': consumo_id, 'b_costo': costo + faltante * precio})
+            asignaciones.extend({'consumo_id': consumo_id, 'lote_id': lote_id, 'unidades': unidades}
+                                for lote_id, unidades in tomadas)
+
+        if costos:
+            ejecutar(update(consumos).where(consumos.c.id == bindparam('b_id'))
+                     .values(costo=bindparam('b_costo')), costos)
+        if asignaciones:
+            ejecutar(insert(ConsumoLote.__table__), asignaciones)
+        tocados = [{'b_lote_id': lote_id, 'b_unidades': -unidades}
+                   for cola in colas.values() for lote_id, unidades in cola.tocados.items()]
+        if tocados:
+            ejecutar(update(lotes).where(lotes.c.id == bindparam('b_lote_id'))
+                     .values(restante=lotes.c.restante + bindparam('b_unidades')), tocados)
+        total_consumos += len(filas)
+
+    total_lotes = ejecutar(select(func.count()).select_from(lotes)).scalar()
+    # Hace el commit si se usa la sesión
+    reconstruir_rollups(conexion)
+    return total_lotes, total_consumos
+
+
+def verificar_costos():
+    """Compara las unidades que quedan en los lotes con el saldo de cada insumo.
+
+    Devuelve (diferencias, consumos_sin_costo); diferencias es una lista de
+    (insumo_id, saldo, restante_en_lotes).
+    """
+    restantes = dict(db.session.query(LoteStock.insumo_id, func.sum(LoteStock.restante))
+                     .group_by(LoteStock.insumo_id))
+    diferencias = []
+    for insumo_id, saldo in db.session.query(StockInsumo.insumo_id, StockInsumo.saldo) \
+            .order_by(StockInsumo.insumo_id):
+        restante = float(restantes.get(insumo_id) or 0)
+        if abs(max(saldo, 0.0) - restante) > 1e-4:
+            diferencias.append((insumo_id, saldo, restante))
+    sin_costo = db.session.query(func.count(Consumo.id)).filter(Consumo.costo.is_(None)).scalar()
+    return diferencias, sin_costo
+
+
+def expresion_costo_consumo():
+    """Costo de un consumo en SQL: el guardado o, sin costear, al precio vigente (requiere join a Insumo)"""
+    return func.coalesce(Consumo.costo, Consumo.cantidad_unidades * Insumo.precio_unitario)
@@ -0,0 +1,193 @@
+# dashboard.py
+"""KPIs de la página de inicio (/api/dashboard) con caché incremental.
+
+Se guardan por proceso los consumos del mes (y de la semana en curso)
+agrupados por centro, insumo y día. En cada pedido se leen solo los ids
+máximos de Consumo y Compra:
+- si no cambiaron, se responde desde la caché;
+- si hay consumos nuevos, se suman a la caché solo esas filas;
+- el valor del stock y los insumos críticos se recalculan desde stock_insumo
+  (una fila por insumo) solo cuando hubo movimientos.
+
+Las ediciones y bajas de consumos, compras o insumos hechas en este proceso
+invalidan la caché entera; las de otros workers se ven al vencer
+DASHBOARD_TTL_SEGUNDOS.
+"""
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import and_, case, event, func, select
+
+from models import db, Insumo, Compra, Consumo, CentroConsumo, StockInsumo
+from costeo import expresion_costo_consumo, solo_cambio_el_costo
+from vencimientos import obtener_resumen_vencimientos
+
+TTL_POR_DEFECTO = 300
+TOP_INSUMOS = 5
+PERIODOS = ('hoy', 'semana', 'mes')
+
+
+def resumen_stock():
+    """(valor_stock, insumos_criticos, insumos_con_alerta) en una sola consulta"""
+    saldo = func.coalesce(StockInsumo.saldo, 0.0)
+    minimo = func.coalesce(Insumo.stock_minimo, 0.0)
+    fila = db.session.query(
+        func.coalesce(func.sum(saldo * Insumo.precio_unitario), 0.0),
+        func.coalesce(func.sum(case((and_(minimo > 0, saldo <= minimo), 1), else_=0)), 0),
+        func.coalesce(func.sum(case((minimo > 0, 1), else_=0)), 0)
+    ).outerjoin(StockInsumo, StockInsumo.insumo_id == Insumo.id).one()
+    return float(fila[0]), int(fila[1]), int(fila[2])
+
+
+class CacheDashboard:
+    """Acumulados de consumo por (centro, insumo, día) desde el inicio del período"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.invalidar()
+
+    def invalidar(self):
+        self.construido_en = None
+        self.dia = None
+        self.marca = (0, 0)
+        self.por_dia = defaultdict(lambda: [0.0, 0.0])  # (centro, insumo, día) -> [unidades, costo]
+        self.stock = (0.0, 0, 0)
+
+    def desde(self):
+        """Primer día que entra en algún período (inicio de semana o de mes)"""
+        inicio_semana = self.dia - timedelta(days=self.dia.weekday())
+        return min(inicio_semana, self.dia.replace(day=1))
+
+    def vencido(self, ttl, hoy):
+        return (self.construido_en is None or self.dia != hoy
+                or time.monotonic() - self.construido_en > ttl)
+
+    def _acumular(self, filas):
+        for centro_id, insumo_id, dia, unidades, costo in filas:
+            if isinstance(dia, str):
+                dia = datetime.strptime(dia[:10], '%Y-%m-%d').date()
+            elif isinstance(dia, datetime):
+                dia = dia.date()
+            acumulado = self.por_dia[(centro_id, insumo_id, dia)]
+            acumulado[0] += float(unidades or 0)
+            acumulado[1] += float(costo or 0)
+
+    def _consultar_consumos(self, hasta_id, desde_id=0):
+        desde = datetime.combine(self.desde(), datetime.min.time())
+        dia = func.date(Consumo.fecha_consumo)
+        return db.session.query(
+            Consumo.centro_consumo_id, Consumo.insumo_id, dia,
+            func.sum(Consumo.cantidad_unidades),
+            func.sum(expresion_costo_consumo())
+        ).join(Insumo, Insumo.id == Consumo.insumo_id) \
+         .filter(Consumo.fecha_consumo >= desde, Consumo.id > desde_id, Consumo.id <= hasta_id) \
+         .group_by(Consumo.centro_consumo_id, Consumo.insumo_id, dia)
+
+    def actualizar(self, ttl):
+        """Deja la caché al día con el menor trabajo posible"""
+        # Las fechas se guardan en UTC (datetime.utcnow)
+        hoy = datetime.utcnow().date()
+        marca = db.session.execute(select(
+            select(func.coalesce(func.max(Consumo.id), 0)).scalar_subquery(),
+            select(func.coalesce(func.max(Compra.id), 0)).scalar_subquery()
+        )).one()
+        marca = (marca[0], marca[1])
+
+        with self._lock:
+            if self.vencido(ttl, hoy) or marca < self.marca:
+                self.invalidar()
+                self.dia = hoy
+                self._acumular(self._consultar_consumos(marca[0]))
+                self.stock = resumen_stock()
+                self.construido_en = time.monotonic()
+            elif marca != self.marca:
+                if marca[0] > self.marca[0]:
+                    self._acumular(self._consultar_consumos(marca[0], self.marca[0]))
+                self.stock = resumen_stock()
+            self.marca = marca
+
+    def kpis(self):
+        inicio_semana = self.dia - timedelta(days=self.dia.weekday())
+        inicio_mes = self.dia.replace(day=1)
+        centros = defaultdict(lambda: {p: {'unidades': 0.0, 'costo': 0.0} for p in PERIODOS})
+        insumos_mes = defaultdict(lambda: [0.0, 0.0])
+
+        with self._lock:
+            for (centro_id, insumo_id, dia), (unidades, costo) in self.por_dia.items():
+                periodos = []
+                if dia == self.dia:
+                    periodos.append('hoy')
+                if inicio_semana <= dia <= self.dia:
+                    periodos.append('semana')
+                if inicio_mes <= dia <= self.dia:
+                    periodos.append('mes')
+                    insumos_mes[insumo_id][0] += unidades
+                    insumos_mes[insumo_id][1] += costo
+                for periodo in periodos:
+                    centros[centro_id][periodo]['unidades'] += unidades
+                    centros[centro_id][periodo]['costo'] += costo
+            valor_stock, criticos, con_alerta = self.stock
+
+        top = sorted(insumos_mes.items(), key=lambda item: item[1][0], reverse=True)[:TOP_INSUMOS]
+        return valor_stock, criticos, con_alerta, dict(centros), top
+
+
+_cache = CacheDashboard()
+
+
+def obtener_dashboard():
+    """Diccionario con los KPIs para /api/dashboard"""
+    ttl = current_app.config.get('DASHBOARD_TTL_SEGUNDOS', TTL_POR_DEFECTO)
+    _cache.actualizar(ttl)
+    valor_stock, criticos, con_alerta, centros, top = _cache.kpis()
+
+    # Nombres de los pocos centros e insumos que se muestran
+    nombres_centros = dict(db.session.query(CentroConsumo.id, CentroConsumo.nombre))
+    top_ids = [insumo_id for insumo_id, _ in top]
+    nombres_insumos = dict(db.session.query(Insumo.id, Insumo.denominacion)
+                           .filter(Insumo.id.in_(top_ids))) if top_ids else {}
+
+    totales = {p: {'unidades': 0.0, 'costo': 0.0} for p in PERIODOS}
+    por_centro = []
+    for centro_id, periodos in sorted(centros.items(), key=lambda item: -item[1]['mes']['unidades']):
+        por_centro.append({'centro_id': centro_id, 'centro': nombres_centros.get(centro_id, '-'), **periodos})
+        for periodo in PERIODOS:
+            totales[periodo]['unidades'] += periodos[periodo]['unidades']
+            totales[periodo]['costo'] += periodos[periodo]['costo']
+
+    return {
+        'valor_stock': valor_stock,
+        'insumos_criticos': criticos,
+        'insumos_con_alerta': con_alerta,
+        'consumo_total': totales,
+        'consumo_por_centro': por_centro,
+        'top_insumos': [{'id': insumo_id, 'denominacion': nombres_insumos.get(insumo_id, '-'),
+                         'unidades': unidades, 'costo': costo}
+                        for insumo_id, (unidades, costo) in top],
+        # Lo escribe el monitor de alertas (o `flask vencimientos --actualizar`)
+        'vencimientos': obtener_resumen_vencimientos(),
+        'fecha': _cache.dia.isoformat(),
+    }
+
+
+def reiniciar_dashboard():
+    """Descarta la caché (tras recrear las tablas o en pruebas)"""
+    with _cache._lock:
+        _cache.invalidar()
+
+
+# Ediciones y bajas no cambian los ids máximos: invalidan la caché de este proceso
+@event.listens_for(Consumo, 'after_update')
+@event.listens_for(Consumo, 'after_delete')
+@event.listens_for(Compra, 'after_update')
+@event.listens_for(Compra, 'after_delete')
+@event.listens_for(Insumo, 'after_update')
+@event.listens_for(Insumo, 'after_delete')
+def _movimiento_modificado(mapper, connection, objeto):
+    # El costo de un consumo nuevo se graba tras el INSERT y se lee con las filas nuevas
+    if isinstance(objeto, Consumo) and solo_cambio_el_costo(objeto):
+        return
+    _cache.construido_en = None
@@ -0,0 +1,419 @@
+# exportaciones.py
+"""Exportaciones de consumos y stock generadas en streaming (memoria acotada).
+
+Cada conjunto (consumos, stock) tiene un esquema de columnas compartido por
+todos los formatos: el encabezado es el de la planilla y la cabecera del CSV,
+el campo es la clave en JSON Lines y la columna en Parquet, y el tipo define
+cómo se escribe el valor en cada formato.
+
+Formatos:
+- xlsx: planilla write-only (pesada en CPU, para abrir a mano)
+- csv: CSV UTF-8 comprimido con gzip, generado mientras se lee la consulta
+- jsonl: un objeto JSON por línea, comprimido con gzip, también en streaming
+- parquet: columnar con zstd en grupos de filas (requiere pyarrow); se arma
+  en un archivo temporal porque el pie del archivo va al final
+"""
+import csv
+import io
+import json
+import tempfile
+import zlib
+from collections import namedtuple
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, Alignment, PatternFill
+import openpyxl.utils
+from sqlalchemy import select
+
+from models import db, Insumo, Consumo, CentroConsumo, Trabajador, StockInsumo
+from saldos import calcular_totales_movimientos
+
+# Filas que se traen de la base por cada lote
+TAMANO_LOTE = 1000
+
+# Filas por grupo de filas de Parquet
+TAMANO_GRUPO_PARQUET = 64 * 1024
+
+# Nivel de gzip para CSV y JSON Lines (6: el de gzip por defecto)
+NIVEL_GZIP = 6
+
+# Por encima de este tamaño el archivo temporal pasa de memoria a disco
+MAX_ARCHIVO_EN_MEMORIA = 5 * 1024 * 1024
+
+# Tamaño de cada bloque enviado al cliente
+TAMANO_BLOQUE_RESPUESTA = 64 * 1024
+
+MIMETYPE_XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# Tipos de columna
+TEXTO = 'texto'
+DECIMAL = 'decimal'
+ENTERO = 'entero'
+FECHA = 'fecha'
+
+# total: la planilla agrega la suma de la columna al final
+Columna = namedtuple('Columna', ['encabezado', 'campo', 'tipo', 'ancho', 'total'], defaults=[False])
+
+COLUMNAS_CONSUMOS = [
+    Columna('Fecha', 'fecha', FECHA, 12),
+    Columna('Hora', 'hora', TEXTO, 8),
+    Columna('Insumo', 'insumo', TEXTO, 25),
+    Columna('Tipo', 'tipo', TEXTO, 15),
+    Columna('Modelo', 'modelo', TEXTO, 12),
+    Columna('Cantidad Unidades', 'cantidad_unidades', DECIMAL, 12, total=True),
+    Columna('Cajas Equivalentes', 'cajas_equivalentes', DECIMAL, 12),
+    Columna('Centro Consumo', 'centro_consumo', TEXTO, 15),
+    Columna('Trabajador', 'trabajador', TEXTO, 20),
+    Columna('Código Trabajador', 'codigo_trabajador', TEXTO, 12),
+    Columna('Proyecto', 'proyecto', TEXTO, 15),
+    Columna('Observaciones', 'observaciones', TEXTO, 25),
+    Columna('Costo', 'costo', DECIMAL, 10),
+    Columna('Costo Total', 'costo_total', DECIMAL, 12, total=True),
+]
+
+COLUMNAS_STOCK = [
+    Columna('Insumo', 'insumo', TEXTO, 25),
+    Columna('Tipo', 'tipo', TEXTO, 15),
+    Columna('Modelo', 'modelo', TEXTO, 12),
+    Columna('Stock Actual', 'stock_actual', DECIMAL, 12),
+    Columna('Stock Mínimo', 'stock_minimo', DECIMAL, 12),
+    Columna('Cajas Completas', 'cajas_completas', ENTERO, 12),
+    Columna('Unidades Sueltas', 'unidades_sueltas', ENTERO, 12),
+    Columna('Precio Unitario', 'precio_unitario', DECIMAL, 12),
+    Columna('Valor Stock', 'valor_stock', DECIMAL, 12),
+    Columna('Estado Alerta', 'estado_alerta', TEXTO, 15),
+    Columna('Porcentaje Stock', 'porcentaje_stock', DECIMAL, 12),
+]
+
+
+def consultar_consumos_exportacion():
+    """Consulta de consumos con sus datos relacionados, leída por lotes"""
+    return db.session.query(
+        Consumo.fecha_consumo,
+        Insumo.denominacion,
+        Insumo.tipo,
+        Insumo.modelo,
+        Insumo.cantidad_por_caja,
+        Insumo.precio_unitario,
+        Consumo.cantidad_unidades,
+        Consumo.costo,
+        CentroConsumo.nombre.label('centro_nombre'),
+        Trabajador.nombre.label('trabajador_nombre'),
+        Trabajador.codigo.label('trabajador_codigo'),
+        Consumo.proyecto,
+        Consumo.observaciones
+    ).join(Insumo, Consumo.insumo_id == Insumo.id) \
+     .join(CentroConsumo, Consumo.centro_consumo_id == CentroConsumo.id) \
+     .join(Trabajador, Consumo.trabajador_id == Trabajador.id) \
+     .order_by(Consumo.fecha_consumo.desc()) \
+     .yield_per(TAMANO_LOTE)
+
+
+def fila_consumo(fila):
+    """Convierte una fila de la consulta en los valores de COLUMNAS_CONSUMOS"""
+    cantidad = float(fila.cantidad_unidades)
+    cajas = cantidad / fila.cantidad_por_caja if fila.cantidad_por_caja else 0
+    costo = fila.costo if fila.costo is not None else cantidad * fila.precio_unitario
+    return [
+        fila.fecha_consumo.date() if fila.fecha_consumo else None,
+        fila.fecha_consumo.strftime('%H:%M') if fila.fecha_consumo else None,
+        fila.denominacion,
+        fila.tipo,
+        fila.modelo,
+        cantidad,
+        float(cajas),
+        fila.centro_nombre,
+        fila.trabajador_nombre,
+        fila.trabajador_codigo,
+        fila.proyecto or None,
+        fila.observaciones or None,
+        float(costo),
+        float(costo)
+    ]
+
+
+def filas_consumos():
+    for fila in consultar_consumos_exportacion():
+        yield fila_consumo(fila)
+
+
+def consultar_stock_exportacion():
+    """Insumos con su saldo materializado, leídos por lotes"""
+    consulta = select(
+        Insumo.denominacion, Insumo.tipo, Insumo.modelo, Insumo.id,
+        Insumo.cantidad_por_caja, Insumo.precio_unitario, Insumo.stock_minimo,
+        StockInsumo.saldo
+    ).outerjoin(StockInsumo, StockInsumo.insumo_id == Insumo.id) \
+     .order_by(Insumo.id) \
+     .execution_options(yield_per=TAMANO_LOTE)
+    return db.session.execute(consulta)
+
+
+def fila_stock(fila, stock):
+    """Convierte un insumo y su stock en los valores de COLUMNAS_STOCK"""
+    stock = float(stock)
+    minimo = float(fila.stock_minimo or 0)
+    por_caja = fila.cantidad_por_caja
+    estado = "🔴 CRÍTICO" if stock <= minimo else "✅ OK" if minimo > 0 else "⚪ SIN ALERTA"
+    return [
+        fila.denominacion,
+        fila.tipo,
+        fila.modelo,
+        stock,
+        minimo,
+        int(stock // por_caja) if por_caja > 0 else 0,
+        int(stock % por_caja) if por_caja > 0 else 0,
+        float(fila.precio_unitario),
+        stock * fila.precio_unitario,
+        estado,
+        stock / minimo * 100 if minimo > 0 and stock > 0 else 0.0
+    ]
+
+
+def filas_stock():
+    # Los insumos sin fila de saldo (datos anteriores a la tabla) se calculan
+    # desde sus movimientos, un lote a la vez
+    for lote in consultar_stock_exportacion().partitions():
+        sin_saldo = [fila.id for fila in lote if fila.saldo is None]
+        totales = calcular_totales_movimientos(sin_saldo) if sin_saldo else {}
+        for fila in lote:
+            if fila.saldo is None:
+                entrada, salida = totales.get(fila.id, (0.0, 0.0))
+                yield fila_stock(fila, entrada - salida)
+            else:
+                yield fila_stock(fila, fila.saldo)
+
+
+# archivo: prefijo del nombre del archivo descargado
+Conjunto = namedtuple('Conjunto', ['titulo', 'archivo', 'columnas', 'filas'])
+
+CONJUNTOS = {
+    'consumos': Conjunto('Consumos', 'consumos', COLUMNAS_CONSUMOS, filas_consumos),
+    'stock': Conjunto('Stock Actual', 'stock_actual', COLUMNAS_STOCK, filas_stock),
+}
+
+
+# --- Excel ---
+
+def valor_excel(valor, columna):
+    if valor is None:
+        return ''
+    if columna.tipo == FECHA:
+        return valor.strftime('%d/%m/%Y')
+    return valor
+
+
+def escribir_excel(destino, conjunto):
+    """Escribe la planilla del conjunto en el archivo destino. Devuelve las filas escritas"""
+    columnas = conjunto.columnas
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(conjunto.titulo)
+
+    # En modo write-only los anchos se definen antes de escribir filas
+    for col, columna in enumerate(columnas, 1):
+        ws.column_dimensions[openpyxl.utils.get_column_letter(col)].width = columna.ancho
+
+    # Encabezados con estilo
+    header_font = Font(bold=True, color="FFFFFF")
+    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+    header_alignment = Alignment(horizontal="center", vertical="center")
+
+    encabezados = []
+    for columna in columnas:
+        cell = WriteOnlyCell(ws, value=columna.encabezado)
+        cell.font = header_font
+        cell.fill = header_fill
+        cell.alignment = header_alignment
+        encabezados.append(cell)
+    ws.append(encabezados)
+
+    # Datos
+    filas = 0
+    for valores in conjunto.filas():
+        ws.append([valor_excel(valor, columna) for valor, columna in zip(valores, columnas)])
+        filas += 1
+
+    # Totales (una fila en blanco y luego las sumas, con la etiqueta antes de la primera)
+    sumadas = [i for i, columna in enumerate(columnas) if columna.total]
+    if filas and sumadas:
+        totales = [None] * len(columnas)
+        for i in sumadas:
+            letra = openpyxl.utils.get_column_letter(i + 1)
+            totales[i] = f"=SUM({letra}2:{letra}{filas + 1})"
+        total_label = WriteOnlyCell(ws, value="TOTALES:")
+        total_label.font = Font(bold=True)
+        totales[sumadas[0] - 1] = total_label
+        ws.append([])
+        ws.append(totales)
+
+    wb.save(destino)
+    return filas
+
+
+# --- CSV y JSON Lines (gzip en streaming) ---
+
+def valor_texto(valor, columna):
+    if valor is None:
+        return ''
+    if columna.tipo == FECHA:
+        return valor.isoformat()
+    return valor
+
+
+def comprimir_gzip(textos):
+    """Comprime con gzip los textos generados y devuelve los bloques a medida que se llenan"""
+    compresor = zlib.compressobj(NIVEL_GZIP, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    pendiente = []
+    tamano = 0
+    for texto in textos:
+        bloque = compresor.compress(texto.encode('utf-8'))
+        if bloque:
+            pendiente.append(bloque)
+            tamano += len(bloque)
+            if tamano >= TAMANO_BLOQUE_RESPUESTA:
+                yield b''.join(pendiente)
+                pendiente, tamano = [], 0
+    pendiente.append(compresor.flush())
+    yield b''.join(pendiente)
+
+
+def textos_csv(conjunto):
+    """Líneas CSV (encabezados de la planilla como cabecera), TAMANO_LOTE filas por texto"""
+    columnas = conjunto.columnas
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, lineterminator='\n')
+    escritor.writerow([columna.encabezado for columna in columnas])
+    pendientes = 0
+    for valores in conjunto.filas():
+        escritor.writerow([valor_texto(valor, columna) for valor, columna in zip(valores, columnas)])
+        pendientes += 1
+        if pendientes == TAMANO_LOTE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pendientes = 0
+    yield buffer.getvalue()
+
+
+def textos_jsonl(conjunto):
+    """Un objeto por fila con los campos del esquema, TAMANO_LOTE filas por texto"""
+    campos = [columna.campo for columna in conjunto.columnas]
+    fechas = [i for i, columna in enumerate(conjunto.columnas) if columna.tipo == FECHA]
+    lineas = []
+    for valores in conjunto.filas():
+        for i in fechas:
+            if valores[i] is not None:
+                valores[i] = valores[i].isoformat()
+        lineas.append(json.dumps(dict(zip(campos, valores)), ensure_ascii=False))
+        if len(lineas) == TAMANO_LOTE:
+            yield '\n'.join(lineas) + '\n'
+            lineas = []
+    if lineas:
+        yield '\n'.join(lineas) + '\n'
+
+
+def generar_csv(conjunto):
+    return comprimir_gzip(textos_csv(conjunto))
+
+
+def generar_jsonl(conjunto):
+    return comprimir_gzip(textos_jsonl(conjunto))
+
+
+# --- Parquet ---
+
+def esquema_parquet(columnas):
+    import pyarrow as pa
+
+    tipos = {TEXTO: pa.string(), DECIMAL: pa.float64(), ENTERO: pa.int64(), FECHA: pa.date32()}
+    return pa.schema([(columna.campo, tipos[columna.tipo]) for columna in columnas])
+
+
+def escribir_parquet(destino, conjunto):
+    """Escribe el conjunto en Parquet, un grupo de filas cada TAMANO_GRUPO_PARQUET. Devuelve las filas escritas"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError('La exportación a Parquet requiere pyarrow (pip install pyarrow)')
+
+    esquema = esquema_parquet(conjunto.columnas)
+    filas = 0
+    with pq.ParquetWriter(destino, esquema, compression='zstd') as escritor:
+        grupo = []
+
+        def escribir_grupo():
+            # Filas → columnas para armar el grupo con el tipo de cada columna
+            columnas = [list(valores) for valores in zip(*grupo)]
+            escritor.write_table(pa.Table.from_arrays(columnas, schema=esquema))
+
+        for valores in conjunto.filas():
+            grupo.append(valores)
+            filas += 1
+            if len(grupo) == TAMANO_GRUPO_PARQUET:
+                escribir_grupo()
+                grupo = []
+        if grupo:
+            escribir_grupo()
+    return filas
+
+
+# --- Archivos completos ---
+
+Formato = namedtuple('Formato', ['extension', 'mimetype', 'escribir', 'generar'])
+
+# escribir(destino, conjunto): arma el archivo completo (xlsx, parquet)
+# generar(conjunto): genera los bloques comprimidos en streaming (csv, jsonl)
+FORMATOS = {
+    'xlsx': Formato('xlsx', MIMETYPE_XLSX, escribir_excel, None),
+    'csv': Formato('csv.gz', 'application/gzip', None, generar_csv),
+    'jsonl': Formato('jsonl.gz', 'application/gzip', None, generar_jsonl),
+    'parquet': Formato('parquet', 'application/vnd.apache.parquet', escribir_parquet, None),
+}
+
+
+def generar_archivo(escribir, conjunto):
+    """Arma el archivo en un archivo temporal y lo devuelve posicionado al inicio"""
+    archivo = tempfile.SpooledTemporaryFile(max_size=MAX_ARCHIVO_EN_MEMORIA)
+    try:
+        escribir(archivo, conjunto)
+    except Exception:
+        archivo.close()
+        raise
+    archivo.seek(0)
+    return archivo
+
+
+def escribir_exportacion(destino, conjunto, formato):
+    """Escribe el archivo completo en destino, sea cual sea el formato"""
+    if formato.generar:
+        for bloque in formato.generar(conjunto):
+            destino.write(bloque)
+    else:
+        formato.escribir(destino, conjunto)
+
+
+def exportar(nombre_conjunto, nombre_formato):
+    """Bloques del archivo exportado.
+
+    Los formatos de archivo completo se arman antes de devolver (los errores
+    saltan acá); csv y jsonl se generan mientras se envían.
+    """
+    conjunto = CONJUNTOS[nombre_conjunto]
+    formato = FORMATOS[nombre_formato]
+    if formato.generar:
+        return formato.generar(conjunto)
+    return leer_por_bloques(generar_archivo(formato.escribir, conjunto))
+
+
+def leer_por_bloques(archivo):
+    """Genera el contenido del archivo en bloques y lo cierra al terminar"""
+    try:
+        while True:
+            bloque = archivo.read(TAMANO_BLOQUE_RESPUESTA)
+            if not bloque:
+                break
+            yield bloque
+    finally:
+        archivo.close()
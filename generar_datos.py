@@ -0,0 +1,209 @@
+# generar_datos.py
+"""Generador reproducible de datos sintéticos para benchmarks.
+
+Crea insumos, centros, trabajadores, compras y consumos con distribuciones
+parecidas a las reales: pocos insumos concentran la mayoría de los consumos,
+los consumos caen en días hábiles y horario de trabajo, y las compras cubren
+lo consumido (el stock nunca queda negativo). También llena stock_insumo,
+los lotes y costos FIFO y los acumulados consumo_diario / consumo_mensual.
+
+Uso (sobre una base vacía):
+    python generar_datos.py --consumos 100000
+    python generar_datos.py --url sqlite:////tmp/bench.db --limpiar --consumos 1000000
+"""
+import argparse
+import math
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, func, select
+
+from costeo import reconstruir_costos
+from models import db, Insumo, Compra, Consumo, CentroConsumo, Trabajador, StockInsumo
+
+TAMANO_LOTE = 10000
+
+NOMBRES_CENTROS = ['Preparación', 'Lustrado', 'Cabinas', 'Terminación',
+                   'Chapa', 'Mecánica', 'Armado', 'Control']
+DENOMINACIONES = ['super tack', 'superassilex', 'lija al agua', 'disco abrasivo',
+                  'masilla', 'pintura base', 'barniz', 'diluyente', 'cinta', 'film']
+TIPOS = ['max film', 'peach', 'pommax', 'gold', 'premium', 'eco', 'pro']
+PROVEEDORES = ['Mirka', '3M', 'Sia', 'Norton', 'Indasa']
+
+
+def _insertar(conn, tabla, filas):
+    for i in range(0, len(filas), TAMANO_LOTE):
+        conn.execute(tabla.insert(), filas[i:i + TAMANO_LOTE])
+
+
+def generar_datos(engine, insumos=500, centros=6, trabajadores=40, compras=5000,
+                  consumos=100000, dias=730, semilla=1234):
+    """Inserta los datos en tablas vacías y devuelve un resumen con las cantidades"""
+    rnd = random.Random(semilla)
+    fin = datetime(2026, 1, 1)
+    inicio = fin - timedelta(days=dias)
+
+    filas_centros = []
+    for i in range(1, centros + 1):
+        nombre = NOMBRES_CENTROS[i - 1] if i <= len(NOMBRES_CENTROS) else f'Centro {i}'
+        filas_centros.append({'id': i, 'nombre': nombre, 'descripcion': f'Área de {nombre.lower()}',
+                              'activo': True, 'created_at': inicio})
+
+    filas_trabajadores = []
+    centro_de_trabajador = {}
+    for i in range(1, trabajadores + 1):
+        centro = (i - 1) % centros + 1 if i <= centros else rnd.randint(1, centros)
+        centro_de_trabajador[i] = centro
+        inicial = filas_centros[centro - 1]['nombre'][0]
+        filas_trabajadores.append({'id': i, 'codigo': f'{inicial}{i}', 'nombre': f'Trabajador {i}',
+                                   'centro_consumo_id': centro, 'activo': rnd.random() > 0.05,
+                                   'created_at': inicio})
+
+    filas_insumos = []
+    for i in range(1, insumos + 1):
+        cantidad_por_caja = rnd.choice([10, 25, 50, 100])
+        precio_unitario = round(rnd.lognormvariate(7, 1), 2)
+        filas_insumos.append({
+            'id': i,
+            'denominacion': rnd.choice(DENOMINACIONES),
+            'tipo': rnd.choice(TIPOS),
+            'modelo': f'{rnd.choice("PKM")}{rnd.choice([80, 120, 240, 320, 600, 800, 1500])}-{i}',
+            'cantidad_por_caja': cantidad_por_caja,
+            'precio_caja': round(precio_unitario * cantidad_por_caja, 2),
+            'precio_unitario': precio_unitario,
+            'codigo_barras': f'779{i:010d}',
+            'stock_minimo': float(rnd.choice([0, 0, 10, 20, 50, 100])),
+            'created_at': inicio,
+        })
+
+    # Popularidad tipo Zipf: pocos insumos concentran la mayoría de los consumos
+    orden = list(range(1, insumos + 1))
+    rnd.shuffle(orden)
+    pesos = [1 / (rango ** 1.1) for rango in range(1, insumos + 1)]
+    acumulados = []
+    total = 0
+    for peso in pesos:
+        total += peso
+        acumulados.append(total)
+
+    proyectos = [f'OT-{n:04d}' for n in rnd.sample(range(1, 10000), 50)]
+
+    with engine.begin() as conn:
+        _insertar(conn, CentroConsumo.__table__, filas_centros)
+        _insertar(conn, Trabajador.__table__, filas_trabajadores)
+        _insertar(conn, Insumo.__table__, filas_insumos)
+
+        consumido = [0.0] * (insumos + 1)
+        lote = []
+        for _ in range(consumos):
+            insumo_id = orden[rnd.choices(range(insumos), cum_weights=acumulados)[0]]
+            trabajador_id = rnd.randint(1, trabajadores)
+            dia = inicio + timedelta(days=rnd.randrange(dias))
+            # Casi todo en días hábiles, en horario de 7 a 18
+            if dia.weekday() >= 5 and rnd.random() < 0.9:
+                dia -= timedelta(days=dia.weekday() - 4)
+            hora = min(max(rnd.gauss(12, 3), 7), 18)
+            cantidad = float(1 + int(rnd.expovariate(0.3)))
+            consumido[insumo_id] += cantidad
+            lote.append({
+                'insumo_id': insumo_id,
+                'centro_consumo_id': centro_de_trabajador[trabajador_id],
+                'trabajador_id': trabajador_id,
+                'cantidad_unidades': cantidad,
+                'proyecto': rnd.choice(proyectos) if rnd.random() < 0.7 else None,
+                'observaciones': None,
+                'fecha_consumo': dia + timedelta(seconds=int(hora * 3600) + rnd.randrange(60)),
+            })
+            if len(lote) >= TAMANO_LOTE:
+                _insertar(conn, Consumo.__table__, lote)
+                lote = []
+        _insertar(conn, Consumo.__table__, lote)
+
+        # Compras: cubren lo consumido más un margen, repartidas según popularidad
+        filas_compras = []
+        entradas = [0.0] * (insumos + 1)
+        total_consumido = sum(consumido) or 1
+        for fila in filas_insumos:
+            insumo_id = fila['id']
+            cajas_necesarias = math.ceil((consumido[insumo_id] * rnd.uniform(1.1, 1.4)
+                                          + fila['stock_minimo']) / fila['cantidad_por_caja']) or 1
+            cantidad_compras = max(1, round(compras * consumido[insumo_id] / total_consumido))
+            cantidad_compras = min(cantidad_compras, cajas_necesarias)
+            for n in range(cantidad_compras):
+                cajas = cajas_necesarias // cantidad_compras + (1 if n < cajas_necesarias % cantidad_compras else 0)
+                fecha = inicio + timedelta(days=dias * n / cantidad_compras, hours=rnd.randint(8, 17))
+                filas_compras.append({
+                    'insumo_id': insumo_id,
+                    'cantidad_cajas': float(cajas),
+                    'precio_caja_compra': round(fila['precio_caja'] * rnd.uniform(0.9, 1.1), 2),
+                    'proveedor': rnd.choice(PROVEEDORES),
+                    'lote': f'L{fecha:%y%m}-{insumo_id}-{n}',
+                    'fecha_vencimiento': (fecha + timedelta(days=rnd.randint(365, 900))).date(),
+                    'fecha_compra': fecha,
+                })
+                entradas[insumo_id] += cajas * fila['cantidad_por_caja']
+        _insertar(conn, Compra.__table__, filas_compras)
+
+        _insertar(conn, StockInsumo.__table__, [{
+            'insumo_id': i,
+            'unidades_entrada': entradas[i],
+            'unidades_salida': consumido[i],
+            'saldo': entradas[i] - consumido[i],
+            'updated_at': fin,
+        } for i in range(1, insumos + 1)])
+
+        # Lotes y costos FIFO, y acumulados por día y por mes a partir de esos costos
+        reconstruir_costos(conn)
+
+    return {
+        'insumos': insumos,
+        'centros': centros,
+        'trabajadores': trabajadores,
+        'compras': len(filas_compras),
+        'consumos': consumos,
+    }
+
+
+def base_vacia(engine):
+    with engine.connect() as conn:
+        return not conn.execute(select(func.count()).select_from(Insumo.__table__)).scalar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='URL de la base (por defecto la de la aplicación)')
+    parser.add_argument('--limpiar', action='store_true', help='Borra y recrea todas las tablas antes de generar')
+    parser.add_argument('--insumos', type=int, default=500)
+    parser.add_argument('--centros', type=int, default=6)
+    parser.add_argument('--trabajadores', type=int, default=40)
+    parser.add_argument('--compras', type=int, default=5000)
+    parser.add_argument('--consumos', type=int, default=100000)
+    parser.add_argument('--dias', type=int, default=730)
+    parser.add_argument('--semilla', type=int, default=1234)
+    args = parser.parse_args()
+
+    if args.url:
+        engine = create_engine(args.url)
+    else:
+        from app import app
+        with app.app_context():
+            engine = db.engine
+
+    if args.limpiar:
+        db.metadata.drop_all(engine)
+    db.metadata.create_all(engine)
+
+    if not base_vacia(engine):
+        print("❌ La base ya tiene insumos. Use --limpiar para empezar de cero.")
+        raise SystemExit(1)
+
+    print("📦 Generando datos sintéticos...")
+    resumen = generar_datos(engine, args.insumos, args.centros, args.trabajadores,
+                            args.compras, args.consumos, args.dias, args.semilla)
+    for nombre, cantidad in resumen.items():
+        print(f"   - {nombre}: {cantidad:,}")
+    print("✅ Datos generados")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,431 @@
+# importaciones.py
+"""Importación masiva de insumos, compras y consumos desde CSV o Excel.
+
+Las filas se leen en streaming (csv o openpyxl en modo read_only), se validan
+por lotes resolviendo insumos, centros y trabajadores con diccionarios en
+memoria, y cada lote válido se inserta con un único executemany en su propia
+transacción junto con la actualización de los saldos. Las filas con errores
+no se importan y quedan en el reporte con su número de fila.
+"""
+import csv
+import io
+import os
+from abc import ABC, abstractmethod
+from collections import defaultdict, namedtuple
+from datetime import date, datetime
+
+from openpyxl import load_workbook
+from sqlalchemy import insert, literal, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from buscador import normalizar, invalidar_indice
+from models import db, Insumo, Compra, CentroConsumo, Trabajador, StockInsumo
+from saldos import aplicar_movimientos_lote
+from rollups import aplicar_rollups, MovimientoRollup
+from pronosticos import reiniciar_pronosticos
+from costeo import crear_lotes_pendientes, insertar_consumos_costeados
+
+# Filas validadas que se insertan por transacción
+TAMANO_LOTE = 1000
+
+FORMATOS_FECHA = ('%Y-%m-%d', '%d/%m/%Y', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%d/%m/%Y %H:%M')
+
+ErrorImportacion = namedtuple('ErrorImportacion', ['fila', 'mensaje'])
+
+
+class ArchivoInvalido(ValueError):
+    """El archivo no se puede importar (formato o columnas)"""
+
+
+class ErrorFila(ValueError):
+    """Una fila con datos inválidos"""
+
+
+class ErrorLote(Exception):
+    """Un lote que no se pudo guardar (se revierte entero)"""
+
+
+class ResultadoImportacion:
+    def __init__(self, tipo):
+        self.tipo = tipo
+        self.leidas = 0
+        self.importadas = 0
+        self.errores = []
+
+    @property
+    def rechazadas(self):
+        return len(self.errores)
+
+
+# === LECTURA ===
+
+def normalizar_encabezado(texto):
+    return normalizar(str(texto or '')).strip().replace(' ', '_')
+
+
+def leer_filas(archivo, nombre_archivo):
+    """Genera (numero_fila, {columna: valor}) desde un archivo CSV o XLSX abierto en binario"""
+    extension = os.path.splitext(nombre_archivo or '')[1].lower()
+    if extension in ('.xlsx', '.xlsm'):
+        filas = _leer_xlsx(archivo)
+    elif extension == '.csv':
+        filas = _leer_csv(archivo)
+    else:
+        raise ArchivoInvalido('Formato no soportado: usá un archivo .csv o .xlsx')
+
+    encabezados = next(filas, None)
+    if not encabezados:
+        raise ArchivoInvalido('El archivo está vacío')
+    columnas = [normalizar_encabezado(e) for e in encabezados]
+
+    def generar():
+        for numero, valores in enumerate(filas, start=2):
+            if not any(v not in (None, '') for v in valores):
+                continue
+            yield numero, dict(zip(columnas, valores))
+
+    return columnas, generar()
+
+
+def _leer_csv(archivo):
+    texto = io.TextIOWrapper(archivo, encoding='utf-8-sig', newline='')
+    muestra = texto.read(4096)
+    texto.seek(0)
+    try:
+        dialecto = csv.Sniffer().sniff(muestra, delimiters=',;\t')
+    except csv.Error:
+        dialecto = csv.excel
+    try:
+        yield from csv.reader(texto, dialecto)
+    finally:
+        texto.detach()
+
+
+def _leer_xlsx(archivo):
+    libro = load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        yield from libro.active.iter_rows(values_only=True)
+    finally:
+        libro.close()
+
+
+# === CONVERSIÓN DE VALORES ===
+
+def _texto(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return str(valor).strip()
+
+
+def _numero(valor, campo, entero=False, positivo=True, opcional=False):
+    if valor is None or _texto(valor) == '':
+        if opcional:
+            return None
+        raise ErrorFila(f'Falta {campo}')
+    if isinstance(valor, (int, float)):
+        numero = float(valor)
+    else:
+        texto = _texto(valor)
+        # Coma decimal ("12,5")
+        if ',' in texto and '.' not in texto:
+            texto = texto.replace(',', '.')
+        try:
+            numero = float(texto)
+        except ValueError:
+            raise ErrorFila(f'{campo} no es un número: {valor!r}')
+    if entero:
+        if not numero.is_integer():
+            raise ErrorFila(f'{campo} debe ser un número entero')
+        numero = int(numero)
+    if positivo and numero <= 0:
+        raise ErrorFila(f'{campo} debe ser mayor a cero')
+    if numero < 0:
+        raise ErrorFila(f'{campo} no puede ser negativo')
+    return numero
+
+
+def _fecha(valor, campo):
+    """Devuelve un datetime (o None si está vacío)"""
+    if valor is None or _texto(valor) == '':
+        return None
+    if isinstance(valor, datetime):
+        return valor
+    if isinstance(valor, date):
+        return datetime(valor.year, valor.month, valor.day)
+    texto = _texto(valor)
+    for formato in FORMATOS_FECHA:
+        try:
+            return datetime.strptime(texto, formato)
+        except ValueError:
+            continue
+    raise ErrorFila(f'{campo} no es una fecha válida: {texto!r} (usá AAAA-MM-DD o DD/MM/AAAA)')
+
+
+# === IMPORTADORES ===
+
+class Importador(ABC):
+    """Valida e inserta filas por lotes. Cada subclase define un tipo de registro"""
+    tipo = None
+    requeridas = ()
+    opcionales = ()
+
+    def __init__(self):
+        self.resultado = ResultadoImportacion(self.tipo)
+
+    def preparar(self):
+        """Carga los diccionarios de búsqueda antes de la primera fila"""
+
+    @abstractmethod
+    def validar(self, fila):
+        """Devuelve el dict a insertar o lanza ErrorFila"""
+
+    @abstractmethod
+    def insertar(self, valores):
+        """Inserta un lote validado dentro de la transacción en curso"""
+
+    def revertir(self, valores):
+        """Deshace el estado en memoria de un lote que no se pudo guardar"""
+
+    def terminar(self):
+        """Se llama una vez después del último lote"""
+
+    def verificar_columnas(self, columnas):
+        faltantes = [c for c in self.requeridas if c not in columnas]
+        if faltantes:
+            raise ArchivoInvalido(f'Faltan columnas: {", ".join(faltantes)}. '
+                                  f'Se esperan: {", ".join(self.requeridas + self.opcionales)}')
+
+    def importar(self, filas):
+        self.preparar()
+        lote = []
+        for numero, fila in filas:
+            self.resultado.leidas += 1
+            try:
+                lote.append((numero, self.validar(fila)))
+            except ErrorFila as e:
+                self.resultado.errores.append(ErrorImportacion(numero, str(e)))
+                continue
+            if len(lote) >= TAMANO_LOTE:
+                self._guardar_lote(lote)
+                lote = []
+        if lote:
+            self._guardar_lote(lote)
+        self.terminar()
+        # Los errores de lotes revertidos se agregan al final: se ordenan por fila
+        self.resultado.errores.sort(key=lambda error: error.fila)
+        return self.resultado
+
+    def _guardar_lote(self, lote):
+        valores = [v for _, v in lote]
+        try:
+            self.insertar(valores)
+            db.session.commit()
+            self.resultado.importadas += len(valores)
+        except (ErrorLote, SQLAlchemyError) as e:
+            db.session.rollback()
+            self.revertir(valores)
+            mensaje = str(getattr(e, 'orig', None) or e)
+            self.resultado.errores.extend(ErrorImportacion(numero, f'Lote no importado: {mensaje}')
+                                          for numero, _ in lote)
+
+
+class ImportadorInsumos(Importador):
+    tipo = 'insumos'
+    requeridas = ('denominacion', 'tipo', 'modelo', 'cantidad_por_caja', 'precio_caja')
+    opcionales = ('precio_unitario', 'codigo_barras', 'stock_minimo')
+
+    def preparar(self):
+        self.codigos = {c for (c,) in db.session.query(Insumo.codigo_barras)
+                        .filter(Insumo.codigo_barras.isnot(None))}
+
+    def validar(self, fila):
+        valores = {}
+        for campo in ('denominacion', 'tipo', 'modelo'):
+            valores[campo] = _texto(fila.get(campo))
+            if not valores[campo]:
+                raise ErrorFila(f'Falta {campo}')
+            if len(valores[campo]) > 100:
+                raise ErrorFila(f'{campo} supera los 100 caracteres')
+
+        cantidad = _numero(fila.get('cantidad_por_caja'), 'cantidad_por_caja', entero=True)
+        precio_caja = _numero(fila.get('precio_caja'), 'precio_caja', positivo=False)
+        precio_unitario = _numero(fila.get('precio_unitario'), 'precio_unitario', positivo=False, opcional=True)
+        stock_minimo = _numero(fila.get('stock_minimo'), 'stock_minimo', positivo=False, opcional=True)
+
+        codigo = _texto(fila.get('codigo_barras')) or None
+        if codigo is not None:
+            if codigo in self.codigos:
+                raise ErrorFila(f'El código de barras {codigo} ya existe')
+            self.codigos.add(codigo)
+
+        valores.update(
+            cantidad_por_caja=cantidad,
+            precio_caja=precio_caja,
+            precio_unitario=precio_unitario if precio_unitario is not None else precio_caja / cantidad,
+            codigo_barras=codigo,
+            stock_minimo=stock_minimo or 0.0,
+        )
+        return valores
+
+    def insertar(self, valores):
+        db.session.execute(insert(Insumo), valores)
+        # Fila de saldo en cero para los insumos nuevos
+        sin_saldo = select(Insumo.id, literal(0.0), literal(0.0), literal(0.0)) \
+            .outerjoin(StockInsumo, StockInsumo.insumo_id == Insumo.id) \
+            .where(StockInsumo.insumo_id.is_(None))
+        db.session.execute(insert(StockInsumo).from_select(
+            ['insumo_id', 'unidades_entrada', 'unidades_salida', 'saldo'], sin_saldo))
+
+    def revertir(self, valores):
+        self.codigos.difference_update(v['codigo_barras'] for v in valores if v['codigo_barras'])
+
+    def terminar(self):
+        if self.resultado.importadas:
+            invalidar_indice()
+
+
+class ImportadorMovimientos(Importador):
+    """Base de compras y consumos: resuelve el insumo por id o código de barras"""
+
+    def preparar(self):
+        self.insumos = {}
+        self.insumos_por_codigo = {}
+        for insumo in db.session.query(Insumo.id, Insumo.codigo_barras, Insumo.cantidad_por_caja,
+                                       Insumo.precio_caja, Insumo.precio_unitario):
+            self.insumos[insumo.id] = insumo
+            if insumo.codigo_barras:
+                self.insumos_por_codigo[insumo.codigo_barras] = insumo
+
+    def resolver_insumo(self, valor):
+        texto = _texto(valor)
+        if not texto:
+            raise ErrorFila('Falta insumo')
+        insumo = self.insumos_por_codigo.get(texto)
+        if insumo is None and texto.isdigit():
+            insumo = self.insumos.get(int(texto))
+        if insumo is None:
+            raise ErrorFila(f'No existe el insumo {texto}')
+        return insumo
+
+
+class ImportadorCompras(ImportadorMovimientos):
+    tipo = 'compras'
+    requeridas = ('insumo', 'cantidad_cajas')
+    opcionales = ('precio_caja_compra', 'proveedor', 'lote', 'fecha_vencimiento', 'fecha_compra')
+
+    def validar(self, fila):
+        insumo = self.resolver_insumo(fila.get('insumo'))
+        precio = _numero(fila.get('precio_caja_compra'), 'precio_caja_compra', positivo=False, opcional=True)
+        vencimiento = _fecha(fila.get('fecha_vencimiento'), 'fecha_vencimiento')
+        return {
+            'insumo_id': insumo.id,
+            'cantidad_cajas': _numero(fila.get('cantidad_cajas'), 'cantidad_cajas'),
+            'precio_caja_compra': precio if precio is not None else insumo.precio_caja,
+            'proveedor': _texto(fila.get('proveedor'))[:100] or None,
+            'lote': _texto(fila.get('lote'))[:50] or None,
+            'fecha_vencimiento': vencimiento.date() if vencimiento else None,
+            'fecha_compra': _fecha(fila.get('fecha_compra'), 'fecha_compra') or datetime.utcnow(),
+        }
+
+    def insertar(self, valores):
+        db.session.execute(insert(Compra), valores)
+        entradas = defaultdict(float)
+        for v in valores:
+            entradas[v['insumo_id']] += v['cantidad_cajas'] * self.insumos[v['insumo_id']].cantidad_por_caja
+        aplicar_movimientos_lote({insumo_id: (entrada, 0.0) for insumo_id, entrada in entradas.items()})
+        crear_lotes_pendientes(entradas)
+
+
+class ImportadorConsumos(ImportadorMovimientos):
+    tipo = 'consumos'
+    requeridas = ('insumo', 'cantidad_unidades', 'trabajador')
+    opcionales = ('centro', 'proyecto', 'observaciones', 'fecha_consumo')
+
+    def preparar(self):
+        super().preparar()
+        self.trabajadores = {codigo.upper(): (trabajador_id, centro_id) for trabajador_id, codigo, centro_id
+                             in db.session.query(Trabajador.id, Trabajador.codigo, Trabajador.centro_consumo_id)}
+        self.centros = {}
+        for centro_id, nombre in db.session.query(CentroConsumo.id, CentroConsumo.nombre):
+            self.centros[normalizar(nombre)] = centro_id
+            self.centros[str(centro_id)] = centro_id
+        # Stock disponible, descontado a medida que se validan las filas
+        self.disponible = dict(db.session.query(StockInsumo.insumo_id, StockInsumo.saldo))
+
+    def validar(self, fila):
+        insumo = self.resolver_insumo(fila.get('insumo'))
+        cantidad = _numero(fila.get('cantidad_unidades'), 'cantidad_unidades')
+
+        codigo = _texto(fila.get('trabajador')).upper()
+        if codigo not in self.trabajadores:
+            raise ErrorFila(f'No existe el trabajador {codigo or "(vacío)"}')
+        trabajador_id, centro_id = self.trabajadores[codigo]
+
+        centro = _texto(fila.get('centro'))
+        if centro:
+            centro_fila = self.centros.get(normalizar(centro))
+            if centro_fila is None:
+                raise ErrorFila(f'No existe el centro de consumo {centro}')
+            # Igual que en registrar_consumo: el trabajador tiene que ser del centro
+            if centro_fila != centro_id:
+                raise ErrorFila(f'El trabajador {codigo} no pertenece al centro {centro}')
+
+        disponible = self.disponible.get(insumo.id, 0.0)
+        if cantidad > disponible:
+            raise ErrorFila(f'Stock insuficiente. Disponible: {disponible:.2f} unidades')
+        self.disponible[insumo.id] = disponible - cantidad
+
+        return {
+            'insumo_id': insumo.id,
+            'centro_consumo_id': centro_id,
+            'trabajador_id': trabajador_id,
+            'cantidad_unidades': cantidad,
+            'proyecto': _texto(fila.get('proyecto'))[:100] or None,
+            'observaciones': _texto(fila.get('observaciones'))[:200] or None,
+            'fecha_consumo': _fecha(fila.get('fecha_consumo'), 'fecha_consumo') or datetime.utcnow(),
+        }
+
+    def insertar(self, valores):
+        # Costeo FIFO: los lotes se descuentan y cada consumo se inserta con su costo
+        sin_lote = insertar_consumos_costeados(
+            valores, {v['insumo_id']: self.insumos[v['insumo_id']].precio_unitario for v in valores})
+        if sin_lote:
+            raise ErrorLote(f'Lotes modificados al guardar el lote (insumos {", ".join(map(str, sin_lote))})')
+        salidas = defaultdict(float)
+        for v in valores:
+            salidas[v['insumo_id']] += v['cantidad_unidades']
+        aplicar_rollups([MovimientoRollup(v['fecha_consumo'], v['insumo_id'], v['centro_consumo_id'],
+                                          v['trabajador_id'], v['cantidad_unidades'], v['costo'], 1)
+                         for v in valores])
+        # El stock pudo cambiar desde preparar() por consumos registrados en la app
+        negativos = aplicar_movimientos_lote({insumo_id: (0.0, salida) for insumo_id, salida in salidas.items()})
+        if negativos:
+            raise ErrorLote(f'Stock insuficiente al guardar el lote (insumos {", ".join(map(str, negativos))})')
+
+    def revertir(self, valores):
+        for v in valores:
+            self.disponible[v['insumo_id']] = self.disponible.get(v['insumo_id'], 0.0) + v['cantidad_unidades']
+
+    def terminar(self):
+        # Los consumos importados pueden tener fechas pasadas
+        if self.resultado.importadas:
+            reiniciar_pronosticos()
+
+
+IMPORTADORES = {
+    'insumos': ImportadorInsumos,
+    'compras': ImportadorCompras,
+    'consumos': ImportadorConsumos,
+}
+
+
+def importar_archivo(tipo, archivo, nombre_archivo):
+    """Importa un archivo CSV/XLSX abierto en binario. Devuelve un ResultadoImportacion"""
+    if tipo not in IMPORTADORES:
+        raise ArchivoInvalido(f'Tipo de importación desconocido: {tipo}')
+    importador = IMPORTADORES[tipo]()
+    columnas, filas = leer_filas(archivo, nombre_archivo)
+    importador.verificar_columnas(columnas)
+    return importador.importar(filas)
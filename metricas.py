@@ -0,0 +1,192 @@
+# metricas.py
+"""Instrumentación por petición: consultas SQL, tiempos y métricas Prometheus.
+
+- Cuenta y cronometra las sentencias SQL de cada petición (eventos de SQLAlchemy).
+- Mide tiempo total y de CPU de cada petición.
+- Con METRICAS_SERVER_TIMING = True agrega el header Server-Timing.
+- Expone /_metrics en formato de texto de Prometheus con histogramas por ruta,
+  solo con METRICAS_TOKEN configurado (header Authorization: Bearer <token>);
+  sin token la ruta responde 404.
+- Controla el presupuesto de consultas que declara cada ruta con
+  @presupuesto_consultas(n): si lo supera (típicamente un N+1 nuevo en una
+  plantilla) lo registra en el log y en stock_query_budget_exceeded_total; con
+  METRICAS_PRESUPUESTO_ESTRICTO la petición falla con PresupuestoExcedido.
+
+Las métricas son por proceso: con varios workers de gunicorn cada uno
+publica las suyas.
+"""
+import hmac
+import logging
+import threading
+import time
+
+from flask import g, has_request_context, request, Response, abort
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_CONSULTAS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+logger = logging.getLogger('stock.metricas')
+
+
+class PresupuestoExcedido(Exception):
+    """La ruta hizo más consultas SQL que las declaradas con @presupuesto_consultas"""
+
+
+def presupuesto_consultas(maximo):
+    """Declara cuántas consultas SQL puede hacer la ruta, sin importar cuántas filas muestre.
+
+    Va directamente debajo de @app.route (el atributo queda en la función registrada).
+    """
+    def decorador(f):
+        f.presupuesto_consultas = maximo
+        return f
+    return decorador
+
+
+class Histograma:
+    """Histograma acumulado al estilo Prometheus (cuentas por bucket, suma y total)"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.cuentas = [0] * len(buckets)
+        self.suma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        self.suma += valor
+        self.total += 1
+        for i, limite in enumerate(self.buckets):
+            if valor <= limite:
+                self.cuentas[i] += 1
+
+    def lineas(self, nombre, etiquetas):
+        for limite, cuenta in zip(self.buckets, self.cuentas):
+            yield f'{nombre}_bucket{{{etiquetas},le="{limite}"}} {cuenta}'
+        yield f'{nombre}_bucket{{{etiquetas},le="+Inf"}} {self.total}'
+        yield f'{nombre}_sum{{{etiquetas}}} {self.suma}'
+        yield f'{nombre}_count{{{etiquetas}}} {self.total}'
+
+
+class RegistroMetricas:
+    """Métricas acumuladas del proceso, agrupadas por ruta y método"""
+
+    HISTOGRAMAS = [
+        ('stock_request_duration_seconds', 'Duración total de la petición', BUCKETS_SEGUNDOS),
+        ('stock_request_cpu_seconds', 'Tiempo de CPU de la petición', BUCKETS_SEGUNDOS),
+        ('stock_request_db_seconds', 'Tiempo en consultas SQL por petición', BUCKETS_SEGUNDOS),
+        ('stock_request_db_queries', 'Consultas SQL por petición', BUCKETS_CONSULTAS),
+    ]
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histogramas = {}
+        self._peticiones = {}
+        self._excedidas = {}
+
+    def registrar(self, ruta, metodo, estado, duracion, cpu, db_segundos, consultas):
+        clave = (ruta, metodo)
+        with self._lock:
+            if clave not in self._histogramas:
+                self._histogramas[clave] = [Histograma(b) for _, _, b in self.HISTOGRAMAS]
+            for histograma, valor in zip(self._histogramas[clave], (duracion, cpu, db_segundos, consultas)):
+                histograma.observar(valor)
+            clave_estado = (ruta, metodo, estado)
+            self._peticiones[clave_estado] = self._peticiones.get(clave_estado, 0) + 1
+
+    def registrar_exceso(self, ruta):
+        with self._lock:
+            self._excedidas[ruta] = self._excedidas.get(ruta, 0) + 1
+
+    def exportar(self):
+        """Texto en formato de exposición de Prometheus"""
+        lineas = []
+        with self._lock:
+            lineas.append('# HELP stock_requests_total Peticiones atendidas')
+            lineas.append('# TYPE stock_requests_total counter')
+            for (ruta, metodo, estado), total in sorted(self._peticiones.items()):
+                lineas.append(f'stock_requests_total{{route="{ruta}",method="{metodo}",status="{estado}"}} {total}')
+
+            lineas.append('# HELP stock_query_budget_exceeded_total Peticiones que superaron su presupuesto de consultas')
+            lineas.append('# TYPE stock_query_budget_exceeded_total counter')
+            for ruta, total in sorted(self._excedidas.items()):
+                lineas.append(f'stock_query_budget_exceeded_total{{route="{ruta}"}} {total}')
+
+            for i, (nombre, ayuda, _) in enumerate(self.HISTOGRAMAS):
+                lineas.append(f'# HELP {nombre} {ayuda}')
+                lineas.append(f'# TYPE {nombre} histogram')
+                for (ruta, metodo), histogramas in sorted(self._histogramas.items()):
+                    lineas.extend(histogramas[i].lineas(nombre, f'route="{ruta}",method="{metodo}"'))
+        return '\n'.join(lineas) + '\n'
+
+
+registro = RegistroMetricas()
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _antes_de_consulta(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        conn.info.setdefault('metricas_inicio', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _despues_de_consulta(conn, cursor, statement, parameters, context, executemany):
+    inicios = conn.info.get('metricas_inicio')
+    if not inicios or not has_request_context():
+        return
+    duracion = time.perf_counter() - inicios.pop()
+    g.metricas_consultas = g.get('metricas_consultas', 0) + 1
+    g.metricas_db_segundos = g.get('metricas_db_segundos', 0.0) + duracion
+
+
+def _inicio_peticion():
+    g.metricas_inicio = time.perf_counter()
+    g.metricas_inicio_cpu = time.thread_time()
+    g.metricas_consultas = 0
+    g.metricas_db_segundos = 0.0
+
+
+def _fin_peticion(app, response):
+    if 'metricas_inicio' not in g:
+        return response
+
+    duracion = time.perf_counter() - g.metricas_inicio
+    cpu = time.thread_time() - g.metricas_inicio_cpu
+    consultas = g.metricas_consultas
+    db_segundos = g.metricas_db_segundos
+    ruta = request.endpoint or 'desconocida'
+
+    if ruta != 'metricas':
+        registro.registrar(ruta, request.method, response.status_code,
+                           duracion, cpu, db_segundos, consultas)
+
+    maximo = getattr(app.view_functions.get(request.endpoint), 'presupuesto_consultas', None)
+    if maximo is not None and consultas > maximo:
+        registro.registrar_exceso(ruta)
+        logger.warning('presupuesto_excedido ruta=%s consultas=%s presupuesto=%s', ruta, consultas, maximo)
+        if app.config.get('METRICAS_PRESUPUESTO_ESTRICTO'):
+            raise PresupuestoExcedido(f'{ruta}: {consultas} consultas SQL, presupuesto {maximo}')
+
+    if app.config.get('METRICAS_SERVER_TIMING'):
+        response.headers.add('Server-Timing',
+                             f'db;dur={db_segundos * 1000:.1f};desc="{consultas} consultas", '
+                             f'cpu;dur={cpu * 1000:.1f}, '
+                             f'total;dur={duracion * 1000:.1f}')
+    return response
+
+
+def registrar_metricas(app):
+    """Conecta la instrumentación a la aplicación y agrega la ruta /_metrics"""
+    app.before_request(_inicio_peticion)
+    app.after_request(lambda response: _fin_peticion(app, response))
+
+    def metricas():
+        token = app.config.get('METRICAS_TOKEN')
+        if not token:
+            abort(404)
+        if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            abort(403)
+        return Response(registro.exportar(), mimetype='text/plain; version=0.0.4')
+
+    app.add_url_rule('/_metrics', 'metricas', metricas)
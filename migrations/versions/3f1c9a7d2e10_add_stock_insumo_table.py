@@ -0,0 +1,45 @@
+"""add stock_insumo table
+
+Revision ID: 3f1c9a7d2e10
+Revises: b482263f7bb0
+Create Date: 2026-10-18 09:12:41.118305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c9a7d2e10'
+down_revision = 'b482263f7bb0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('stock_insumo',
+    sa.Column('insumo_id', sa.Integer(), nullable=False),
+    sa.Column('unidades_entrada', sa.Float(), nullable=False),
+    sa.Column('unidades_salida', sa.Float(), nullable=False),
+    sa.Column('saldo', sa.Float(), nullable=False),
+    sa.Column('ultimo_movimiento_tipo', sa.String(length=10), nullable=True),
+    sa.Column('ultimo_movimiento_id', sa.Integer(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['insumo_id'], ['insumo.id'], ),
+    sa.PrimaryKeyConstraint('insumo_id')
+    )
+    # Saldo inicial de cada insumo desde sus compras y consumos
+    op.execute(
+        "INSERT INTO stock_insumo (insumo_id, unidades_entrada, unidades_salida, saldo, updated_at) "
+        "SELECT id, entrada, salida, entrada - salida, CURRENT_TIMESTAMP FROM ("
+        "SELECT insumo.id, "
+        "COALESCE((SELECT SUM(compra.cantidad_cajas * insumo.cantidad_por_caja) FROM compra "
+        "WHERE compra.insumo_id = insumo.id), 0) AS entrada, "
+        "COALESCE((SELECT SUM(consumo.cantidad_unidades) FROM consumo "
+        "WHERE consumo.insumo_id = insumo.id), 0) AS salida "
+        "FROM insumo) AS totales"
+    )
+
+
+def downgrade():
+    op.drop_table('stock_insumo')
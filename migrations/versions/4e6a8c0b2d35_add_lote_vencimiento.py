@@ -0,0 +1,43 @@
+"""add lote_stock.fecha_vencimiento, expiry index and resumen_vencimiento
+
+Revision ID: 4e6a8c0b2d35
+Revises: 9b3d5f7a1c24
+Create Date: 2026-10-18 19:05:41.217306
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4e6a8c0b2d35'
+down_revision = '9b3d5f7a1c24'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('lote_stock', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('fecha_vencimiento', sa.Date(), nullable=True))
+    op.execute('UPDATE lote_stock SET fecha_vencimiento = '
+               '(SELECT compra.fecha_vencimiento FROM compra WHERE compra.id = lote_stock.compra_id)')
+    op.create_index('ix_lote_stock_vencimiento', 'lote_stock', ['fecha_vencimiento'], unique=False,
+                    sqlite_where=sa.text('restante > 0'), postgresql_where=sa.text('restante > 0'))
+
+    op.create_table('resumen_vencimiento',
+    sa.Column('horizonte_dias', sa.Integer(), nullable=False),
+    sa.Column('lotes', sa.Integer(), nullable=False),
+    sa.Column('insumos', sa.Integer(), nullable=False),
+    sa.Column('unidades', sa.Float(), nullable=False),
+    sa.Column('valor', sa.Float(), nullable=False),
+    sa.Column('calculado_en', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('horizonte_dias')
+    )
+    # El resumen se carga en la próxima pasada del monitor o con: flask vencimientos --actualizar
+
+
+def downgrade():
+    op.drop_table('resumen_vencimiento')
+    op.drop_index('ix_lote_stock_vencimiento', table_name='lote_stock')
+    with op.batch_alter_table('lote_stock', schema=None) as batch_op:
+        batch_op.drop_column('fecha_vencimiento')
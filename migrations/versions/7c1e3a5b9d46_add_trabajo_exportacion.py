@@ -0,0 +1,43 @@
+"""add trabajo_exportacion table for background exports
+
+Revision ID: 7c1e3a5b9d46
+Revises: 4e6a8c0b2d35
+Create Date: 2026-10-18 21:12:08.503914
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c1e3a5b9d46'
+down_revision = '4e6a8c0b2d35'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('trabajo_exportacion',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('clave', sa.String(length=100), nullable=False),
+    sa.Column('conjunto', sa.String(length=20), nullable=False),
+    sa.Column('formato', sa.String(length=20), nullable=False),
+    sa.Column('usuario_id', sa.Integer(), nullable=True),
+    sa.Column('estado', sa.String(length=20), nullable=False),
+    sa.Column('filas', sa.Integer(), nullable=False),
+    sa.Column('archivo', sa.String(length=500), nullable=True),
+    sa.Column('tamano', sa.Integer(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('actualizado_en', sa.DateTime(), nullable=True),
+    sa.Column('terminado_en', sa.DateTime(), nullable=True),
+    sa.Column('expira_en', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['usuario_id'], ['usuario.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_trabajo_exportacion_clave', 'trabajo_exportacion', ['clave', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_trabajo_exportacion_clave', table_name='trabajo_exportacion')
+    op.drop_table('trabajo_exportacion')
@@ -0,0 +1,36 @@
+"""add indexes for hot foreign keys and sort columns
+
+Revision ID: 8d2e4b6a1c37
+Revises: 3f1c9a7d2e10
+Create Date: 2026-10-18 11:40:05.527913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d2e4b6a1c37'
+down_revision = '3f1c9a7d2e10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_consumo_fecha_id', 'consumo', ['fecha_consumo', 'id'], unique=False)
+    op.create_index('ix_consumo_insumo_fecha', 'consumo', ['insumo_id', 'fecha_consumo'], unique=False)
+    op.create_index('ix_consumo_centro_fecha', 'consumo', ['centro_consumo_id', 'fecha_consumo'], unique=False)
+    op.create_index('ix_consumo_trabajador_fecha', 'consumo', ['trabajador_id', 'fecha_consumo'], unique=False)
+    op.create_index('ix_compra_fecha_compra', 'compra', ['fecha_compra'], unique=False)
+    op.create_index('ix_compra_insumo_fecha', 'compra', ['insumo_id', 'fecha_compra'], unique=False)
+    op.create_index('ix_trabajador_centro_nombre', 'trabajador', ['centro_consumo_id', 'nombre'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_trabajador_centro_nombre', table_name='trabajador')
+    op.drop_index('ix_compra_insumo_fecha', table_name='compra')
+    op.drop_index('ix_compra_fecha_compra', table_name='compra')
+    op.drop_index('ix_consumo_trabajador_fecha', table_name='consumo')
+    op.drop_index('ix_consumo_centro_fecha', table_name='consumo')
+    op.drop_index('ix_consumo_insumo_fecha', table_name='consumo')
+    op.drop_index('ix_consumo_fecha_id', table_name='consumo')
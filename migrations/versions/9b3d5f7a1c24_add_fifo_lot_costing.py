@@ -0,0 +1,147 @@
+"""add lote_stock, consumo_lote and consumo.costo for FIFO costing
+
+Revision ID: 9b3d5f7a1c24
+Revises: f2c4a6e8b013
+Create Date: 2026-10-18 17:48:12.530941
+
+"""
+from collections import defaultdict, deque
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b3d5f7a1c24'
+down_revision = 'f2c4a6e8b013'
+branch_labels = None
+depends_on = None
+
+TOLERANCIA = 1e-6
+INSUMOS_POR_TANDA = 500
+
+
+def _cargar_lotes_y_costos(bind):
+    """Lotes de las compras existentes y costo FIFO de los consumos, como costeo.reconstruir_costos"""
+    op.execute(
+        "INSERT INTO lote_stock (compra_id, insumo_id, fecha, unidades, restante, costo_unitario) "
+        "SELECT compra.id, compra.insumo_id, COALESCE(compra.fecha_compra, CURRENT_TIMESTAMP), "
+        "compra.cantidad_cajas * insumo.cantidad_por_caja, compra.cantidad_cajas * insumo.cantidad_por_caja, "
+        "CASE WHEN insumo.cantidad_por_caja > 0 THEN compra.precio_caja_compra / insumo.cantidad_por_caja "
+        "ELSE 0.0 END "
+        "FROM compra JOIN insumo ON insumo.id = compra.insumo_id"
+    )
+
+    insumo_ids = [fila[0] for fila in bind.execute(sa.text('SELECT id FROM insumo ORDER BY id'))]
+    for inicio in range(0, len(insumo_ids), INSUMOS_POR_TANDA):
+        tanda = {'ids': insumo_ids[inicio:inicio + INSUMOS_POR_TANDA]}
+        colas = defaultdict(deque)
+        for insumo_id, lote_id, restante, costo in bind.execute(sa.text(
+                'SELECT insumo_id, id, restante, costo_unitario FROM lote_stock '
+                'WHERE insumo_id IN :ids ORDER BY insumo_id, fecha, id'
+        ).bindparams(sa.bindparam('ids', expanding=True)), tanda):
+            colas[insumo_id].append([lote_id, restante, costo])
+
+        costos, asignaciones, tomadas = [], [], defaultdict(float)
+        for consumo_id, insumo_id, cantidad, precio in bind.execute(sa.text(
+                'SELECT consumo.id, consumo.insumo_id, consumo.cantidad_unidades, insumo.precio_unitario '
+                'FROM consumo JOIN insumo ON insumo.id = consumo.insumo_id '
+                'WHERE consumo.insumo_id IN :ids '
+                'ORDER BY consumo.insumo_id, consumo.fecha_consumo, consumo.id'
+        ).bindparams(sa.bindparam('ids', expanding=True)), tanda).all():
+            cola, costo = colas[insumo_id], 0.0
+            while cantidad > TOLERANCIA and cola:
+                lote = cola[0]
+                unidades = min(cantidad, lote[1])
+                asignaciones.append({'consumo_id': consumo_id, 'lote_id': lote[0], 'unidades': unidades})
+                tomadas[lote[0]] += unidades
+                costo += unidades * lote[2]
+                lote[1] -= unidades
+                cantidad -= unidades
+                if lote[1] <= TOLERANCIA:
+                    cola.popleft()
+            # Las unidades sin lote se valúan al precio unitario del insumo
+            costos.append({'b_id': consumo_id, 'b_costo': costo + max(cantidad, 0.0) * (precio or 0.0)})
+
+        if costos:
+            bind.execute(sa.text('UPDATE consumo SET costo = :b_costo WHERE id = :b_id'), costos)
+        if asignaciones:
+            bind.execute(sa.text('INSERT INTO consumo_lote (consumo_id, lote_id, unidades) '
+                                 'VALUES (:consumo_id, :lote_id, :unidades)'), asignaciones)
+        if tomadas:
+            bind.execute(sa.text('UPDATE lote_stock SET restante = restante - :b_unidades WHERE id = :b_id'),
+                         [{'b_id': lote_id, 'b_unidades': unidades} for lote_id, unidades in tomadas.items()])
+
+
+def _recalcular_acumulados(bind):
+    """Vuelve a cargar consumo_diario y consumo_mensual con los costos FIFO"""
+    if bind.dialect.name == 'postgresql':
+        dia = 'CAST(consumo.fecha_consumo AS DATE)'
+        mes = "CAST(date_trunc('month', dia) AS DATE)"
+    else:
+        dia = 'date(consumo.fecha_consumo)'
+        mes = "date(dia, 'start of month')"
+    columnas = 'insumo_id, centro_consumo_id, trabajador_id, unidades, costo, consumos'
+    op.execute('DELETE FROM consumo_diario')
+    op.execute('DELETE FROM consumo_mensual')
+    op.execute(
+        f"INSERT INTO consumo_diario (dia, {columnas}) "
+        f"SELECT {dia}, consumo.insumo_id, consumo.centro_consumo_id, consumo.trabajador_id, "
+        "SUM(consumo.cantidad_unidades), "
+        "SUM(COALESCE(consumo.costo, consumo.cantidad_unidades * insumo.precio_unitario)), "
+        "COUNT(consumo.id) "
+        "FROM consumo JOIN insumo ON insumo.id = consumo.insumo_id "
+        f"GROUP BY {dia}, consumo.insumo_id, consumo.centro_consumo_id, consumo.trabajador_id"
+    )
+    op.execute(
+        f"INSERT INTO consumo_mensual (mes, {columnas}) "
+        f"SELECT {mes}, insumo_id, centro_consumo_id, trabajador_id, "
+        "SUM(unidades), SUM(costo), SUM(consumos) FROM consumo_diario "
+        f"GROUP BY {mes}, insumo_id, centro_consumo_id, trabajador_id"
+    )
+
+
+def upgrade():
+    op.create_table('lote_stock',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('compra_id', sa.Integer(), nullable=False),
+    sa.Column('insumo_id', sa.Integer(), nullable=False),
+    sa.Column('fecha', sa.DateTime(), nullable=False),
+    sa.Column('unidades', sa.Float(), nullable=False),
+    sa.Column('restante', sa.Float(), nullable=False),
+    sa.Column('costo_unitario', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['compra_id'], ['compra.id'], ),
+    sa.ForeignKeyConstraint(['insumo_id'], ['insumo.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('compra_id')
+    )
+    op.create_index('ix_lote_stock_abiertos', 'lote_stock', ['insumo_id', 'fecha', 'id'], unique=False,
+                    sqlite_where=sa.text('restante > 0'), postgresql_where=sa.text('restante > 0'))
+
+    op.create_table('consumo_lote',
+    sa.Column('consumo_id', sa.Integer(), nullable=False),
+    sa.Column('lote_id', sa.Integer(), nullable=False),
+    sa.Column('unidades', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['consumo_id'], ['consumo.id'], ),
+    sa.ForeignKeyConstraint(['lote_id'], ['lote_stock.id'], ),
+    sa.PrimaryKeyConstraint('consumo_id', 'lote_id')
+    )
+    op.create_index('ix_consumo_lote_lote_id', 'consumo_lote', ['lote_id'], unique=False)
+
+    with op.batch_alter_table('consumo', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('costo', sa.Float(), nullable=True))
+
+    bind = op.get_bind()
+    _cargar_lotes_y_costos(bind)
+    # Los acumulados se cargaron al precio unitario: pasan a usar el costo FIFO
+    _recalcular_acumulados(bind)
+
+
+def downgrade():
+    with op.batch_alter_table('consumo', schema=None) as batch_op:
+        batch_op.drop_column('costo')
+
+    op.drop_index('ix_consumo_lote_lote_id', table_name='consumo_lote')
+    op.drop_table('consumo_lote')
+    op.drop_index('ix_lote_stock_abiertos', table_name='lote_stock')
+    op.drop_table('lote_stock')
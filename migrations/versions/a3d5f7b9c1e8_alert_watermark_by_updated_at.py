@@ -0,0 +1,42 @@
+"""alert monitor watermark on stock_insumo.updated_at instead of movement ids
+
+Revision ID: a3d5f7b9c1e8
+Revises: 7c1e3a5b9d46
+Create Date: 2026-10-19 10:24:37.618204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3d5f7b9c1e8'
+down_revision = '7c1e3a5b9d46'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_stock_insumo_updated_at', 'stock_insumo', ['updated_at'], unique=False)
+    # Saldos sin estampa (anteriores a updated_at): se consideran sin cambios
+    op.execute('UPDATE stock_insumo SET updated_at = CURRENT_TIMESTAMP WHERE updated_at IS NULL')
+
+    with op.batch_alter_table('monitor_alertas', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('ultimo_cambio', sa.DateTime(), nullable=True))
+    # La marca pasa a ser la última ejecución: los cambios posteriores se revisan
+    op.execute('UPDATE monitor_alertas SET ultimo_cambio = COALESCE(ultima_ejecucion, CURRENT_TIMESTAMP)')
+    with op.batch_alter_table('monitor_alertas', schema=None) as batch_op:
+        batch_op.alter_column('ultimo_cambio', existing_type=sa.DateTime(), nullable=False)
+        batch_op.drop_column('ultima_compra_id')
+        batch_op.drop_column('ultimo_consumo_id')
+
+
+def downgrade():
+    # Sin marca de ids: la próxima pasada del monitor evalúa todos los insumos
+    op.execute('DELETE FROM monitor_alertas')
+    with op.batch_alter_table('monitor_alertas', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('ultimo_consumo_id', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('ultima_compra_id', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.drop_column('ultimo_cambio')
+
+    op.drop_index('ix_stock_insumo_updated_at', table_name='stock_insumo')
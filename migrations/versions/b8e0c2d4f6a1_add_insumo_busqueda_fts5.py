@@ -0,0 +1,61 @@
+"""insumo_busqueda FTS5 table and triggers for the insumo search
+
+Revision ID: b8e0c2d4f6a1
+Revises: a3d5f7b9c1e8
+Create Date: 2026-10-19 11:02:15.390846
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8e0c2d4f6a1'
+down_revision = 'a3d5f7b9c1e8'
+branch_labels = None
+depends_on = None
+
+
+SENTENCIAS = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS insumo_busqueda USING fts5("
+    "denominacion, tipo, modelo, codigo_barras, "
+    "content='insumo', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS insumo_busqueda_ai AFTER INSERT ON insumo BEGIN "
+    "INSERT INTO insumo_busqueda(rowid, denominacion, tipo, modelo, codigo_barras) "
+    "VALUES (new.id, new.denominacion, new.tipo, new.modelo, new.codigo_barras); END",
+    "CREATE TRIGGER IF NOT EXISTS insumo_busqueda_ad AFTER DELETE ON insumo BEGIN "
+    "INSERT INTO insumo_busqueda(insumo_busqueda, rowid, denominacion, tipo, modelo, codigo_barras) "
+    "VALUES ('delete', old.id, old.denominacion, old.tipo, old.modelo, old.codigo_barras); END",
+    "CREATE TRIGGER IF NOT EXISTS insumo_busqueda_au AFTER UPDATE ON insumo BEGIN "
+    "INSERT INTO insumo_busqueda(insumo_busqueda, rowid, denominacion, tipo, modelo, codigo_barras) "
+    "VALUES ('delete', old.id, old.denominacion, old.tipo, old.modelo, old.codigo_barras); "
+    "INSERT INTO insumo_busqueda(rowid, denominacion, tipo, modelo, codigo_barras) "
+    "VALUES (new.id, new.denominacion, new.tipo, new.modelo, new.codigo_barras); END",
+]
+
+
+def fts5_trigram_disponible(bind):
+    # El tokenizer trigram está desde SQLite 3.34; sin él la app usa el índice en memoria
+    version = bind.execute(sa.text('SELECT sqlite_version()')).scalar()
+    if tuple(int(parte) for parte in version.split('.')) < (3, 34):
+        return False
+    return bool(bind.execute(sa.text("SELECT sqlite_compileoption_used('ENABLE_FTS5')")).scalar())
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite' or not fts5_trigram_disponible(bind):
+        return
+    for sentencia in SENTENCIAS:
+        op.execute(sentencia)
+    # Carga única de los insumos existentes; desde acá lo mantienen los triggers
+    op.execute("INSERT INTO insumo_busqueda(insumo_busqueda) VALUES ('rebuild')")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute('DROP TRIGGER IF EXISTS insumo_busqueda_au')
+    op.execute('DROP TRIGGER IF EXISTS insumo_busqueda_ad')
+    op.execute('DROP TRIGGER IF EXISTS insumo_busqueda_ai')
+    op.execute('DROP TABLE IF EXISTS insumo_busqueda')
@@ -0,0 +1,26 @@
+"""add version column to usuario
+
+Revision ID: c5a7e9f13b42
+Revises: 8d2e4b6a1c37
+Create Date: 2026-10-18 13:02:57.340126
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5a7e9f13b42'
+down_revision = '8d2e4b6a1c37'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('usuario', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade():
+    with op.batch_alter_table('usuario', schema=None) as batch_op:
+        batch_op.drop_column('version')
@@ -0,0 +1,45 @@
+"""add evento_alerta_stock and monitor_alertas tables
+
+Revision ID: e1b3d5f7a902
+Revises: c5a7e9f13b42
+Create Date: 2026-10-18 14:10:22.518604
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1b3d5f7a902'
+down_revision = 'c5a7e9f13b42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('evento_alerta_stock',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('insumo_id', sa.Integer(), nullable=False),
+    sa.Column('estado_anterior', sa.String(length=20), nullable=False),
+    sa.Column('estado_nuevo', sa.String(length=20), nullable=False),
+    sa.Column('stock_actual', sa.Float(), nullable=False),
+    sa.Column('stock_minimo', sa.Float(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['insumo_id'], ['insumo.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_evento_alerta_insumo_id', 'evento_alerta_stock', ['insumo_id', 'id'], unique=False)
+
+    op.create_table('monitor_alertas',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('ultima_compra_id', sa.Integer(), nullable=False),
+    sa.Column('ultimo_consumo_id', sa.Integer(), nullable=False),
+    sa.Column('ultima_ejecucion', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('monitor_alertas')
+    op.drop_index('ix_evento_alerta_insumo_id', table_name='evento_alerta_stock')
+    op.drop_table('evento_alerta_stock')
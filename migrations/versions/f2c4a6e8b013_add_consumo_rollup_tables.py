@@ -0,0 +1,74 @@
+"""add consumo_diario and consumo_mensual rollup tables
+
+Revision ID: f2c4a6e8b013
+Revises: e1b3d5f7a902
+Create Date: 2026-10-18 15:02:41.274018
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2c4a6e8b013'
+down_revision = 'e1b3d5f7a902'
+branch_labels = None
+depends_on = None
+
+
+def _crear_tabla(nombre, columna_periodo):
+    op.create_table(nombre,
+    sa.Column(columna_periodo, sa.Date(), nullable=False),
+    sa.Column('insumo_id', sa.Integer(), nullable=False),
+    sa.Column('centro_consumo_id', sa.Integer(), nullable=False),
+    sa.Column('trabajador_id', sa.Integer(), nullable=False),
+    sa.Column('unidades', sa.Float(), nullable=False),
+    sa.Column('costo', sa.Float(), nullable=False),
+    sa.Column('consumos', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['centro_consumo_id'], ['centro_consumo.id'], ),
+    sa.ForeignKeyConstraint(['insumo_id'], ['insumo.id'], ),
+    sa.ForeignKeyConstraint(['trabajador_id'], ['trabajador.id'], ),
+    sa.PrimaryKeyConstraint(columna_periodo, 'insumo_id', 'centro_consumo_id', 'trabajador_id')
+    )
+    op.create_index(f'ix_{nombre}_centro_{columna_periodo}', nombre, ['centro_consumo_id', columna_periodo], unique=False)
+    op.create_index(f'ix_{nombre}_insumo_{columna_periodo}', nombre, ['insumo_id', columna_periodo], unique=False)
+
+
+def _cargar_acumulados():
+    """Los mismos INSERT ... SELECT que rollups.reconstruir_rollups (sin costo FIFO todavía)"""
+    if op.get_bind().dialect.name == 'postgresql':
+        dia = 'CAST(consumo.fecha_consumo AS DATE)'
+        mes = "CAST(date_trunc('month', dia) AS DATE)"
+    else:
+        dia = 'date(consumo.fecha_consumo)'
+        mes = "date(dia, 'start of month')"
+    columnas = 'insumo_id, centro_consumo_id, trabajador_id, unidades, costo, consumos'
+    op.execute(
+        f"INSERT INTO consumo_diario (dia, {columnas}) "
+        f"SELECT {dia}, consumo.insumo_id, consumo.centro_consumo_id, consumo.trabajador_id, "
+        "SUM(consumo.cantidad_unidades), SUM(consumo.cantidad_unidades * insumo.precio_unitario), "
+        "COUNT(consumo.id) "
+        "FROM consumo JOIN insumo ON insumo.id = consumo.insumo_id "
+        f"GROUP BY {dia}, consumo.insumo_id, consumo.centro_consumo_id, consumo.trabajador_id"
+    )
+    op.execute(
+        f"INSERT INTO consumo_mensual (mes, {columnas}) "
+        f"SELECT {mes}, insumo_id, centro_consumo_id, trabajador_id, "
+        "SUM(unidades), SUM(costo), SUM(consumos) FROM consumo_diario "
+        f"GROUP BY {mes}, insumo_id, centro_consumo_id, trabajador_id"
+    )
+
+
+def upgrade():
+    _crear_tabla('consumo_diario', 'dia')
+    _crear_tabla('consumo_mensual', 'mes')
+    _cargar_acumulados()
+
+
+def downgrade():
+    op.drop_index('ix_consumo_mensual_insumo_mes', table_name='consumo_mensual')
+    op.drop_index('ix_consumo_mensual_centro_mes', table_name='consumo_mensual')
+    op.drop_table('consumo_mensual')
+    op.drop_index('ix_consumo_diario_insumo_dia', table_name='consumo_diario')
+    op.drop_index('ix_consumo_diario_centro_dia', table_name='consumo_diario')
+    op.drop_table('consumo_diario')
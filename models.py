@@ -1,9 +1,86 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
 from werkzeug.security import generate_password_hash, check_password_hash
 
 db = SQLAlchemy()
 
+# Instancias con propiedades memorizadas, por sesión (Session.info)
+CLAVE_MEMO = 'memo_propiedades'
+_propiedades_memorizadas = set()
+
+
+class propiedad_memorizada:
+    """Como @property, pero se calcula una vez por instancia hasta el próximo flush.
+
+    El valor queda en el __dict__ de la instancia, así las lecturas siguientes
+    (p. ej. las cinco de stock_actual por fila en gestion_insumos.html) no
+    pasan por el descriptor. La sesión es la de la petición, por lo que la
+    memoria dura como mucho una petición; se descarta antes en cada flush,
+    UPDATE/DELETE masivo, rollback, expire o refresh de la instancia. Fuera
+    de una sesión no se memoriza.
+    """
+    def __init__(self, funcion):
+        self.funcion = funcion
+        self.__doc__ = funcion.__doc__
+
+    def __set_name__(self, clase, nombre):
+        self.nombre = nombre
+        _propiedades_memorizadas.add(nombre)
+
+    def __get__(self, instancia, clase=None):
+        if instancia is None:
+            return self
+        valor = self.funcion(instancia)
+        sesion = object_session(instancia)
+        if sesion is not None:
+            instancia.__dict__[self.nombre] = valor
+            sesion.info.setdefault(CLAVE_MEMO, set()).add(instancia)
+        return valor
+
+
+def olvidar_propiedades(instancia):
+    """Descarta las propiedades memorizadas de una instancia"""
+    # Los eventos de expire pueden llegar con la instancia ya recolectada
+    if instancia is None:
+        return
+    for nombre in _propiedades_memorizadas.intersection(instancia.__dict__):
+        del instancia.__dict__[nombre]
+
+
+def olvidar_propiedades_sesion(sesion):
+    """Descarta las propiedades memorizadas de todas las instancias de la sesión"""
+    for instancia in sesion.info.pop(CLAVE_MEMO, ()):
+        olvidar_propiedades(instancia)
+
+
+@event.listens_for(Session, 'after_flush')
+def _olvidar_tras_flush(sesion, _contexto):
+    olvidar_propiedades_sesion(sesion)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _olvidar_tras_rollback(sesion, _transaccion):
+    olvidar_propiedades_sesion(sesion)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _olvidar_antes_de_update(estado):
+    # reservar_stock / aplicar_movimiento cambian el saldo con UPDATE sin flush
+    if estado.is_update or estado.is_delete:
+        olvidar_propiedades_sesion(estado.session)
+
+
+@event.listens_for(db.Model, 'expire', propagate=True)
+def _olvidar_al_expirar(instancia, _atributos):
+    olvidar_propiedades(instancia)
+
+
+@event.listens_for(db.Model, 'refresh', propagate=True)
+def _olvidar_al_refrescar(instancia, _contexto, _atributos):
+    olvidar_propiedades(instancia)
+
 class Usuario(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
@@ -13,6 +90,10 @@ class Usuario(db.Model):
     email = db.Column(db.String(120))
     activo = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Se incrementa en cada UPDATE: invalida los permisos cacheados del usuario
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    __mapper_args__ = {'version_id_col': version}
     
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
@@ -38,6 +119,11 @@ class CentroConsumo(db.Model):
         return f'<CentroConsumo {self.nombre}>'
 
 class Trabajador(db.Model):
+    __table_args__ = (
+        # get_trabajadores_por_centro: filtra por centro y ordena por nombre
+        db.Index('ix_trabajador_centro_nombre', 'centro_consumo_id', 'nombre'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     codigo = db.Column(db.String(20), unique=True, nullable=False)
     nombre = db.Column(db.String(100), nullable=False)
@@ -74,37 +160,47 @@ class Insumo(db.Model):
     # Relaciones
     compras = db.relationship('Compra', backref='insumo', lazy=True, cascade='all, delete-orphan')
     consumos = db.relationship('Consumo', backref='insumo', lazy=True, cascade='all, delete-orphan')
+    eventos_alerta = db.relationship('EventoAlertaStock', backref='insumo', lazy=True, cascade='all, delete-orphan')
+
+    # Saldo materializado (se carga junto con el insumo, sin consultas extra)
+    saldo = db.relationship('StockInsumo', backref='insumo', uselist=False, lazy='joined', cascade='all, delete-orphan')
     
     # Propiedades calculadas
-    @property
+    @propiedad_memorizada
     def stock_actual(self):
-        """Calcula el stock actual en unidades"""
+        """Devuelve el stock actual en unidades desde el saldo materializado"""
+        if self.saldo is not None:
+            return self.saldo.saldo
+        return self.calcular_stock_desde_movimientos()
+
+    def calcular_stock_desde_movimientos(self):
+        """Calcula el stock sumando todo el historial de compras y consumos"""
         total_compras = sum(compra.cantidad_unidades for compra in self.compras)
         total_consumos = sum(consumo.cantidad_unidades for consumo in self.consumos)
         return total_compras - total_consumos
     
-    @property
+    @propiedad_memorizada
     def stock_en_cajas(self):
         """Calcula cuántas cajas completas hay"""
         return self.stock_actual // self.cantidad_por_caja if self.cantidad_por_caja > 0 else 0
     
-    @property
+    @propiedad_memorizada
     def unidades_sueltas(self):
         """Calcula las unidades sueltas (resto)"""
         return self.stock_actual % self.cantidad_por_caja if self.cantidad_por_caja > 0 else 0
     
-    @property
+    @propiedad_memorizada
     def valor_stock_actual(self):
         """Calcula el valor total del stock actual"""
         return self.stock_actual * self.precio_unitario
     
     # NUEVA: Propiedad para alertas
-    @property
+    @propiedad_memorizada
     def necesita_reposicion(self):
         """Verifica si el stock está por debajo del mínimo"""
         return self.stock_actual <= self.stock_minimo
 
-    @property
+    @propiedad_memorizada
     def porcentaje_stock(self):
         """Calcula el porcentaje de stock restante (si stock_minimo > 0)"""
         if self.stock_minimo > 0 and self.stock_actual > 0:
@@ -115,7 +211,117 @@ class Insumo(db.Model):
         return f'<Insumo {self.denominacion} - {self.tipo} ({self.modelo})>'
 
 
+class StockInsumo(db.Model):
+    """Saldo de stock por insumo, actualizado en la misma transacción que cada movimiento"""
+    __tablename__ = 'stock_insumo'
+    __table_args__ = (
+        # Saldos modificados desde la última pasada del monitor de alertas
+        db.Index('ix_stock_insumo_updated_at', 'updated_at'),
+    )
+
+    insumo_id = db.Column(db.Integer, db.ForeignKey('insumo.id'), primary_key=True)
+
+    # Totales acumulados en unidades
+    unidades_entrada = db.Column(db.Float, nullable=False, default=0.0)
+    unidades_salida = db.Column(db.Float, nullable=False, default=0.0)
+    saldo = db.Column(db.Float, nullable=False, default=0.0)
+
+    # Último movimiento aplicado ('compra' o 'consumo' + id)
+    ultimo_movimiento_tipo = db.Column(db.String(10))
+    ultimo_movimiento_id = db.Column(db.Integer)
+
+    # Metadata
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<StockInsumo {self.insumo_id}: {self.saldo} unidades>'
+
+
+class ConsumoDiario(db.Model):
+    """Consumo acumulado por día, insumo, centro y trabajador"""
+    __tablename__ = 'consumo_diario'
+    __table_args__ = (
+        db.Index('ix_consumo_diario_centro_dia', 'centro_consumo_id', 'dia'),
+        db.Index('ix_consumo_diario_insumo_dia', 'insumo_id', 'dia'),
+    )
+
+    dia = db.Column(db.Date, primary_key=True)
+    insumo_id = db.Column(db.Integer, db.ForeignKey('insumo.id'), primary_key=True)
+    centro_consumo_id = db.Column(db.Integer, db.ForeignKey('centro_consumo.id'), primary_key=True)
+    trabajador_id = db.Column(db.Integer, db.ForeignKey('trabajador.id'), primary_key=True)
+
+    unidades = db.Column(db.Float, nullable=False, default=0.0)
+    costo = db.Column(db.Float, nullable=False, default=0.0)
+    consumos = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<ConsumoDiario {self.dia} insumo {self.insumo_id}: {self.unidades} unidades>'
+
+
+class ConsumoMensual(db.Model):
+    """Consumo acumulado por mes (primer día del mes), insumo, centro y trabajador"""
+    __tablename__ = 'consumo_mensual'
+    __table_args__ = (
+        db.Index('ix_consumo_mensual_centro_mes', 'centro_consumo_id', 'mes'),
+        db.Index('ix_consumo_mensual_insumo_mes', 'insumo_id', 'mes'),
+    )
+
+    mes = db.Column(db.Date, primary_key=True)
+    insumo_id = db.Column(db.Integer, db.ForeignKey('insumo.id'), primary_key=True)
+    centro_consumo_id = db.Column(db.Integer, db.ForeignKey('centro_consumo.id'), primary_key=True)
+    trabajador_id = db.Column(db.Integer, db.ForeignKey('trabajador.id'), primary_key=True)
+
+    unidades = db.Column(db.Float, nullable=False, default=0.0)
+    costo = db.Column(db.Float, nullable=False, default=0.0)
+    consumos = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<ConsumoMensual {self.mes} insumo {self.insumo_id}: {self.unidades} unidades>'
+
+
+class EventoAlertaStock(db.Model):
+    """Cruce del umbral de stock mínimo detectado por el monitor de alertas"""
+    __tablename__ = 'evento_alerta_stock'
+    __table_args__ = (
+        # Último evento de cada insumo (estado anterior al escanear)
+        db.Index('ix_evento_alerta_insumo_id', 'insumo_id', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    insumo_id = db.Column(db.Integer, db.ForeignKey('insumo.id'), nullable=False)
+
+    # 'critico', 'ok' o 'sin_alerta'
+    estado_anterior = db.Column(db.String(20), nullable=False)
+    estado_nuevo = db.Column(db.String(20), nullable=False)
+    stock_actual = db.Column(db.Float, nullable=False)
+    stock_minimo = db.Column(db.Float, nullable=False)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<EventoAlertaStock {self.insumo_id}: {self.estado_anterior} -> {self.estado_nuevo}>'
+
+
+class MonitorAlertas(db.Model):
+    """Marca de agua del monitor de alertas: hasta cuándo se evaluaron los cambios de saldo"""
+    __tablename__ = 'monitor_alertas'
+
+    id = db.Column(db.Integer, primary_key=True)
+    # Inicio de la última pasada (se compara con stock_insumo.updated_at)
+    ultimo_cambio = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    ultima_ejecucion = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<MonitorAlertas {self.ultimo_cambio}>'
+
+
 class Compra(db.Model):
+    __table_args__ = (
+        # listado_compras ordena por fecha; saldos y reportes agrupan por insumo
+        db.Index('ix_compra_fecha_compra', 'fecha_compra'),
+        db.Index('ix_compra_insumo_fecha', 'insumo_id', 'fecha_compra'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     
     # Relación con insumo
@@ -130,9 +336,12 @@ class Compra(db.Model):
     
     # Metadata
     fecha_compra = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Lote FIFO de la compra (costeo.py)
+    lote_stock = db.relationship('LoteStock', backref='compra', uselist=False, cascade='all, delete-orphan')
     
     # Propiedades calculadas
-    @property
+    @propiedad_memorizada
     def cantidad_unidades(self):
         """Calcula la cantidad total de unidades compradas"""
         if self.insumo and self.insumo.cantidad_por_caja:
@@ -144,7 +353,7 @@ class Compra(db.Model):
         """Calcula el costo total de la compra"""
         return self.cantidad_cajas * self.precio_caja_compra
     
-    @property
+    @propiedad_memorizada
     def precio_unitario_compra(self):
         """Calcula el precio unitario al momento de la compra"""
         if self.cantidad_unidades > 0:
@@ -156,6 +365,15 @@ class Compra(db.Model):
 
 
 class Consumo(db.Model):
+    __table_args__ = (
+        # Listados y exportaciones ordenan por (fecha_consumo, id); los filtros
+        # por insumo, centro o trabajador usan el mismo orden dentro de cada uno
+        db.Index('ix_consumo_fecha_id', 'fecha_consumo', 'id'),
+        db.Index('ix_consumo_insumo_fecha', 'insumo_id', 'fecha_consumo'),
+        db.Index('ix_consumo_centro_fecha', 'centro_consumo_id', 'fecha_consumo'),
+        db.Index('ix_consumo_trabajador_fecha', 'trabajador_id', 'fecha_consumo'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     
     # Relación con insumo
@@ -170,13 +388,21 @@ class Consumo(db.Model):
     proyecto = db.Column(db.String(100))
     observaciones = db.Column(db.String(200))
     
+    # Costo FIFO resuelto al registrar el consumo (costeo.py); NULL si todavía no se costeó
+    costo = db.Column(db.Float)
+    
     # Metadata
     fecha_consumo = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # Unidades tomadas de cada lote de compra
+    asignaciones_lote = db.relationship('ConsumoLote', backref='consumo', lazy=True, cascade='all, delete-orphan')
+    
     # Propiedades calculadas
     @property
     def costo_consumo(self):
-        """Calcula el costo del consumo basado en el precio unitario del insumo"""
+        """Costo FIFO guardado; sin costear, al precio unitario vigente del insumo"""
+        if self.costo is not None:
+            return self.costo
         if self.insumo:
             return self.cantidad_unidades * self.insumo.precio_unitario
         return 0
@@ -189,4 +415,103 @@ class Consumo(db.Model):
         return 0
     
     def __repr__(self):
-        return f'<Consumo {self.insumo.denominacion} - {self.cantidad_unidades} unidades>'
\ No newline at end of file
+        return f'<Consumo {self.insumo.denominacion} - {self.cantidad_unidades} unidades>'
+
+
+class LoteStock(db.Model):
+    """Lote FIFO de una compra: unidades compradas, las que quedan y su costo unitario"""
+    __tablename__ = 'lote_stock'
+    __table_args__ = (
+        # Cola FIFO de cada insumo: solo los lotes con unidades, del más viejo al más nuevo
+        db.Index('ix_lote_stock_abiertos', 'insumo_id', 'fecha', 'id',
+                 sqlite_where=db.text('restante > 0'), postgresql_where=db.text('restante > 0')),
+        # Lotes por vencer: rango de fechas sobre los lotes que todavía tienen unidades
+        db.Index('ix_lote_stock_vencimiento', 'fecha_vencimiento',
+                 sqlite_where=db.text('restante > 0'), postgresql_where=db.text('restante > 0')),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    compra_id = db.Column(db.Integer, db.ForeignKey('compra.id'), nullable=False, unique=True)
+    insumo_id = db.Column(db.Integer, db.ForeignKey('insumo.id'), nullable=False)
+    fecha = db.Column(db.DateTime, nullable=False)
+    # Copia de Compra.fecha_vencimiento (las compras no se editan)
+    fecha_vencimiento = db.Column(db.Date)
+
+    unidades = db.Column(db.Float, nullable=False)
+    restante = db.Column(db.Float, nullable=False)
+    costo_unitario = db.Column(db.Float, nullable=False)
+
+    asignaciones = db.relationship('ConsumoLote', backref='lote', lazy=True, cascade='all, delete-orphan')
+
+    def __repr__(self):
+        return f'<LoteStock compra {self.compra_id}: {self.restante}/{self.unidades} unidades>'
+
+
+class ConsumoLote(db.Model):
+    """Unidades de un consumo tomadas de un lote (para devolverlas al editarlo)"""
+    __tablename__ = 'consumo_lote'
+    __table_args__ = (
+        db.Index('ix_consumo_lote_lote_id', 'lote_id'),
+    )
+
+    consumo_id = db.Column(db.Integer, db.ForeignKey('consumo.id'), primary_key=True)
+    lote_id = db.Column(db.Integer, db.ForeignKey('lote_stock.id'), primary_key=True)
+    unidades = db.Column(db.Float, nullable=False)
+
+    def __repr__(self):
+        return f'<ConsumoLote consumo {self.consumo_id} lote {self.lote_id}: {self.unidades} unidades>'
+
+
+class ResumenVencimiento(db.Model):
+    """Lotes con unidades que vencen dentro de cada horizonte (0 = ya vencidos).
+
+    La escribe el chequeo periódico de vencimientos.py y la lee el dashboard.
+    """
+    __tablename__ = 'resumen_vencimiento'
+
+    horizonte_dias = db.Column(db.Integer, primary_key=True)
+    lotes = db.Column(db.Integer, nullable=False, default=0)
+    insumos = db.Column(db.Integer, nullable=False, default=0)
+    unidades = db.Column(db.Float, nullable=False, default=0.0)
+    valor = db.Column(db.Float, nullable=False, default=0.0)
+    calculado_en = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ResumenVencimiento {self.horizonte_dias} días: {self.lotes} lotes>'
+
+
+class TrabajoExportacion(db.Model):
+    """Exportación armada en segundo plano por cola_exportaciones.py.
+
+    La tabla es compartida por todos los workers: cualquiera responde el estado
+    y la descarga de un trabajo aunque lo haya armado otro.
+    """
+    __tablename__ = 'trabajo_exportacion'
+    __table_args__ = (
+        # Trabajo vigente con los mismos parámetros
+        db.Index('ix_trabajo_exportacion_clave', 'clave', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    # Parámetros de la exportación ('consumos:xlsx')
+    clave = db.Column(db.String(100), nullable=False)
+    conjunto = db.Column(db.String(20), nullable=False)
+    formato = db.Column(db.String(20), nullable=False)
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuario.id'), nullable=True)
+
+    # 'pendiente', 'procesando', 'terminado' o 'error'
+    estado = db.Column(db.String(20), nullable=False, default='pendiente')
+    filas = db.Column(db.Integer, nullable=False, default=0)
+    archivo = db.Column(db.String(500), nullable=True)
+    tamano = db.Column(db.Integer, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Último avance informado por el worker
+    actualizado_en = db.Column(db.DateTime, default=datetime.utcnow)
+    terminado_en = db.Column(db.DateTime, nullable=True)
+    # Hasta cuándo se reutiliza el archivo para pedidos iguales
+    expira_en = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<TrabajoExportacion {self.id} {self.clave}: {self.estado}>'
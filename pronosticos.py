@@ -0,0 +1,216 @@
+# pronosticos.py
+"""Pronóstico de demanda y punto de reorden por insumo, vectorizado con NumPy.
+
+Lee el consumo diario de consumo_diario (acumulado por día e insumo) en una
+matriz insumos x días y calcula para todos los insumos a la vez:
+- demanda diaria por media móvil de los últimos `ventana` días,
+- demanda diaria por suavizado exponencial simple (alpha),
+- desvío de la demanda diaria en la ventana,
+- punto de reorden = demanda * días de reposición + stock de seguridad
+  (z * desvío * raíz de los días de reposición),
+- días de cobertura = stock actual / demanda.
+
+El día en curso no se usa (está incompleto): la historia termina ayer. La
+matriz se guarda por proceso (CachePronosticos) y se actualiza por días.
+"""
+import math
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import event, func, literal, select
+
+from models import db, Insumo, Consumo, ConsumoDiario, StockInsumo
+from costeo import solo_cambio_el_costo
+
+DIAS_HISTORIA_POR_DEFECTO = 365
+VENTANA_POR_DEFECTO = 30
+ALPHA_POR_DEFECTO = 0.1
+DIAS_REPOSICION_POR_DEFECTO = 7
+# z de la normal para el nivel de servicio (1.65 ~ 95%)
+Z_SERVICIO_POR_DEFECTO = 1.65
+TTL_POR_DEFECTO = 3600
+
+FilaPronostico = namedtuple('FilaPronostico', [
+    'insumo_id', 'stock_actual', 'stock_minimo', 'demanda_media_movil', 'demanda_suavizada',
+    'desvio_diario', 'punto_reorden', 'dias_cobertura', 'reponer'
+])
+
+
+def _dias_desde(columna, inicio):
+    """Expresión SQL con los días entre `inicio` y la columna de fecha"""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        return columna - inicio
+    return func.julianday(columna) - func.julianday(literal(inicio.isoformat()))
+
+
+def _sumar_consumos(matriz, insumo_ids, inicio, desde_dia=0):
+    """Suma en la matriz los consumos de los días desde_dia..fin de la ventana que empieza en `inicio`"""
+    dias = matriz.shape[1]
+    offset = _dias_desde(ConsumoDiario.dia, inicio)
+    consulta = select(ConsumoDiario.insumo_id, offset, ConsumoDiario.unidades) \
+        .where(offset >= desde_dia, offset < dias)
+    if desde_dia:
+        # Pocos días: que use el índice por fecha. La ventana completa se lee de corrido.
+        consulta = consulta.where(ConsumoDiario.dia >= inicio + timedelta(days=desde_dia))
+    datos = np.fromiter((tuple(fila) for fila in db.session.execute(consulta)),
+                        dtype=[('insumo_id', np.int64), ('dia', np.float64), ('unidades', np.float64)])
+    if not len(datos):
+        return matriz
+    # Los insumos que no están en insumo_ids (alta concurrente) se descartan
+    datos = datos[np.isin(datos['insumo_id'], insumo_ids)]
+    indices = np.searchsorted(insumo_ids, datos['insumo_id']) * dias + datos['dia'].astype(np.int64)
+    matriz += np.bincount(indices, weights=datos['unidades'], minlength=matriz.size).reshape(matriz.shape)
+    return matriz
+
+
+def cargar_matriz_consumo(inicio, dias):
+    """Devuelve (insumo_ids, matriz) con el consumo por insumo (filas) y día (columnas)"""
+    insumo_ids = np.fromiter((i for (i,) in db.session.query(Insumo.id).order_by(Insumo.id)), dtype=np.int64)
+    matriz = np.zeros((len(insumo_ids), dias))
+    if len(insumo_ids):
+        _sumar_consumos(matriz, insumo_ids, inicio)
+    return insumo_ids, matriz
+
+
+class CachePronosticos:
+    """Matriz de consumo de la última ventana de historia, por proceso.
+
+    Cuando cambia el día solo se leen los días nuevos y la matriz se corre a
+    la izquierda. Altas o bajas de insumos y ediciones de consumos de este
+    proceso fuerzan la recarga; los cambios de otros workers (o importaciones
+    con fechas pasadas) se ven al vencer PRONOSTICO_TTL_SEGUNDOS.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.invalidar()
+
+    def invalidar(self):
+        self.construido_en = None
+        self.hasta = None
+        self.dias = None
+        self.version = None
+        self.insumo_ids = np.zeros(0, dtype=np.int64)
+        self.matriz = np.zeros((0, 0))
+
+    def obtener(self, hasta, dias, ttl):
+        version = tuple(db.session.query(func.count(Insumo.id), func.max(Insumo.id)).one())
+        inicio = hasta - timedelta(days=dias - 1)
+        with self._lock:
+            nuevos = (hasta - self.hasta).days if self.hasta else None
+            if (self.construido_en is None or time.monotonic() - self.construido_en > ttl
+                    or dias != self.dias or version != self.version
+                    or nuevos is None or nuevos < 0 or nuevos >= dias):
+                self.insumo_ids, self.matriz = cargar_matriz_consumo(inicio, dias)
+                self.construido_en = time.monotonic()
+            elif nuevos:
+                # Matriz nueva (no se modifica la que pueda estar usando otro hilo)
+                matriz = np.zeros_like(self.matriz)
+                matriz[:, :-nuevos] = self.matriz[:, nuevos:]
+                self.matriz = _sumar_consumos(matriz, self.insumo_ids, inicio, desde_dia=dias - nuevos)
+            self.hasta, self.dias, self.version = hasta, dias, version
+            return self.insumo_ids, self.matriz
+
+
+_cache = CachePronosticos()
+
+
+def reiniciar_pronosticos():
+    """Descarta la matriz en caché (tras importar consumos, recrear tablas o en pruebas)"""
+    with _cache._lock:
+        _cache.invalidar()
+
+
+def suavizado_exponencial(matriz, alpha):
+    """Último nivel del suavizado exponencial simple de cada fila, en un solo producto matricial.
+
+    Con s_0 = x_0 y s_t = alpha x_t + (1 - alpha) s_(t-1), el último nivel es
+    s_T = sum_(k<T) alpha (1 - alpha)^k x_(T-k) + (1 - alpha)^T x_0
+    """
+    dias = matriz.shape[1]
+    pesos = alpha * (1 - alpha) ** np.arange(dias - 1, -1, -1, dtype=np.float64)
+    pesos[0] = (1 - alpha) ** (dias - 1)
+    return matriz @ pesos
+
+
+def calcular_pronosticos(hasta=None, dias_historia=None, ventana=None, alpha=None,
+                         dias_reposicion=None, z_servicio=None):
+    """Calcula el pronóstico de todos los insumos. Devuelve {insumo_id: FilaPronostico}.
+
+    hasta es el último día de historia (por defecto ayer). Los demás parámetros
+    toman su valor de la configuración PRONOSTICO_* si no se indican.
+    """
+    config = current_app.config
+    dias_historia = dias_historia or config.get('PRONOSTICO_DIAS_HISTORIA', DIAS_HISTORIA_POR_DEFECTO)
+    ventana = min(ventana or config.get('PRONOSTICO_VENTANA', VENTANA_POR_DEFECTO), dias_historia)
+    alpha = alpha or config.get('PRONOSTICO_ALPHA', ALPHA_POR_DEFECTO)
+    dias_reposicion = dias_reposicion or config.get('PRONOSTICO_DIAS_REPOSICION', DIAS_REPOSICION_POR_DEFECTO)
+    z_servicio = z_servicio or config.get('PRONOSTICO_Z_SERVICIO', Z_SERVICIO_POR_DEFECTO)
+
+    if hasta is None:
+        hasta = datetime.utcnow().date() - timedelta(days=1)
+    ttl = config.get('PRONOSTICO_TTL_SEGUNDOS', TTL_POR_DEFECTO)
+    insumo_ids, matriz = _cache.obtener(hasta, dias_historia, ttl)
+    if not len(insumo_ids):
+        return {}
+
+    recientes = matriz[:, -ventana:]
+    media_movil = recientes.mean(axis=1)
+    desvio = recientes.std(axis=1)
+    suavizada = suavizado_exponencial(matriz, alpha)
+
+    # Stock actual y mínimo en el mismo orden que la matriz
+    saldos = np.fromiter((tuple(fila) for fila in db.session.execute(select(
+        Insumo.id, func.coalesce(StockInsumo.saldo, 0.0), func.coalesce(Insumo.stock_minimo, 0.0)
+    ).outerjoin(StockInsumo, StockInsumo.insumo_id == Insumo.id))),
+        dtype=[('insumo_id', np.int64), ('saldo', np.float64), ('minimo', np.float64)])
+    saldos = saldos[np.isin(saldos['insumo_id'], insumo_ids)]
+    posiciones = np.searchsorted(insumo_ids, saldos['insumo_id'])
+    stock = np.zeros(len(insumo_ids))
+    minimo = np.zeros(len(insumo_ids))
+    stock[posiciones] = saldos['saldo']
+    minimo[posiciones] = saldos['minimo']
+
+    # Se usa la demanda más alta de las dos estimaciones (criterio conservador)
+    demanda = np.maximum(media_movil, suavizada)
+    punto_reorden = demanda * dias_reposicion + z_servicio * desvio * math.sqrt(dias_reposicion)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cobertura = np.where(demanda > 0, stock / demanda, np.inf)
+    reponer = (demanda > 0) & (stock <= punto_reorden)
+
+    cobertura[np.isinf(cobertura)] = np.nan
+    columnas = zip(insumo_ids.tolist(), stock.tolist(), minimo.tolist(), media_movil.tolist(),
+                   suavizada.tolist(), desvio.tolist(), punto_reorden.tolist(),
+                   cobertura.tolist(), reponer.tolist())
+    return {
+        fila[0]: FilaPronostico(*fila[:7], None if math.isnan(fila[7]) else fila[7], fila[8])
+        for fila in columnas
+    }
+
+
+def pronostico_a_dict(fila):
+    return {
+        'insumo_id': fila.insumo_id,
+        'stock_actual': fila.stock_actual,
+        'stock_minimo': fila.stock_minimo,
+        'demanda_media_movil': round(fila.demanda_media_movil, 4),
+        'demanda_suavizada': round(fila.demanda_suavizada, 4),
+        'desvio_diario': round(fila.desvio_diario, 4),
+        'punto_reorden': round(fila.punto_reorden, 2),
+        'dias_cobertura': round(fila.dias_cobertura, 1) if fila.dias_cobertura is not None else None,
+        'reponer': fila.reponer,
+    }
+
+
+# Editar o borrar un consumo puede cambiar días pasados: se recarga la matriz
+@event.listens_for(Consumo, 'after_update')
+@event.listens_for(Consumo, 'after_delete')
+def _consumo_modificado(mapper, connection, objeto):
+    # La matriz es de unidades: el costo grabado tras el INSERT no la cambia
+    if solo_cambio_el_costo(objeto):
+        return
+    _cache.construido_en = None
@@ -0,0 +1,165 @@
+# reportes.py
+"""Consultas agregadas para los reportes (una sola consulta por reporte)"""
+from collections import namedtuple
+
+from sqlalchemy import and_, case, func, select
+
+from models import db, Insumo, Consumo, StockInsumo, CentroConsumo, Trabajador
+from saldos import calcular_totales_movimientos
+
+FilaReporteStock = namedtuple('FilaReporteStock', [
+    'id', 'denominacion', 'tipo', 'modelo', 'cantidad_por_caja', 'precio_caja',
+    'precio_unitario', 'total_unidades_compradas', 'total_unidades_consumidas',
+    'stock_actual_unidades', 'cajas_completas', 'unidades_sueltas', 'valor_stock'
+])
+
+
+def obtener_reporte_stock():
+    """Devuelve una FilaReporteStock por insumo leyendo su saldo de stock_insumo.
+
+    Los insumos sin fila de saldo se calculan desde sus movimientos; el
+    control completo contra el historial es `flask verificar-saldos`.
+    """
+    filas = db.session.query(
+        Insumo.id, Insumo.denominacion, Insumo.tipo, Insumo.modelo,
+        Insumo.cantidad_por_caja, Insumo.precio_caja, Insumo.precio_unitario,
+        StockInsumo.unidades_entrada, StockInsumo.unidades_salida, StockInsumo.saldo
+    ).outerjoin(StockInsumo, StockInsumo.insumo_id == Insumo.id) \
+     .order_by(Insumo.id).all()
+
+    sin_saldo = [fila.id for fila in filas if fila.saldo is None]
+    totales = calcular_totales_movimientos(sin_saldo) if sin_saldo else {}
+
+    reporte = []
+    for fila in filas:
+        if fila.saldo is None:
+            compradas_unid, consumidas_unid = totales.get(fila.id, (0.0, 0.0))
+            stock = compradas_unid - consumidas_unid
+        else:
+            compradas_unid = float(fila.unidades_entrada)
+            consumidas_unid = float(fila.unidades_salida)
+            stock = float(fila.saldo)
+        if fila.cantidad_por_caja:
+            cajas, sueltas = int(stock // fila.cantidad_por_caja), stock % fila.cantidad_por_caja
+        else:
+            cajas, sueltas = 0, 0
+        reporte.append(FilaReporteStock(
+            id=fila.id,
+            denominacion=fila.denominacion,
+            tipo=fila.tipo,
+            modelo=fila.modelo,
+            cantidad_por_caja=fila.cantidad_por_caja,
+            precio_caja=fila.precio_caja,
+            precio_unitario=fila.precio_unitario,
+            total_unidades_compradas=compradas_unid,
+            total_unidades_consumidas=consumidas_unid,
+            stock_actual_unidades=stock,
+            cajas_completas=cajas,
+            unidades_sueltas=sueltas,
+            valor_stock=stock * fila.precio_unitario
+        ))
+    return reporte
+
+
+# Estados de alerta de stock
+ESTADO_CRITICO = 'critico'
+ESTADO_OK = 'ok'
+ESTADO_SIN_ALERTA = 'sin_alerta'
+
+FilaAlertaStock = namedtuple('FilaAlertaStock', [
+    'id', 'denominacion', 'tipo', 'modelo', 'stock_actual', 'stock_minimo',
+    'porcentaje_stock', 'estado'
+])
+
+
+def clasificar_stock(stock, minimo):
+    """Estado de alerta para un saldo y un stock mínimo (mismo criterio que la consulta)"""
+    if minimo <= 0:
+        return ESTADO_SIN_ALERTA
+    return ESTADO_CRITICO if stock <= minimo else ESTADO_OK
+
+
+def obtener_alertas_stock(insumo_ids=None):
+    """Devuelve una FilaAlertaStock por insumo, clasificada en la misma consulta.
+
+    El saldo sale de stock_insumo; los insumos sin fila de saldo (datos
+    anteriores a la tabla) se calculan desde sus movimientos.
+    """
+    saldo = StockInsumo.saldo
+    minimo = func.coalesce(Insumo.stock_minimo, 0.0)
+
+    estado = case(
+        (minimo <= 0, ESTADO_SIN_ALERTA),
+        (saldo <= minimo, ESTADO_CRITICO),
+        else_=ESTADO_OK
+    )
+    porcentaje = case(
+        (and_(minimo > 0, saldo > 0), saldo * 100.0 / minimo),
+        else_=0.0
+    )
+
+    filas = db.session.query(
+        Insumo.id, Insumo.denominacion, Insumo.tipo, Insumo.modelo,
+        saldo.label('saldo'), minimo.label('minimo'),
+        porcentaje.label('porcentaje'), estado.label('estado')
+    ).outerjoin(StockInsumo, StockInsumo.insumo_id == Insumo.id)
+    if insumo_ids is not None:
+        filas = filas.filter(Insumo.id.in_(insumo_ids))
+    filas = filas.order_by(Insumo.id).all()
+
+    sin_saldo = [fila.id for fila in filas if fila.saldo is None]
+    totales = calcular_totales_movimientos(sin_saldo) if sin_saldo else {}
+
+    alertas = []
+    for fila in filas:
+        if fila.saldo is None:
+            entrada, salida = totales.get(fila.id, (0.0, 0.0))
+            stock = entrada - salida
+            minimo_fila = float(fila.minimo)
+            porcentaje_fila = stock / minimo_fila * 100 if minimo_fila > 0 and stock > 0 else 0
+            estado_fila = clasificar_stock(stock, minimo_fila)
+        else:
+            stock, porcentaje_fila, estado_fila = fila.saldo, fila.porcentaje, fila.estado
+        alertas.append(FilaAlertaStock(
+            id=fila.id,
+            denominacion=fila.denominacion,
+            tipo=fila.tipo,
+            modelo=fila.modelo,
+            stock_actual=float(stock),
+            stock_minimo=float(fila.minimo),
+            porcentaje_stock=float(porcentaje_fila),
+            estado=estado_fila
+        ))
+    return alertas
+
+
+ConteoCentro = namedtuple('ConteoCentro', ['trabajadores', 'consumos'])
+
+
+def _contar(columna, valor):
+    """COUNT de las filas con columna == valor, correlacionado con la consulta externa"""
+    return select(func.count()).where(columna == valor).scalar_subquery()
+
+
+def contar_por_centro(centro_ids=None):
+    """{centro_id: ConteoCentro} en una sola consulta, sin cargar trabajadores ni consumos.
+
+    Cada conteo es una subconsulta correlacionada que se resuelve con el
+    índice por centro (ix_trabajador_centro_nombre, ix_consumo_centro_fecha).
+    """
+    consulta = db.session.query(
+        CentroConsumo.id,
+        _contar(Trabajador.centro_consumo_id, CentroConsumo.id),
+        _contar(Consumo.centro_consumo_id, CentroConsumo.id),
+    )
+    if centro_ids is not None:
+        consulta = consulta.filter(CentroConsumo.id.in_(centro_ids))
+    return {centro_id: ConteoCentro(trabajadores, consumos) for centro_id, trabajadores, consumos in consulta}
+
+
+def contar_consumos_por_trabajador(trabajador_ids=None):
+    """{trabajador_id: consumos} en una sola consulta (índice ix_consumo_trabajador_fecha)"""
+    consulta = db.session.query(Trabajador.id, _contar(Consumo.trabajador_id, Trabajador.id))
+    if trabajador_ids is not None:
+        consulta = consulta.filter(Trabajador.id.in_(trabajador_ids))
+    return dict(consulta.all())
@@ -0,0 +1,258 @@
+# rollups.py
+"""Acumulados de consumo por día y por mes (tablas consumo_diario y consumo_mensual).
+
+Cada fila suma unidades, costo y cantidad de consumos de una combinación
+(período, insumo, centro, trabajador). Se actualizan en la misma transacción
+que cada consumo (alta, edición e importación) y se pueden reconstruir desde
+cero con `flask rollups --reconstruir`.
+
+El costo es el costo FIFO guardado en cada consumo (costeo.py), así que no
+cambia al editar el precio del insumo; los consumos sin costear se valúan al
+precio unitario vigente, igual que Consumo.costo_consumo.
+
+consultar_rollups responde un rango de fechas con la tabla más gruesa posible:
+los meses completos salen de consumo_mensual y los días sueltos de los
+extremos de consumo_diario.
+"""
+from collections import defaultdict, namedtuple
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import Date, cast, delete, func, select
+
+from models import db, Insumo, Consumo, ConsumoDiario, ConsumoMensual
+
+DIMENSIONES = {
+    'insumo': 'insumo_id',
+    'centro': 'centro_consumo_id',
+    'trabajador': 'trabajador_id',
+}
+# Agrupaciones por período (además de las dimensiones)
+PERIODOS = ('mes', 'dia')
+
+# (fecha, insumo_id, centro_consumo_id, trabajador_id, unidades, costo, consumos)
+MovimientoRollup = namedtuple('MovimientoRollup', [
+    'fecha', 'insumo_id', 'centro_consumo_id', 'trabajador_id', 'unidades', 'costo', 'consumos'
+])
+
+
+def movimiento_de_consumo(consumo, signo=1):
+    """MovimientoRollup de un Consumo (signo=-1 para descontarlo)"""
+    costo = consumo.costo
+    if costo is None:
+        # Por id y no por la relación: en una edición insumo puede seguir apuntando al anterior
+        insumo = db.session.get(Insumo, consumo.insumo_id)
+        costo = consumo.cantidad_unidades * (insumo.precio_unitario if insumo else 0.0)
+    return MovimientoRollup(consumo.fecha_consumo, consumo.insumo_id, consumo.centro_consumo_id,
+                            consumo.trabajador_id, signo * consumo.cantidad_unidades,
+                            signo * costo, signo)
+
+
+def inicio_de_mes(fecha):
+    return date(fecha.year, fecha.month, 1)
+
+
+def _dia(fecha):
+    return fecha.date() if isinstance(fecha, datetime) else fecha
+
+
+def _insert_upsert(modelo):
+    """INSERT ... ON CONFLICT del dialecto en uso (SQLite o PostgreSQL)"""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    tabla = modelo.__table__
+    sentencia = insert(tabla)
+    return sentencia.on_conflict_do_update(
+        index_elements=[c.name for c in tabla.primary_key.columns],
+        set_={
+            'unidades': tabla.c.unidades + sentencia.excluded.unidades,
+            'costo': tabla.c.costo + sentencia.excluded.costo,
+            'consumos': tabla.c.consumos + sentencia.excluded.consumos,
+        }
+    )
+
+
+def aplicar_rollups(movimientos):
+    """Suma los movimientos a consumo_diario y consumo_mensual (un executemany por tabla)"""
+    diarios = defaultdict(lambda: [0.0, 0.0, 0])
+    mensuales = defaultdict(lambda: [0.0, 0.0, 0])
+    for m in movimientos:
+        dia = _dia(m.fecha)
+        for acumulados, periodo in ((diarios, dia), (mensuales, inicio_de_mes(dia))):
+            fila = acumulados[(periodo, m.insumo_id, m.centro_consumo_id, m.trabajador_id)]
+            fila[0] += m.unidades
+            fila[1] += m.costo
+            fila[2] += m.consumos
+
+    for modelo, columna, acumulados in ((ConsumoDiario, 'dia', diarios), (ConsumoMensual, 'mes', mensuales)):
+        if not acumulados:
+            continue
+        db.session.execute(_insert_upsert(modelo), [
+            {columna: periodo, 'insumo_id': insumo_id, 'centro_consumo_id': centro_id,
+             'trabajador_id': trabajador_id, 'unidades': unidades, 'costo': costo, 'consumos': consumos}
+            for (periodo, insumo_id, centro_id, trabajador_id), (unidades, costo, consumos) in acumulados.items()
+        ])
+        # Una edición puede dejar filas sin consumos
+        for (periodo, insumo_id, centro_id, trabajador_id), (_, _, consumos) in acumulados.items():
+            if consumos < 0:
+                db.session.execute(delete(modelo).where(
+                    getattr(modelo, columna) == periodo, modelo.insumo_id == insumo_id,
+                    modelo.centro_consumo_id == centro_id, modelo.trabajador_id == trabajador_id,
+                    modelo.consumos <= 0))
+
+
+def eliminar_rollups_insumo(insumo_id):
+    for modelo in (ConsumoDiario, ConsumoMensual):
+        db.session.execute(delete(modelo).where(modelo.insumo_id == insumo_id)
+                           .execution_options(synchronize_session=False))
+
+
+def _expresion_mes(columna, dialecto):
+    if dialecto == 'postgresql':
+        return cast(func.date_trunc('month', columna), Date)
+    return func.date(columna, 'start of month')
+
+
+def reconstruir_rollups(conexion=None):
+    """Recalcula ambas tablas desde los consumos. Devuelve (filas_diarias, filas_mensuales)
+
+    Sin conexión usa la sesión de la aplicación y hace commit; generar_datos.py
+    pasa su propia conexión.
+    """
+    ejecutar = conexion.execute if conexion is not None else db.session.execute
+    dialecto = (conexion or db.session.get_bind()).dialect.name
+    ejecutar(delete(ConsumoDiario.__table__))
+    ejecutar(delete(ConsumoMensual.__table__))
+
+    dia = func.date(Consumo.fecha_consumo)
+    if dialecto == 'postgresql':
+        dia = cast(Consumo.fecha_consumo, Date)
+    diarios = select(
+        dia, Consumo.insumo_id, Consumo.centro_consumo_id, Consumo.trabajador_id,
+        func.sum(Consumo.cantidad_unidades),
+        func.sum(func.coalesce(Consumo.costo, Consumo.cantidad_unidades * Insumo.precio_unitario)),
+        func.count(Consumo.id)
+    ).join(Insumo, Insumo.id == Consumo.insumo_id) \
+     .group_by(dia, Consumo.insumo_id, Consumo.centro_consumo_id, Consumo.trabajador_id)
+    columnas = ['insumo_id', 'centro_consumo_id', 'trabajador_id', 'unidades', 'costo', 'consumos']
+    ejecutar(ConsumoDiario.__table__.insert().from_select(['dia'] + columnas, diarios))
+
+    mes = _expresion_mes(ConsumoDiario.dia, dialecto)
+    mensuales = select(
+        mes, ConsumoDiario.insumo_id, ConsumoDiario.centro_consumo_id, ConsumoDiario.trabajador_id,
+        func.sum(ConsumoDiario.unidades), func.sum(ConsumoDiario.costo), func.sum(ConsumoDiario.consumos)
+    ).group_by(mes, ConsumoDiario.insumo_id, ConsumoDiario.centro_consumo_id, ConsumoDiario.trabajador_id)
+    ejecutar(ConsumoMensual.__table__.insert().from_select(['mes'] + columnas, mensuales))
+
+    if conexion is None:
+        db.session.commit()
+    return (ejecutar(select(func.count()).select_from(ConsumoDiario.__table__)).scalar(),
+            ejecutar(select(func.count()).select_from(ConsumoMensual.__table__)).scalar())
+
+
+def verificar_rollups():
+    """Compara los totales por insumo de los rollups con los consumos.
+
+    Devuelve una lista de (tabla, insumo_id, unidades_esperadas, unidades_guardadas).
+    """
+    esperados = dict(db.session.query(Consumo.insumo_id, func.sum(Consumo.cantidad_unidades))
+                     .group_by(Consumo.insumo_id))
+    diferencias = []
+    for modelo in (ConsumoDiario, ConsumoMensual):
+        guardados = dict(db.session.query(modelo.insumo_id, func.sum(modelo.unidades))
+                         .group_by(modelo.insumo_id))
+        for insumo_id in sorted(set(esperados) | set(guardados)):
+            esperado = float(esperados.get(insumo_id) or 0)
+            guardado = float(guardados.get(insumo_id) or 0)
+            if abs(esperado - guardado) > 1e-6:
+                diferencias.append((modelo.__tablename__, insumo_id, esperado, guardado))
+    return diferencias
+
+
+# === CONSULTAS ===
+
+def dividir_rango(desde, hasta):
+    """Parte [desde, hasta] (fechas inclusivas) en tramos (modelo, inicio, fin).
+
+    Los meses completos se leen de consumo_mensual y el resto de consumo_diario.
+    """
+    primer_mes = inicio_de_mes(desde)
+    if primer_mes < desde:
+        primer_mes = inicio_de_mes(primer_mes + timedelta(days=32))
+    siguiente_a_hasta = hasta + timedelta(days=1)
+    fin_meses = inicio_de_mes(siguiente_a_hasta)  # primer día del mes que no está completo
+
+    if primer_mes >= fin_meses:
+        return [(ConsumoDiario, desde, hasta)]
+
+    tramos = []
+    if desde < primer_mes:
+        tramos.append((ConsumoDiario, desde, primer_mes - timedelta(days=1)))
+    ultimo_mes = inicio_de_mes(fin_meses - timedelta(days=1))
+    tramos.append((ConsumoMensual, primer_mes, ultimo_mes))
+    if fin_meses <= hasta:
+        tramos.append((ConsumoDiario, fin_meses, hasta))
+    return tramos
+
+
+def consultar_rollups(desde, hasta, agrupar=(), insumo_id=None, centro_id=None, trabajador_id=None):
+    """Totales de consumo entre dos fechas (inclusivas) agrupados por las claves pedidas.
+
+    agrupar admite 'insumo', 'centro', 'trabajador', 'mes' y 'dia'. Devuelve
+    (filas, tablas_usadas); cada fila es un dict con las claves de agrupación
+    (ids o la fecha en ISO) más unidades, costo y consumos.
+    """
+    for clave in agrupar:
+        if clave not in DIMENSIONES and clave not in PERIODOS:
+            raise ValueError(f'No se puede agrupar por {clave}')
+    if 'mes' in agrupar and 'dia' in agrupar:
+        raise ValueError('Agrupá por mes o por día, no por ambos')
+
+    # Agrupar por día solo se puede responder con la tabla diaria
+    tramos = [(ConsumoDiario, desde, hasta)] if 'dia' in agrupar else dividir_rango(desde, hasta)
+
+    totales = defaultdict(lambda: [0.0, 0.0, 0])
+    for modelo, inicio, fin in tramos:
+        columna_fecha = modelo.dia if modelo is ConsumoDiario else modelo.mes
+        columnas = [getattr(modelo, DIMENSIONES[c]) for c in agrupar if c in DIMENSIONES]
+        if 'mes' in agrupar or 'dia' in agrupar:
+            columnas.append(columna_fecha)
+
+        consulta = db.session.query(
+            *columnas, func.sum(modelo.unidades), func.sum(modelo.costo), func.sum(modelo.consumos)
+        ).filter(columna_fecha >= inicio, columna_fecha <= fin)
+        if insumo_id is not None:
+            consulta = consulta.filter(modelo.insumo_id == insumo_id)
+        if centro_id is not None:
+            consulta = consulta.filter(modelo.centro_consumo_id == centro_id)
+        if trabajador_id is not None:
+            consulta = consulta.filter(modelo.trabajador_id == trabajador_id)
+        if columnas:
+            consulta = consulta.group_by(*columnas)
+
+        for fila in consulta:
+            claves = list(fila[:len(columnas)])
+            if 'mes' in agrupar or 'dia' in agrupar:
+                fecha = claves[-1]
+                if isinstance(fecha, str):
+                    fecha = date.fromisoformat(fecha[:10])
+                claves[-1] = inicio_de_mes(fecha) if 'mes' in agrupar else fecha
+            acumulado = totales[tuple(claves)]
+            acumulado[0] += float(fila[-3] or 0)
+            acumulado[1] += float(fila[-2] or 0)
+            acumulado[2] += int(fila[-1] or 0)
+
+    nombres = [c for c in agrupar if c in DIMENSIONES]
+    if 'mes' in agrupar or 'dia' in agrupar:
+        nombres.append('mes' if 'mes' in agrupar else 'dia')
+
+    filas = []
+    for claves, (unidades, costo, consumos) in sorted(totales.items(), key=lambda item: tuple(str(c) for c in item[0])):
+        if consumos == 0 and unidades == 0:
+            continue
+        fila = {nombre: (valor.isoformat() if isinstance(valor, date) else valor)
+                for nombre, valor in zip(nombres, claves)}
+        fila.update(unidades=unidades, costo=costo, consumos=consumos)
+        filas.append(fila)
+    return filas, [modelo.__tablename__ for modelo, _, _ in tramos]
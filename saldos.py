@@ -0,0 +1,226 @@
+# saldos.py
+"""Mantenimiento del saldo materializado de stock (tabla stock_insumo).
+
+Cada compra o consumo actualiza el saldo de su insumo en la misma
+transacción, así leer el stock no depende del tamaño del historial.
+"""
+from datetime import datetime
+
+from sqlalchemy import bindparam, func, update
+
+from models import db, Insumo, Compra, Consumo, StockInsumo
+
+# Diferencia máxima aceptada al comparar saldos (son Float)
+TOLERANCIA = 1e-6
+
+
+def calcular_totales_movimientos(insumo_ids=None):
+    """Devuelve {insumo_id: (unidades_entrada, unidades_salida)} desde los movimientos"""
+    entradas = db.session.query(
+        Compra.insumo_id,
+        func.sum(Compra.cantidad_cajas * Insumo.cantidad_por_caja)
+    ).join(Insumo, Compra.insumo_id == Insumo.id).group_by(Compra.insumo_id)
+
+    salidas = db.session.query(
+        Consumo.insumo_id,
+        func.sum(Consumo.cantidad_unidades)
+    ).group_by(Consumo.insumo_id)
+
+    if insumo_ids is not None:
+        entradas = entradas.filter(Compra.insumo_id.in_(insumo_ids))
+        salidas = salidas.filter(Consumo.insumo_id.in_(insumo_ids))
+
+    totales = {}
+    for insumo_id, total in entradas:
+        totales[insumo_id] = (float(total or 0), 0.0)
+    for insumo_id, total in salidas:
+        entrada = totales.get(insumo_id, (0.0, 0.0))[0]
+        totales[insumo_id] = (entrada, float(total or 0))
+    return totales
+
+
+def recalcular_saldo(insumo_id, tipo=None, movimiento_id=None):
+    """Recalcula desde cero el saldo de un insumo y lo guarda en la sesión"""
+    entrada, salida = calcular_totales_movimientos([insumo_id]).get(insumo_id, (0.0, 0.0))
+
+    saldo = db.session.get(StockInsumo, insumo_id)
+    if saldo is None:
+        saldo = StockInsumo(insumo_id=insumo_id)
+        db.session.add(saldo)
+
+    saldo.unidades_entrada = entrada
+    saldo.unidades_salida = salida
+    saldo.saldo = entrada - salida
+    if movimiento_id is not None:
+        saldo.ultimo_movimiento_tipo = tipo
+        saldo.ultimo_movimiento_id = movimiento_id
+    return saldo
+
+
+def asegurar_saldos(insumo_ids):
+    """Crea desde los movimientos las filas de saldo que falten.
+
+    Si una operación aplica más de un movimiento (p. ej. editar un consumo),
+    debe llamarse antes de modificar los movimientos: así las filas reflejan
+    el estado previo y cada delta se suma una sola vez.
+    """
+    insumo_ids = set(insumo_ids)
+    existentes = {insumo_id for (insumo_id,) in db.session.query(StockInsumo.insumo_id)
+                  .filter(StockInsumo.insumo_id.in_(insumo_ids))}
+    for insumo_id in insumo_ids - existentes:
+        recalcular_saldo(insumo_id)
+    db.session.flush()
+
+
+def aplicar_movimiento(insumo_id, entrada=0.0, salida=0.0, tipo=None, movimiento_id=None):
+    """Suma un movimiento al saldo del insumo con un UPDATE atómico.
+
+    Debe llamarse después de hacer flush del movimiento: si el insumo todavía
+    no tiene fila de saldo se calcula desde los movimientos (que ya lo incluyen).
+    Con varios movimientos en la misma operación, llamar antes a asegurar_saldos.
+    """
+    valores = {
+        'unidades_entrada': StockInsumo.unidades_entrada + entrada,
+        'unidades_salida': StockInsumo.unidades_salida + salida,
+        'saldo': StockInsumo.saldo + entrada - salida,
+        'updated_at': datetime.utcnow(),
+    }
+    if movimiento_id is not None:
+        valores['ultimo_movimiento_tipo'] = tipo
+        valores['ultimo_movimiento_id'] = movimiento_id
+
+    resultado = db.session.execute(
+        update(StockInsumo)
+        .where(StockInsumo.insumo_id == insumo_id)
+        .values(**valores)
+        .execution_options(synchronize_session='evaluate')
+    )
+    if resultado.rowcount == 0:
+        recalcular_saldo(insumo_id, tipo, movimiento_id)
+
+
+def reservar_stock(insumo_id, cantidad, movimiento_id=None):
+    """Descuenta un consumo del saldo solo si alcanza el stock. Devuelve True si se reservó.
+
+    El control y el descuento son un único UPDATE condicional, así dos
+    peticiones concurrentes no pueden pasar las dos el control y dejar el
+    stock negativo: la base serializa los UPDATE sobre la misma fila
+    (lock de escritura en SQLite, lock de fila en PostgreSQL) y la segunda
+    evalúa la condición con el saldo ya descontado.
+    """
+    resultado = db.session.execute(
+        update(StockInsumo)
+        .where(StockInsumo.insumo_id == insumo_id, StockInsumo.saldo >= cantidad)
+        .values(
+            unidades_salida=StockInsumo.unidades_salida + cantidad,
+            saldo=StockInsumo.saldo - cantidad,
+            ultimo_movimiento_tipo='consumo',
+            ultimo_movimiento_id=movimiento_id,
+            updated_at=datetime.utcnow(),
+        )
+        .execution_options(synchronize_session='evaluate')
+    )
+    if resultado.rowcount == 1:
+        return True
+
+    # Sin fila de saldo: se crea desde los movimientos (ya incluyen este consumo)
+    if db.session.get(StockInsumo, insumo_id) is None:
+        saldo = recalcular_saldo(insumo_id, 'consumo', movimiento_id)
+        return saldo.saldo >= -TOLERANCIA
+    return False
+
+
+def aplicar_movimientos_lote(movimientos):
+    """Suma {insumo_id: (entrada, salida)} a los saldos con un solo UPDATE por lotes (executemany).
+
+    Pensado para importaciones: debe llamarse después de insertar los
+    movimientos. Devuelve los ids de insumos que quedaron con saldo negativo
+    (la transacción sigue abierta, quien llama decide si revierte).
+    """
+    if not movimientos:
+        return []
+    insumo_ids = list(movimientos)
+    existentes = {insumo_id for (insumo_id,) in db.session.query(StockInsumo.insumo_id)
+                  .filter(StockInsumo.insumo_id.in_(insumo_ids))}
+
+    tabla = StockInsumo.__table__
+    parametros = [{'b_insumo_id': insumo_id, 'b_entrada': entrada, 'b_salida': salida}
+                  for insumo_id, (entrada, salida) in movimientos.items() if insumo_id in existentes]
+    if parametros:
+        db.session.execute(
+            update(tabla)
+            .where(tabla.c.insumo_id == bindparam('b_insumo_id'))
+            .values(
+                unidades_entrada=tabla.c.unidades_entrada + bindparam('b_entrada'),
+                unidades_salida=tabla.c.unidades_salida + bindparam('b_salida'),
+                saldo=tabla.c.saldo + bindparam('b_entrada') - bindparam('b_salida'),
+                updated_at=datetime.utcnow(),
+            ),
+            parametros
+        )
+    # Sin fila de saldo: se calcula desde los movimientos (ya incluyen el lote)
+    for insumo_id in set(insumo_ids) - existentes:
+        recalcular_saldo(insumo_id)
+    db.session.flush()
+
+    return [insumo_id for (insumo_id,) in db.session.query(StockInsumo.insumo_id).filter(
+        StockInsumo.insumo_id.in_(insumo_ids), StockInsumo.saldo < -TOLERANCIA)]
+
+
+def marcar_saldos_modificados(insumo_ids):
+    """Estampa updated_at sin cambiar el saldo, para que el monitor de alertas
+    reevalúe los insumos (p. ej. cambió su stock_minimo)"""
+    insumo_ids = list(insumo_ids)
+    if not insumo_ids:
+        return
+    resultado = db.session.execute(
+        update(StockInsumo)
+        .where(StockInsumo.insumo_id.in_(insumo_ids))
+        .values(updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    if resultado.rowcount < len(insumo_ids):
+        # Sin fila de saldo: se crea desde los movimientos (queda estampada)
+        existentes = {insumo_id for (insumo_id,) in db.session.query(StockInsumo.insumo_id)
+                      .filter(StockInsumo.insumo_id.in_(insumo_ids))}
+        for insumo_id in set(insumo_ids) - existentes:
+            recalcular_saldo(insumo_id)
+
+
+def reconstruir_saldos():
+    """Reconstruye el saldo de todos los insumos. Devuelve cuántos se actualizaron"""
+    totales = calcular_totales_movimientos()
+    existentes = {s.insumo_id: s for s in StockInsumo.query.all()}
+
+    insumo_ids = [insumo_id for (insumo_id,) in db.session.query(Insumo.id)]
+    for insumo_id in insumo_ids:
+        entrada, salida = totales.get(insumo_id, (0.0, 0.0))
+        saldo = existentes.get(insumo_id)
+        if saldo is None:
+            saldo = StockInsumo(insumo_id=insumo_id)
+            db.session.add(saldo)
+        saldo.unidades_entrada = entrada
+        saldo.unidades_salida = salida
+        saldo.saldo = entrada - salida
+
+    db.session.commit()
+    return len(insumo_ids)
+
+
+def verificar_saldos():
+    """Compara los saldos guardados con los movimientos.
+
+    Devuelve una lista de (insumo_id, saldo_esperado, saldo_guardado); saldo_guardado
+    es None si el insumo no tiene fila de saldo.
+    """
+    totales = calcular_totales_movimientos()
+    existentes = {s.insumo_id: s.saldo for s in StockInsumo.query.all()}
+
+    diferencias = []
+    for (insumo_id,) in db.session.query(Insumo.id).order_by(Insumo.id):
+        entrada, salida = totales.get(insumo_id, (0.0, 0.0))
+        esperado = entrada - salida
+        guardado = existentes.get(insumo_id)
+        if guardado is None or abs(guardado - esperado) > TOLERANCIA:
+            diferencias.append((insumo_id, esperado, guardado))
+    return diferencias
@@ -0,0 +1,119 @@
+# vencimientos.py
+"""Lotes por vencer a partir de Compra.fecha_vencimiento y las unidades que quedan en cada lote.
+
+Las unidades que quedan salen del costeo FIFO (lote_stock.restante), así
+que un lote ya consumido no aparece aunque su compra tenga vencimiento. La
+consulta es un rango sobre el índice parcial ix_lote_stock_vencimiento
+(solo lotes con unidades).
+
+El chequeo periódico (monitor de alertas o `flask vencimientos
+--actualizar`) deja en resumen_vencimiento los totales por horizonte que
+muestra el dashboard.
+"""
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from sqlalchemy import case, delete, func
+
+from models import db, Insumo, Compra, LoteStock, ResumenVencimiento
+
+DIAS_POR_DEFECTO = 30
+# Horizontes del resumen; 0 son los lotes ya vencidos
+HORIZONTES = (0, 7, 30, 90)
+
+FilaVencimiento = namedtuple('FilaVencimiento', [
+    'lote_id', 'compra_id', 'insumo_id', 'denominacion', 'tipo', 'modelo', 'lote', 'proveedor',
+    'fecha_vencimiento', 'dias_restantes', 'unidades', 'restante', 'valor'
+])
+
+
+def obtener_lotes_por_vencer(dias=DIAS_POR_DEFECTO, insumo_id=None, hoy=None):
+    """Lotes con unidades que vencen en los próximos `dias` días (incluye los ya vencidos)"""
+    hoy = hoy or datetime.utcnow().date()
+    consulta = db.session.query(
+        LoteStock.id, LoteStock.compra_id, LoteStock.insumo_id,
+        Insumo.denominacion, Insumo.tipo, Insumo.modelo, Compra.lote, Compra.proveedor,
+        LoteStock.fecha_vencimiento, LoteStock.unidades, LoteStock.restante, LoteStock.costo_unitario
+    ).join(Insumo, Insumo.id == LoteStock.insumo_id) \
+     .join(Compra, Compra.id == LoteStock.compra_id) \
+     .filter(LoteStock.restante > 0, LoteStock.fecha_vencimiento <= hoy + timedelta(days=dias)) \
+     .order_by(LoteStock.fecha_vencimiento, LoteStock.id)
+    if insumo_id is not None:
+        consulta = consulta.filter(LoteStock.insumo_id == insumo_id)
+
+    return [FilaVencimiento(
+        lote_id=fila.id,
+        compra_id=fila.compra_id,
+        insumo_id=fila.insumo_id,
+        denominacion=fila.denominacion,
+        tipo=fila.tipo,
+        modelo=fila.modelo,
+        lote=fila.lote,
+        proveedor=fila.proveedor,
+        fecha_vencimiento=fila.fecha_vencimiento,
+        dias_restantes=(fila.fecha_vencimiento - hoy).days,
+        unidades=fila.unidades,
+        restante=fila.restante,
+        valor=fila.restante * fila.costo_unitario,
+    ) for fila in consulta]
+
+
+def vencimiento_a_dict(fila):
+    return {
+        'lote_id': fila.lote_id,
+        'compra_id': fila.compra_id,
+        'insumo_id': fila.insumo_id,
+        'insumo': fila.denominacion,
+        'tipo': fila.tipo,
+        'modelo': fila.modelo,
+        'lote': fila.lote,
+        'proveedor': fila.proveedor,
+        'fecha_vencimiento': fila.fecha_vencimiento.isoformat(),
+        'dias_restantes': fila.dias_restantes,
+        'unidades': fila.unidades,
+        'restante': fila.restante,
+        'valor': round(fila.valor, 2),
+    }
+
+
+def actualizar_resumen_vencimientos(hoy=None):
+    """Recalcula resumen_vencimiento con una sola consulta agregada. Devuelve las filas"""
+    hoy = hoy or datetime.utcnow().date()
+    columnas = []
+    for horizonte in HORIZONTES:
+        if horizonte == 0:
+            condicion = LoteStock.fecha_vencimiento < hoy
+        else:
+            condicion = LoteStock.fecha_vencimiento.between(hoy, hoy + timedelta(days=horizonte))
+        columnas += [
+            func.coalesce(func.sum(case((condicion, 1), else_=0)), 0),
+            func.count(func.distinct(case((condicion, LoteStock.insumo_id)))),
+            func.coalesce(func.sum(case((condicion, LoteStock.restante), else_=0.0)), 0.0),
+            func.coalesce(func.sum(case((condicion, LoteStock.restante * LoteStock.costo_unitario), else_=0.0)), 0.0),
+        ]
+    totales = db.session.query(*columnas).filter(
+        LoteStock.restante > 0, LoteStock.fecha_vencimiento <= hoy + timedelta(days=max(HORIZONTES))
+    ).one()
+
+    ahora = datetime.utcnow()
+    filas = []
+    for i, horizonte in enumerate(HORIZONTES):
+        lotes, insumos, unidades, valor = totales[i * 4:i * 4 + 4]
+        filas.append(ResumenVencimiento(horizonte_dias=horizonte, lotes=int(lotes), insumos=int(insumos),
+                                        unidades=float(unidades), valor=float(valor), calculado_en=ahora))
+    db.session.execute(delete(ResumenVencimiento))
+    db.session.add_all(filas)
+    db.session.commit()
+    return filas
+
+
+def obtener_resumen_vencimientos():
+    """Filas de resumen_vencimiento para el dashboard (lista vacía si nunca se calculó)"""
+    return [{
+        'horizonte_dias': fila.horizonte_dias,
+        'lotes': fila.lotes,
+        'insumos': fila.insumos,
+        'unidades': fila.unidades,
+        'valor': fila.valor,
+        'calculado_en': fila.calculado_en.isoformat() if fila.calculado_en else None,
+    } for fila in ResumenVencimiento.query.order_by(ResumenVencimiento.horizonte_dias)]